@@ -0,0 +1,261 @@
+"""Benchmark of the data_processing pipeline on synthetic bmg files
+
+Writes plates x inoculations x readings synthetic 8x12 reading files
+(with mtimes 30 minutes apart) and times each stage separately:
+
+    collect_and_sort   parse every file into the long-form readings
+    manifest_ingest    first IngestManifest.update and save (parse + cache)
+    manifest_rescan    IngestManifest.update with nothing changed
+    graph_groups       split the readings into graphs
+    kinetics           growth kinetics of every well
+    render             draw the first --render-groups graphs
+
+Every run is appended to the results json (default benchmark_results.json)
+with the git commit, the settings, the seconds per stage and the process
+peak RSS after each stage:
+
+    python benchmark.py --plates 50 --inoculations 4 --readings 25
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from helper_functions.collect_info_and_sort_by_graph import (
+    collect_and_sort,
+    graph_groups,
+)
+from helper_functions.graph import graph_all
+from helper_functions.growth_kinetics import kinetics
+from helper_functions.ingest_manifest import IngestManifest
+
+
+def write_synthetic_files(directory, plates, inoculations, readings, seed=0):
+    """Writes logistic-ish growth curves with noise as bmg reading files,
+    returns the number of files"""
+    rng = np.random.default_rng(seed)
+    start = 1_700_000_000
+    n_files = 0
+    for plate in range(1, plates + 1):
+        for inoculation in range(1, inoculations + 1):
+            mu = rng.uniform(0.2, 0.8, size=(8, 12))
+            for reading in range(1, readings + 1):
+                hours = (reading - 1) / 2
+                od = 1.0 / (1.0 + 99.0 * np.exp(-mu * hours)) + rng.normal(
+                    0, 0.003, size=(8, 12)
+                )
+                path = os.path.join(
+                    directory, f"BENCH_{plate}_{inoculation}_{reading}.txt"
+                )
+                with open(path, "w") as f:
+                    f.write(
+                        "\n".join(
+                            ",".join(f"{value:.4f}" for value in row) for row in od
+                        )
+                        + "\n"
+                    )
+                # readings every 30 min, inoculations 12 h apart
+                mtime = (
+                    start
+                    + ((plate - 1) * inoculations + inoculation - 1) * 12 * 3600
+                    + hours * 3600
+                )
+                os.utime(path, (mtime, mtime))
+                n_files += 1
+    return n_files
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process (and finished workers) so far"""
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, children) / 2**20
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip()
+            or None
+        )
+    except OSError:
+        return None
+
+
+def run_stage(results, name, function, trace_memory=False):
+    """Runs and times one stage, recording its result in `results`"""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    if trace_memory:
+        results[name]["python_peak_mb"] = round(
+            tracemalloc.get_traced_memory()[1] / 2**20, 1
+        )
+        tracemalloc.stop()
+    print(
+        f"{name:<18}{seconds:10.3f} s  peak rss {results[name]['peak_rss_mb']:8.1f} MB"
+    )
+    return value
+
+
+def benchmark(
+    plates,
+    inoculations,
+    readings,
+    workers=1,
+    render_groups=10,
+    directory=None,
+    trace_memory=False,
+):
+    """Runs every stage on freshly generated files, returns the results"""
+    temp_directory = (
+        tempfile.mkdtemp(prefix="bmg_benchmark_") if directory is None else None
+    )
+    work_directory = directory or temp_directory
+    input_directory = os.path.join(work_directory, "readings")
+    output_directory = os.path.join(work_directory, "graphs")
+    os.makedirs(input_directory, exist_ok=True)
+    os.makedirs(output_directory, exist_ok=True)
+
+    results = {}
+    try:
+        start = time.perf_counter()
+        n_files = write_synthetic_files(input_directory, plates, inoculations, readings)
+        print(f"wrote {n_files} files in {time.perf_counter() - start:.1f} s")
+
+        data = run_stage(
+            results,
+            "collect_and_sort",
+            lambda: collect_and_sort(input_directory, workers=workers),
+            trace_memory,
+        )
+
+        def manifest_ingest():
+            manifest = IngestManifest(output_directory)
+            manifest.update(input_directory, workers=workers)
+            manifest.save()
+
+        run_stage(results, "manifest_ingest", manifest_ingest, trace_memory)
+        run_stage(
+            results,
+            "manifest_rescan",
+            lambda: IngestManifest(output_directory).update(
+                input_directory, workers=workers
+            ),
+            trace_memory,
+        )
+
+        groups = run_stage(
+            results,
+            "graph_groups",
+            lambda: [rows for _, rows in graph_groups(data)],
+            trace_memory,
+        )
+        run_stage(results, "kinetics", lambda: kinetics(data), trace_memory)
+        run_stage(
+            results,
+            "render",
+            lambda: graph_all(
+                groups[:render_groups], output_directory, workers=workers
+            ),
+            trace_memory,
+        )
+        results["render"]["groups"] = min(render_groups, len(groups))
+    finally:
+        if temp_directory is not None:
+            shutil.rmtree(temp_directory, ignore_errors=True)
+
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "plates": plates,
+            "inoculations": inoculations,
+            "readings": readings,
+            "files": n_files,
+            "rows": len(data),
+            "workers": workers,
+        },
+        "stages": results,
+    }
+
+
+def append_results(path, run):
+    """Appends a run to the json list of earlier runs"""
+    runs = []
+    if os.path.exists(path):
+        with open(path) as f:
+            runs = json.load(f)
+    runs.append(run)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(runs, f, indent=1)
+    os.replace(temp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--plates", type=int, default=20)
+    parser.add_argument("--inoculations", type=int, default=4, choices=[1, 2, 3, 4])
+    parser.add_argument(
+        "--readings", type=int, default=25, help="readings per inoculation"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="processes used to parse and draw"
+    )
+    parser.add_argument(
+        "--render-groups", type=int, default=10, help="graphs drawn in the render stage"
+    )
+    parser.add_argument(
+        "--directory",
+        help="write the files here and keep them (default: a temporary directory)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also record the python heap peak of each stage (slower)",
+    )
+    parser.add_argument(
+        "-o", default="benchmark_results.json", help="results json, runs are appended"
+    )
+
+    args = parser.parse_args()
+    run = benchmark(
+        args.plates,
+        args.inoculations,
+        args.readings,
+        workers=args.workers,
+        render_groups=args.render_groups,
+        directory=args.directory,
+        trace_memory=args.trace_memory,
+    )
+    append_results(args.o, run)
+    print(f"results appended to {args.o}")
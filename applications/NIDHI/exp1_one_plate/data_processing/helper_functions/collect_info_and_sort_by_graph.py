@@ -1,185 +1,152 @@
 import os
-from datetime import datetime
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from helper_functions.plate_reader import read_plate
 # from pathlib import Path
 
-
-def collect_and_sort(input_data_folder):
-    data_files = []
-
-    # check that data directory is a folder
-    if os.path.isdir(input_data_folder):
-        for filename in os.listdir(input_data_folder):
-            if filename.endswith(".txt"):
-                # format the full file path
-                full_file_path = os.path.join(input_data_folder, filename)
-
-                # extract details from the filename
-                experiment_id = filename.split("_")[0]
-                plate_number = filename.split("_")[1]
-                inoculation_number = filename.split("_")[2]
-                reading_number = (filename.split("_")[3]).replace(".txt", "")
-
-                # extract time of reading from file details
-                mtime = os.path.getmtime(
-                    full_file_path
-                )  # uses mtime because ctime was altered in download
-                formatted_ctime = datetime.fromtimestamp(mtime).strftime(
-                    "%I:%M:%S %p %Y-%m-%d"
-                )
-
-                # extract data from columns of the correct inoculation
-                df = pd.read_csv(full_file_path, header=None)
-                if int(inoculation_number) == 1:
-                    relevant_column_data = df.iloc[:, [0, 4, 8]]
-                elif int(inoculation_number) == 2:
-                    relevant_column_data = df.iloc[:, [1, 5, 9]]
-                elif int(inoculation_number) == 3:
-                    relevant_column_data = df.iloc[:, [2, 6, 10]]
-                elif int(inoculation_number) == 4:
-                    relevant_column_data = df.iloc[:, [3, 7, 11]]
-
-                # format list of file details
-                all_file_details = [
-                    full_file_path,
-                    experiment_id,
-                    plate_number,
-                    inoculation_number,
-                    reading_number,
-                    mtime,
-                    formatted_ctime,
-                    relevant_column_data,
-                ]
-
-                # append to list of all data file details
-                data_files.append(all_file_details)
-
-    data_files.sort(key=lambda x: x[5])
-
-    # sort data files by graph
-    all_data_sorted_by_graph = []
-
-    plate1_inoculation1_data = []
-    plate1_inoculation2_data = []
-    plate1_inoculation3_data = []
-    plate1_inoculation4_data = []
-
-    plate2_inoculation1_data = []
-    plate2_inoculation2_data = []
-    plate2_inoculation3_data = []
-    plate2_inoculation4_data = []
-
-    plate3_inoculation1_data = []
-    plate3_inoculation2_data = []
-    plate3_inoculation3_data = []
-    plate3_inoculation4_data = []
-
-    plate4_inoculation1_data = []
-    plate4_inoculation2_data = []
-    plate4_inoculation3_data = []
-    plate4_inoculation4_data = []
-
-    plate5_inoculation1_data = []
-    plate5_inoculation2_data = []
-    plate5_inoculation3_data = []
-    plate5_inoculation4_data = []
-
-    plate6_inoculation1_data = []
-    plate6_inoculation2_data = []
-    plate6_inoculation3_data = []
-    plate6_inoculation4_data = []
-
-    try:
-        for data_list in data_files:
-            if int(data_list[2]) == 1:  # plate 1
-                if int(data_list[3]) == 1:  # inoculation 1
-                    plate1_inoculation1_data.append(data_list)
-                elif int(data_list[3]) == 2:  # inoculation 2
-                    plate1_inoculation2_data.append(data_list)
-                elif int(data_list[3]) == 3:  # inoculation 3
-                    plate1_inoculation3_data.append(data_list)
-                elif int(data_list[3]) == 4:  # inoculation 4
-                    plate1_inoculation4_data.append(data_list)
-
-            elif int(data_list[2]) == 2:  # plate 2
-                if int(data_list[3]) == 1:  # inoculation 1
-                    plate2_inoculation1_data.append(data_list)
-                elif int(data_list[3]) == 2:  # inoculation 2
-                    plate2_inoculation2_data.append(data_list)
-                elif int(data_list[3]) == 3:  # inoculation 3
-                    plate2_inoculation3_data.append(data_list)
-                elif int(data_list[3]) == 4:  # inoculation 4
-                    plate2_inoculation4_data.append(data_list)
-
-            elif int(data_list[2]) == 3:  # plate 3
-                if int(data_list[3]) == 1:  # inoculation 1
-                    plate3_inoculation1_data.append(data_list)
-                elif int(data_list[3]) == 2:  # inoculation 2
-                    plate3_inoculation2_data.append(data_list)
-                elif int(data_list[3]) == 3:  # inoculation 3
-                    plate3_inoculation3_data.append(data_list)
-                elif int(data_list[3]) == 4:  # inoculation 4
-                    plate3_inoculation4_data.append(data_list)
-
-            elif int(data_list[2]) == 4:  # plate 4
-                if int(data_list[3]) == 1:  # inoculation 1
-                    plate4_inoculation1_data.append(data_list)
-                elif int(data_list[3]) == 2:  # inoculation 2
-                    plate4_inoculation2_data.append(data_list)
-                elif int(data_list[3]) == 3:  # inoculation 3
-                    plate4_inoculation3_data.append(data_list)
-                elif int(data_list[3]) == 4:  # inoculation 4
-                    plate4_inoculation4_data.append(data_list)
-
-            elif int(data_list[2]) == 2:  # plate 5
-                if int(data_list[3]) == 1:  # inoculation 1
-                    plate5_inoculation1_data.append(data_list)
-                elif int(data_list[3]) == 2:  # inoculation 2
-                    plate5_inoculation2_data.append(data_list)
-                elif int(data_list[3]) == 3:  # inoculation 3
-                    plate5_inoculation3_data.append(data_list)
-                elif int(data_list[3]) == 4:  # inoculation 4
-                    plate5_inoculation4_data.append(data_list)
-
-            elif int(data_list[2]) == 6:  # plate 6
-                if int(data_list[3]) == 1:  # inoculation 1
-                    plate6_inoculation1_data.append(data_list)
-                elif int(data_list[3]) == 2:  # inoculation 2
-                    plate6_inoculation2_data.append(data_list)
-                elif int(data_list[3]) == 3:  # inoculation 3
-                    plate6_inoculation3_data.append(data_list)
-                elif int(data_list[3]) == 4:  # inoculation 4
-                    plate6_inoculation4_data.append(data_list)
-
-        all_data_sorted_by_graph = [
-            plate1_inoculation1_data,
-            plate1_inoculation2_data,
-            plate1_inoculation3_data,
-            plate1_inoculation4_data,
-            plate2_inoculation1_data,
-            plate2_inoculation2_data,
-            plate2_inoculation3_data,
-            plate2_inoculation4_data,
-            plate3_inoculation1_data,
-            plate3_inoculation2_data,
-            plate3_inoculation3_data,
-            plate3_inoculation4_data,
-            plate4_inoculation1_data,
-            plate4_inoculation2_data,
-            plate4_inoculation3_data,
-            plate4_inoculation4_data,
-            plate5_inoculation1_data,
-            plate5_inoculation2_data,
-            plate5_inoculation3_data,
-            plate5_inoculation4_data,
-            plate6_inoculation1_data,
-            plate6_inoculation2_data,
-            plate6_inoculation3_data,
-            plate6_inoculation4_data,
-        ]
-
-    except Exception as e:
-        print("Sorting by graphs did not work")
-        print(e)
-
-    return all_data_sorted_by_graph
+# bmg reading files are named {experiment}_{plate}_{inoculation}_{reading}.txt
+READING_FILENAME = re.compile(
+    r"^(?P<experiment>[^_]+)_(?P<plate>\d+)_(?P<inoculation>\d+)_(?P<reading>[^_]+)\.txt$"
+)
+
+# the exp2/exp3 apps name them {label}_{timestamp}_{experiment_id}_exp{n}_{plate}_{reading}.txt
+# (reading is e.g. T4, 4 or contam) and inoculate the whole plate at once
+APP_READING_FILENAME = re.compile(
+    r"^(?P<label>[^_]+)_(?P<timestamp>\d+)_(?P<experiment_id>.+)_exp(?P<exp>\d+)"
+    r"_(?P<plate>\d+)_(?P<reading>[^_]+)\.txt$"
+)
+
+# inoculation number of files holding a whole plate
+WHOLE_PLATE = 0
+
+# one row per well of every reading, sorted by reading time
+COLUMNS = ["experiment", "plate", "inoculation", "reading", "time", "set", "row", "well", "od", "file"]
+
+# one graph per (experiment, plate, inoculation)
+GRAPH_KEYS = ["experiment", "plate", "inoculation"]
+
+
+def inoculation_columns(inoculation):
+    """Plate columns (0 based) of the three sets of an inoculation:
+    inoculation 1 -> columns 1, 5, 9; inoculation 2 -> 2, 6, 10; ...
+    WHOLE_PLATE -> every column, one set per column"""
+    if inoculation == WHOLE_PLATE:
+        return list(range(12))
+    return [inoculation - 1, inoculation + 3, inoculation + 7]
+
+
+def parse_filename(filename):
+    """Returns (experiment, plate, inoculation, reading) or None if the
+    file is not a bmg reading. App file names give experiment
+    {experiment_id}_exp{n} and inoculation WHOLE_PLATE."""
+    match = READING_FILENAME.match(filename)
+    if match is None:
+        match = APP_READING_FILENAME.match(filename)
+        if match is None:
+            return None
+        return (
+            f"{match['experiment_id']}_exp{match['exp']}",
+            int(match["plate"]),
+            WHOLE_PLATE,
+            match["reading"],
+        )
+    return (
+        match["experiment"],
+        int(match["plate"]),
+        int(match["inoculation"]),
+        match["reading"],
+    )
+
+
+def read_reading_file(full_file_path):
+    """Reads one bmg reading file into long-form rows (see COLUMNS) holding
+    the wells of the file's inoculation"""
+    experiment_id, plate_number, inoculation_number, reading_number = parse_filename(
+        os.path.basename(full_file_path)
+    )
+
+    # extract time of reading from file details
+    mtime = os.path.getmtime(full_file_path)  # uses mtime because ctime was altered in download
+
+    # extract data from columns of the correct inoculation
+    columns = inoculation_columns(inoculation_number)
+    od = read_plate(full_file_path, dtype=np.float64)[:, columns]
+
+    # flatten row by row: (row 0, set 1), (row 0, set 2), ... (row n, set 3)
+    n_rows, n_sets = od.shape
+    rows = np.repeat(np.arange(n_rows), n_sets)
+    sets = np.tile(np.arange(1, n_sets + 1), n_rows)
+    row_letters = np.array([chr(ord("A") + row) for row in range(n_rows)])
+    wells = np.char.add(row_letters[rows], (np.array(columns)[sets - 1] + 1).astype(str))
+
+    n_values = od.size
+    return pd.DataFrame({
+        "experiment": np.full(n_values, experiment_id, dtype=object),
+        "plate": np.full(n_values, plate_number),
+        "inoculation": np.full(n_values, inoculation_number),
+        "reading": np.full(n_values, reading_number, dtype=object),
+        "time": np.full(n_values, mtime),
+        "set": sets,
+        "row": rows,
+        "well": wells.astype(object),
+        "od": od.ravel(),
+        "file": np.full(n_values, full_file_path, dtype=object),
+    }, columns=COLUMNS)
+
+
+def list_reading_files(input_data_folder):
+    """Full paths of the bmg reading files in a folder and its sub-folders,
+    so a flat folder, one experiment routed by auto_file_transfer.py
+    (experiment/exp{n}/plate_{plate}/) or its whole destination can be read.
+    Files batched into archives by auto_file_transfer.py --batch-seconds are
+    not read, they have to be extracted with unpack_batches.py first."""
+    if not os.path.isdir(input_data_folder):
+        return []
+    paths = []
+    archives = 0
+    for folder, subfolders, filenames in os.walk(input_data_folder):
+        subfolders[:] = [name for name in subfolders if not name.startswith(".")]
+        paths.extend(
+            os.path.join(folder, filename)
+            for filename in filenames
+            if filename.endswith(".txt") and parse_filename(filename) is not None
+        )
+        archives += sum(filename.startswith("batch_") and filename.endswith(".tar.gz") for filename in filenames)
+    if archives:
+        print(f"Warning: {archives} batch archives in {input_data_folder} are not read, extract them with unpack_batches.py")
+    return sorted(paths)
+
+
+def read_reading_files(paths, workers=1):
+    """Reads bmg reading files into a list of long-form frames, in a
+    process pool if workers > 1 (same result as the serial path)"""
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map keeps the file order, so the merge matches the serial path
+            chunksize = max(1, len(paths) // (workers * 4))
+            return list(pool.map(read_reading_file, paths, chunksize=chunksize))
+    return [read_reading_file(path) for path in paths]
+
+
+def collect_and_sort(input_data_folder, workers=1):
+    """Reads every bmg reading file in the folder into one long-form
+    DataFrame (see COLUMNS), sorted by reading time. With workers > 1 the
+    files are parsed in a process pool; the result is the same."""
+    paths = list_reading_files(input_data_folder)
+    return combine_readings(read_reading_files(paths, workers=workers))
+
+
+def combine_readings(frames):
+    """Concatenates per-file long-form frames and sorts them by reading time"""
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    data = pd.concat(frames, ignore_index=True)
+    return data.sort_values(["time", "file", "row", "set"], kind="stable", ignore_index=True)
+
+
+def graph_groups(data):
+    """Yields ((experiment, plate, inoculation), rows) for each graph,
+    for any number of plates"""
+    yield from data.groupby(GRAPH_KEYS, sort=True)
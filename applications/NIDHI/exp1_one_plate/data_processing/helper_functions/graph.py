@@ -1,160 +1,90 @@
 import numpy as np
 import os
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 # from pathlib import Path
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 
+# line color by plate row: rows A-C red, D-F green, G-H blue
+COLORS = ["r", "g", "b"]
 
-def graph(data_for_one_graph, output_directory):
-    # format dataframes for each of the three concurrent inoculations on the plate
-    timestamps = []
-    inoculation_column1 = None
-    inoculation_column2 = None
-    inoculation_column3 = None
 
+def row_color(row):
+    if row < 3:
+        return COLORS[0]
+    elif row < 6:
+        return COLORS[1]
+    return COLORS[2]
+
+
+def graph_set(time_differences, od_by_row, title, figure_save_path):
+    """Draws one set (one line per plate row) with the Agg backend. Does not
+    touch the global pyplot state, so sets can be drawn in parallel."""
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+
+    # all rows in one collection: segments are (rows, readings, (x, y))
+    x = np.broadcast_to(np.asarray(time_differences, dtype=float), od_by_row.shape)
+    segments = np.stack([x, od_by_row.to_numpy(dtype=float)], axis=-1)
+    ax.add_collection(LineCollection(segments, colors=[row_color(row) for row in od_by_row.index]))
+    ax.autoscale_view()
+
+    ax.set_xticks(time_differences)
+    ax.set_xticklabels([str(int(t)) for t in time_differences], rotation=90, ha="center")
+    ax.set_xlabel("Incubation time in minutes")
+    ax.set_ylabel("Absorbance OD(590)")
+    ax.set_title(title)
+    figure.savefig(figure_save_path, bbox_inches="tight", pad_inches=0.3)
+
+
+def graph(data_for_one_graph, output_directory):
+    """Graphs the long-form rows of one (experiment, plate, inoculation),
+    one figure per set of concurrent inoculations on the plate"""
     # extract details
-    experiment_id = None
-    plate_id = None
-    inoculation_num = None
-    # CONTINUE HERE!
-
-    # format data for each graph into df
-    i = 0
-    for i in range(len(data_for_one_graph)):
-        current_dataset = data_for_one_graph[i]
-        timestamps.append(current_dataset[5])
-
-        if experiment_id is None:
-            experiment_id = current_dataset[1]
-        if plate_id is None:
-            plate_id = current_dataset[2]
-        if inoculation_num is None:
-            inoculation_num = current_dataset[3]
-
-        # inoculation set 1
-        if inoculation_column1 is None:
-            data = current_dataset[7].iloc[:, 0]
-            inoculation_column1 = pd.DataFrame(data).reset_index(drop=True)
-            inoculation_column1.columns = [0]
-        else:
-            new_column_to_add = current_dataset[7].iloc[:, 0]
-            inoculation_column1[i] = new_column_to_add
-
-        # inoculation set 2
-        if inoculation_column2 is None:
-            data = current_dataset[7].iloc[:, 1]
-            inoculation_column2 = pd.DataFrame(data).reset_index(drop=True)
-            inoculation_column2.columns = [0]
-        else:
-            new_column_to_add = current_dataset[7].iloc[:, 1]
-            inoculation_column2[i] = new_column_to_add
-
-        # inoculation set 3
-        if inoculation_column3 is None:
-            data = current_dataset[7].iloc[:, 2]
-            inoculation_column3 = pd.DataFrame(data).reset_index(drop=True)
-            inoculation_column3.columns = [0]
-        else:
-            new_column_to_add = current_dataset[7].iloc[:, 2]
-            inoculation_column3[i] = new_column_to_add
-
-        i += 1
+    experiment_id = data_for_one_graph["experiment"].iloc[0]
+    plate_id = data_for_one_graph["plate"].iloc[0]
+    inoculation_num = data_for_one_graph["inoculation"].iloc[0]
+
+    # readings (files) in time order
+    readings = data_for_one_graph.drop_duplicates("file").sort_values("time", kind="stable")
+    timestamps = readings["time"].to_numpy()
+    files = readings["file"].tolist()
 
     # convert timestamps into elapsed time in minutes
+    time_differences = []
     if len(timestamps) > 0:
         time_differences = np.round(
             ((np.array(timestamps) - timestamps[0]) / 60).astype(int)
         ).tolist()
 
-    # inoculation_column2.columns = range(len(inoculation_column1.columns))
-
     # TESTING
-    print(inoculation_column1)
-    print()
-    print(inoculation_column2)
-    print()
-    print(inoculation_column3)
-    print()
-    print(timestamps)
-
-    # graph each dataframe
-    colors = ["r", "g", "b"]
-
-    # SET 1
-    for i, row in inoculation_column1.iterrows():
-        if i < 3:
-            color = colors[0]
-        elif i < 6:
-            color = colors[1]
-        else:
-            color = colors[2]
-        plt.plot(time_differences, row.values, color=color)
-
-    plt.xticks(
-        time_differences,
-        labels=[str(int(t)) for t in time_differences],
-        rotation=90,
-        ha="center",
-    )
-    plt.xlabel("Incubation time in minutes")
-    plt.ylabel("Absorbance OD(590)")
-    plt.title("Set 1")
-    figure_save_path = os.path.join(
-        output_directory, f"{experiment_id}_{plate_id}_{inoculation_num}_set1"
-    )
-    # figure_save_path = "/Users/cstone/Documents/RapidPrototypingLab/GitRepos/workcells/biomedal_workcell/applications/NIDHI/data_processing/graphs/test1.png"
-    plt.savefig(figure_save_path, bbox_inches="tight", pad_inches=0.3)
-    plt.clf()
-
-    # SET 2
-    for i, row in inoculation_column2.iterrows():
-        if i < 3:
-            color = colors[0]
-        elif i < 6:
-            color = colors[1]
-        else:
-            color = colors[2]
-        plt.plot(time_differences, row.values, color=color)
-
-    plt.xticks(
-        time_differences,
-        labels=[str(int(t)) for t in time_differences],
-        rotation=90,
-        ha="center",
-    )
-    plt.xlabel("Incubation time in minutes")
-    plt.ylabel("Absorbance OD(590)")
-    plt.title("Set 2")
-    figure_save_path = os.path.join(
-        output_directory, f"{experiment_id}_{plate_id}_{inoculation_num}_set2"
-    )
-    # figure_save_path = "/Users/cstone/Documents/RapidPrototypingLab/GitRepos/workcells/biomedal_workcell/applications/NIDHI/data_processing/graphs/test2.png"
-    plt.savefig(figure_save_path, bbox_inches="tight", pad_inches=0.3)
-    plt.clf()
-
-    # SET 3
-    for i, row in inoculation_column3.iterrows():
-        if i < 3:
-            color = colors[0]
-        elif i < 6:
-            color = colors[1]
-        else:
-            color = colors[2]
-        plt.plot(time_differences, row.values, color=color)
-
-    plt.xticks(
-        time_differences,
-        labels=[str(int(t)) for t in time_differences],
-        rotation=90,
-        ha="center",
-    )
-    plt.xlabel("Incubation time in minutes")
-    plt.ylabel("Absorbance OD(590)")
-    plt.title("Set 3")
-    figure_save_path = os.path.join(
-        output_directory, f"{experiment_id}_{plate_id}_{inoculation_num}_set3"
-    )
-    # figure_save_path = "/Users/cstone/Documents/RapidPrototypingLab/GitRepos/workcells/biomedal_workcell/applications/NIDHI/data_processing/graphs/test3.png"
-    plt.savefig(figure_save_path, bbox_inches="tight", pad_inches=0.3)
-    plt.clf()
+    print(f"{experiment_id} plate {plate_id} inoculation {inoculation_num}: {len(files)} readings")
+
+    # format dataframes (rows = plate rows, columns = readings) for each of
+    # the three concurrent inoculations on the plate (every column of a
+    # whole plate) and graph each one
+    for set_num in sorted(data_for_one_graph["set"].unique()):
+        od_by_row = data_for_one_graph[data_for_one_graph["set"] == set_num].pivot(
+            index="row", columns="file", values="od"
+        )[files]
+        figure_save_path = os.path.join(
+            output_directory, f"{experiment_id}_{plate_id}_{inoculation_num}_set{set_num}"
+        )
+        graph_set(time_differences, od_by_row, f"Set {set_num}", figure_save_path)
+
+
+def graph_all(groups, output_directory, workers=1):
+    """Graphs every (experiment, plate, inoculation) group, in a process
+    pool if workers > 1"""
+    groups = list(groups)
+    if workers > 1 and len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(graph, group, output_directory) for group in groups]
+            for future in futures:
+                future.result()
+        return
+    for group in groups:
+        graph(group, output_directory)
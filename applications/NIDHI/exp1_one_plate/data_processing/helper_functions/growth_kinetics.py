@@ -0,0 +1,170 @@
+"""Growth-curve kinetics of every well
+
+Turns the long-form readings of collect_and_sort (or a ReadingStore) into
+one NaN-padded (wells x readings) array and computes, for all wells at
+once:
+
+    max_od     highest OD(590)
+    auc        area under the OD curve, OD * hours (trapezoid rule)
+    mu_max     max specific growth rate, 1/hour: steepest slope of a
+               least-squares fit of ln(OD) over `window` consecutive readings
+    lag_time   hours until the tangent at mu_max crosses the starting OD
+
+    python -m helper_functions.growth_kinetics -i <reading files dir> -o <summary.csv>
+"""
+
+import argparse
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from helper_functions.collect_info_and_sort_by_graph import GRAPH_KEYS, collect_and_sort
+from helper_functions.timestamps import apply_timestamps, load_timestamps
+
+# one growth curve per well of an inoculation
+WELL_KEYS = GRAPH_KEYS + ["set", "row", "well"]
+
+# readings below this OD are treated as noise in the ln(OD) fit
+MIN_OD = 0.005
+
+
+def well_curves(data):
+    """Returns (wells, hours, od): one row per well (WELL_KEYS) and two
+    (wells x readings) arrays of elapsed hours since the well's first reading
+    and OD, padded with NaN where a well has fewer readings"""
+    data = data.sort_values(WELL_KEYS + ["time"], kind="stable", ignore_index=True)
+    grouped = data.groupby(WELL_KEYS, sort=False)
+    well_index = grouped.ngroup().to_numpy()
+    reading_index = grouped.cumcount().to_numpy()
+
+    n_wells = well_index.max() + 1 if len(data) else 0
+    n_readings = reading_index.max() + 1 if len(data) else 0
+    times = np.full((n_wells, n_readings), np.nan)
+    od = np.full((n_wells, n_readings), np.nan)
+    times[well_index, reading_index] = data["time"].to_numpy(dtype=float)
+    od[well_index, reading_index] = data["od"].to_numpy(dtype=float)
+
+    wells = data.loc[reading_index == 0, WELL_KEYS].reset_index(drop=True)
+    hours = (times - times[:, :1]) / 3600
+    return wells, hours, od
+
+
+def max_growth_rate(hours, od, window=4, min_od=MIN_OD):
+    """Returns (mu_max, intercept, window start) of the steepest ln(OD)
+    line over `window` consecutive readings, per well (NaN if no window
+    has `window` usable readings)"""
+    n_wells, n_readings = od.shape
+    if n_readings < window:
+        nan = np.full(n_wells, np.nan)
+        return nan, nan, np.zeros(n_wells, dtype=int)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_od = np.where(od > min_od, np.log(od), np.nan)
+
+        # least squares slope of every window: (wells, windows, window)
+        x = sliding_window_view(hours, window, axis=1)
+        y = sliding_window_view(log_od, window, axis=1)
+        x_mean = x.mean(axis=2, keepdims=True)
+        y_mean = y.mean(axis=2, keepdims=True)
+        slopes = ((x - x_mean) * (y - y_mean)).sum(axis=2) / ((x - x_mean) ** 2).sum(
+            axis=2
+        )
+    slopes[~np.isfinite(slopes)] = -np.inf  # windows with padding or OD below min_od
+
+    best = slopes.argmax(axis=1)
+    rows = np.arange(n_wells)
+    mu_max = slopes[rows, best]
+    intercept = y_mean[rows, best, 0] - mu_max * x_mean[rows, best, 0]
+    no_fit = ~np.isfinite(mu_max)
+    mu_max[no_fit] = np.nan
+    intercept[no_fit] = np.nan
+    return mu_max, intercept, best
+
+
+def area_under_curve(hours, od):
+    """Trapezoid area of every well, ignoring NaN padding"""
+    segments = (hours[:, 1:] - hours[:, :-1]) * (od[:, 1:] + od[:, :-1]) / 2
+    return np.nansum(segments, axis=1)
+
+
+def kinetics(data, window=4, min_od=MIN_OD):
+    """Per-well kinetics (WELL_KEYS plus readings, max_od, auc, mu_max,
+    doubling_time and lag_time, times in hours) of long-form readings"""
+    wells, hours, od = well_curves(data)
+    mu_max, intercept, _ = max_growth_rate(hours, od, window=window, min_od=min_od)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        start_od = np.where(od[:, 0] > min_od, np.log(od[:, 0]), np.nan)
+        lag_time = np.clip((start_od - intercept) / mu_max, 0, None)
+        lag_time[~(mu_max > 0)] = np.nan
+        doubling_time = np.where(mu_max > 0, np.log(2) / mu_max, np.nan)
+
+    wells["readings"] = np.count_nonzero(~np.isnan(od), axis=1)
+    wells["max_od"] = np.nanmax(od, axis=1) if od.size else np.nan
+    wells["auc"] = area_under_curve(hours, od)
+    wells["mu_max"] = mu_max
+    wells["doubling_time"] = doubling_time
+    wells["lag_time"] = lag_time
+    return wells
+
+
+def plate_summary(well_kinetics):
+    """Mean and standard deviation of the kinetics of the replicate wells
+    of every set of every inoculation, one row per (experiment, plate,
+    inoculation, set)"""
+    summary = well_kinetics.groupby(GRAPH_KEYS + ["set"]).agg(
+        wells=("well", "count"),
+        max_od=("max_od", "mean"),
+        max_od_std=("max_od", "std"),
+        auc=("auc", "mean"),
+        auc_std=("auc", "std"),
+        mu_max=("mu_max", "mean"),
+        mu_max_std=("mu_max", "std"),
+        lag_time=("lag_time", "mean"),
+        lag_time_std=("lag_time", "std"),
+    )
+    return summary.reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("-i", help="input dirextory path")
+    parser.add_argument("-s", help="read from this columnar store instead of -i")
+    parser.add_argument(
+        "-o", help="output summary csv (per well kinetics go to <name>_wells.csv)"
+    )
+    parser.add_argument("--window", type=int, default=4, help="readings per ln(OD) fit")
+    parser.add_argument(
+        "--timestamps",
+        nargs="*",
+        default=[],
+        help="timestamp csvs/journals (or directories of them) written by the apps",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes used to parse the reading files",
+    )
+
+    args = parser.parse_args()
+    if args.s:
+        from helper_functions.reading_store import ReadingStore
+
+        data = ReadingStore(args.s).to_frame()
+    else:
+        data = collect_and_sort(args.i, workers=args.workers)
+    data = apply_timestamps(data, load_timestamps(*args.timestamps))
+
+    start = time.perf_counter()
+    well_kinetics = kinetics(data, window=args.window)
+    summary = plate_summary(well_kinetics)
+    print(f"{len(well_kinetics)} wells in {time.perf_counter() - start:.3f} s")
+
+    if args.o:
+        summary.to_csv(args.o, index=False)
+        well_kinetics.to_csv(args.o.removesuffix(".csv") + "_wells.csv", index=False)
+    else:
+        print(summary.to_string(index=False))
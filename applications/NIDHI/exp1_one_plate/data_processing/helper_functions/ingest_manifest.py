@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+from helper_functions.collect_info_and_sort_by_graph import (
+    COLUMNS,
+    GRAPH_KEYS,
+    combine_readings,
+    list_reading_files,
+    parse_filename,
+    read_reading_files,
+)
+
+MANIFEST_VERSION = 1
+
+
+def file_hash(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """Record of the reading files already ingested for an output directory
+
+    Stored next to the output directory as `<output>.manifest.json` (path,
+    size, mtime and sha256 of every ingested file) with the parsed readings
+    cached in `<output>.readings.pkl`. update() parses only files that are
+    new or whose size or mtime changed (mtime is the reading time, so a
+    touched file is re-read) and reports which graphs need redrawing.
+
+    The manifest also keeps the recorded reading times ({bmg filename: unix
+    time}, see timestamps.py) the graphs were last drawn with, so a changed
+    timestamp csv or journal marks the graphs of the files it moved.
+
+    With `cache_readings=False` (e.g. for a ReadingStore, which holds the
+    readings itself) only the file signatures are kept: read_changes()
+    returns the readings of the new and changed files and no pickle is
+    read or written.
+    """
+
+    def __init__(self, output_directory, cache_readings=True):
+        output_directory = Path(output_directory).resolve()
+        self.manifest_path = output_directory.with_name(
+            f"{output_directory.name}.manifest.json"
+        )
+        self.readings_path = output_directory.with_name(
+            f"{output_directory.name}.readings.pkl"
+        )
+        self.cache_readings = cache_readings
+        self.files = {}  # path -> {"size", "mtime_ns", "sha256", "group"}
+        self.timestamps = {}  # bmg filename -> recorded unix time applied to the graphs
+        self.readings = pd.DataFrame(columns=COLUMNS)
+        self.load()
+
+    def load(self):
+        """Reads the manifest and cached readings (starts empty if either is missing or stale)"""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                return
+            readings = (
+                pd.read_pickle(self.readings_path)
+                if self.cache_readings
+                else self.readings
+            )
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError) as e:
+            if self.manifest_path.exists():
+                print(
+                    f"Could not load ingestion manifest, re-ingesting everything: {e}"
+                )
+            return
+        self.files = manifest["files"]
+        self.timestamps = manifest.get("timestamps", {})
+        self.readings = readings
+
+    def save(self):
+        """Writes the manifest and cached readings (atomically)"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.cache_readings:
+            temp_readings = self.readings_path.with_name(
+                f".{self.readings_path.name}.tmp"
+            )
+            self.readings.to_pickle(temp_readings)
+            os.replace(temp_readings, self.readings_path)
+
+        temp_manifest = self.manifest_path.with_name(f".{self.manifest_path.name}.tmp")
+        with open(temp_manifest, "w") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "files": self.files,
+                    "timestamps": self.timestamps,
+                },
+                f,
+                indent=1,
+            )
+        os.replace(temp_manifest, self.manifest_path)
+
+    def changes(self, paths, rehash=False):
+        """Returns (changed, removed): paths that are new or changed since
+        they were ingested, and ingested paths that no longer exist. With
+        `rehash`, files with an unchanged size and mtime are also hashed."""
+        changed = []
+        for path in paths:
+            entry = self.files.get(path)
+            stat = os.stat(path)
+            if (
+                entry is None
+                or entry["size"] != stat.st_size
+                or entry["mtime_ns"] != stat.st_mtime_ns
+            ):
+                changed.append(path)
+            elif rehash and entry["sha256"] != file_hash(path):
+                changed.append(path)
+        current = set(paths)
+        removed = [path for path in self.files if path not in current]
+        return changed, removed
+
+    def read_changes(self, input_data_folder, workers=1, rehash=False):
+        """Parses the new and changed files of the folder and records them
+        in the manifest. Returns (frames, changed, removed, changed_groups):
+        the readings of each changed file, the changed and removed paths and
+        the graph keys (experiment, plate, inoculation) they belong to."""
+        paths = list_reading_files(input_data_folder)
+        changed, removed = self.changes(paths, rehash=rehash)
+        print(
+            f"ingesting {len(changed)} new or changed files, {len(removed)} removed, "
+            f"{len(paths) - len(changed)} unchanged"
+        )
+
+        changed_groups = set()
+        for path in changed + removed:
+            experiment_id, plate, inoculation, _ = parse_filename(
+                os.path.basename(path)
+            )
+            changed_groups.add((experiment_id, plate, inoculation))
+        frames = read_reading_files(changed, workers=workers)
+
+        for path in removed:
+            del self.files[path]
+        for path in changed:
+            stat = os.stat(path)
+            self.files[path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": file_hash(path),
+                "group": list(
+                    parse_filename(os.path.basename(path))[: len(GRAPH_KEYS)]
+                ),
+            }
+        return frames, changed, removed, changed_groups
+
+    def update_timestamps(self, timestamps):
+        """Records the recorded reading times the graphs are drawn with.
+        Returns the graph keys of ingested files whose recorded time was
+        added, changed or removed since the last call."""
+        moved = {
+            name
+            for name in set(self.timestamps) | set(timestamps)
+            if self.timestamps.get(name) != timestamps.get(name)
+        }
+        self.timestamps = dict(timestamps)
+        return {
+            tuple(entry["group"])
+            for path, entry in self.files.items()
+            if os.path.basename(path) in moved
+        }
+
+    def update(self, input_data_folder, workers=1, rehash=False, timestamps=None):
+        """Ingests new and changed files of the folder. Returns the readings
+        of every ingested file and the set of graph keys
+        (experiment, plate, inoculation) whose readings changed, including
+        graphs whose `timestamps` changed (see update_timestamps)."""
+        frames, changed, removed, changed_groups = self.read_changes(
+            input_data_folder, workers=workers, rehash=rehash
+        )
+        if timestamps is not None:
+            changed_groups |= self.update_timestamps(timestamps)
+        if changed or removed:
+            stale = set(changed) | set(removed)
+            kept = self.readings[~self.readings["file"].isin(stale)]
+            # an empty frame would turn every column into object dtype
+            self.readings = combine_readings(([kept] if len(kept) else []) + frames)
+        return self.readings, changed_groups
@@ -0,0 +1,334 @@
+"""Columnar on-disk store of bmg readings
+
+One raw binary file per column of the long-form readings (see COLUMNS),
+memory mapped on open, so analyses do not have to re-read thousands of
+small reading files. Text columns (experiment, reading, well, file) are
+stored as integer codes with their values in store.json.
+
+The store is append-only: ingesting new reading files appends their rows
+to the end of every column and rewrites only store.json. store.json keeps
+the row range of every ingested file and, per graph (experiment, plate,
+inoculation), its files' ranges in time order, so reading one graph's data
+is a few slices of the mapped arrays. A changed or removed file only drops
+its range; its old rows stay on disk until they outnumber the live rows,
+when the store is rewritten without them.
+
+    python -m helper_functions.reading_store ingest -i <reading files dir> -s <store dir>
+    python -m helper_functions.reading_store query -s <store dir> --plate 2
+
+Ingest is incremental: it keeps an IngestManifest (file signatures only,
+the readings live in the store) next to the store and only parses new or
+changed reading files.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helper_functions.collect_info_and_sort_by_graph import (
+    COLUMNS,
+    GRAPH_KEYS,
+    combine_readings,
+)
+from helper_functions.ingest_manifest import IngestManifest
+
+STORE_VERSION = 2
+METADATA_FILE = "store.json"
+
+# column -> on-disk dtype; text columns are stored as codes
+NUMERIC_COLUMNS = {
+    "plate": np.int16,
+    "inoculation": np.int8,
+    "time": np.float64,
+    "set": np.int8,
+    "row": np.int8,
+    "od": np.float32,
+}
+TEXT_COLUMNS = ["experiment", "reading", "well", "file"]
+CODE_DTYPE = np.int32
+
+# dropped rows are only compacted away once there are at least this many
+COMPACT_MIN_DEAD_ROWS = 1 << 16
+
+# rows of a batch are sorted so every file's rows are contiguous
+BATCH_ORDER = GRAPH_KEYS + ["time", "file", "row", "set"]
+
+
+def column_path(store_directory, column):
+    return Path(store_directory) / f"{column}.bin"
+
+
+def column_dtype(column):
+    return np.dtype(NUMERIC_COLUMNS.get(column, CODE_DTYPE))
+
+
+def empty_metadata():
+    return {
+        "version": STORE_VERSION,
+        "rows": 0,
+        "categories": {column: [] for column in TEXT_COLUMNS},
+        "files": {},
+    }
+
+
+def load_metadata(store_directory):
+    """store.json of a store directory (None if there is no store yet)"""
+    try:
+        with open(Path(store_directory) / METADATA_FILE) as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        return None
+    if metadata.get("version") != STORE_VERSION:
+        raise ValueError(
+            f"{store_directory} is store version {metadata.get('version')}, expected {STORE_VERSION}"
+        )
+    return metadata
+
+
+def save_metadata(store_directory, metadata):
+    """Writes store.json atomically. This commits an append: rows past
+    metadata["rows"] are ignored until then."""
+    temp_path = Path(store_directory) / f".{METADATA_FILE}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(metadata, f)
+    os.replace(temp_path, Path(store_directory) / METADATA_FILE)
+
+
+def _append_columns(store_directory, metadata, data):
+    """Appends sorted batch rows to every column file and records the row
+    range, time and graph of each file in metadata"""
+    offset = metadata["rows"]
+    for column in COLUMNS:
+        if column in NUMERIC_COLUMNS:
+            values = data[column].to_numpy(dtype=column_dtype(column))
+        else:
+            # codes of the store's categories, new values are added at the end
+            categories = metadata["categories"][column]
+            codes = {category: code for code, category in enumerate(categories)}
+            batch_codes, batch_values = pd.factorize(data[column].astype(str))
+            for value in batch_values:
+                if value not in codes:
+                    codes[value] = len(categories)
+                    categories.append(value)
+            values = np.array(
+                [codes[value] for value in batch_values], dtype=CODE_DTYPE
+            )[batch_codes]
+        with open(column_path(store_directory, column), "ab") as f:
+            # drop rows of an uncommitted append
+            f.truncate(offset * column_dtype(column).itemsize)
+            f.write(values.tobytes())
+
+    if len(data):
+        files = data["file"].to_numpy()
+        starts = np.flatnonzero(np.append(True, files[1:] != files[:-1]))
+        stops = np.append(starts[1:], len(data))
+        for start, stop in zip(starts, stops):
+            row = data.iloc[start]
+            metadata["files"][str(row["file"])] = [
+                offset + int(start),
+                offset + int(stop),
+                float(row["time"]),
+                [str(row["experiment"]), int(row["plate"]), int(row["inoculation"])],
+            ]
+    metadata["rows"] = offset + len(data)
+
+
+def _live_rows(metadata) -> int:
+    return sum(stop - start for start, stop, _, _ in metadata["files"].values())
+
+
+def write_store(data, store_directory):
+    """Writes long-form readings to a new store directory, replacing any
+    store there atomically"""
+    store_directory = Path(store_directory)
+    data = data.sort_values(BATCH_ORDER, kind="stable", ignore_index=True)
+
+    temp_directory = store_directory.with_name(f".{store_directory.name}.tmp")
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    temp_directory.mkdir(parents=True)
+    metadata = empty_metadata()
+    _append_columns(temp_directory, metadata, data)
+    save_metadata(temp_directory, metadata)
+
+    # swap the new store in
+    old_directory = store_directory.with_name(f".{store_directory.name}.old")
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if store_directory.exists():
+        os.replace(store_directory, old_directory)
+    os.replace(temp_directory, store_directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+
+def append_store(frames, store_directory, removed=()):
+    """Appends the long-form frames of newly read files to a store. Earlier
+    rows of the same files, and of the `removed` paths, are dropped. Only
+    the new rows and store.json are written, unless dropped rows outnumber
+    the live ones and the store is compacted."""
+    store_directory = Path(store_directory)
+    metadata = load_metadata(store_directory)
+    data = combine_readings(frames).sort_values(
+        BATCH_ORDER, kind="stable", ignore_index=True
+    )
+    for path in set(removed) | set(data["file"]):
+        metadata["files"].pop(path, None)
+    _append_columns(store_directory, metadata, data)
+
+    if metadata["rows"] - _live_rows(metadata) > max(
+        _live_rows(metadata), COMPACT_MIN_DEAD_ROWS
+    ):
+        write_store(ReadingStore(store_directory, metadata).to_frame(), store_directory)
+    else:
+        save_metadata(store_directory, metadata)
+
+
+class ReadingStore:
+    """Memory-mapped view of a store written by write_store/append_store"""
+
+    def __init__(self, store_directory, metadata=None):
+        self.directory = Path(store_directory)
+        metadata = metadata or load_metadata(self.directory)
+        if metadata is None:
+            raise FileNotFoundError(f"{self.directory / METADATA_FILE} does not exist")
+        self.rows = metadata["rows"]
+        self.categories = {
+            column: np.array(values, dtype=object)
+            for column, values in metadata["categories"].items()
+        }
+
+        # graph -> row ranges of its files, in time order
+        files = sorted(
+            metadata["files"].items(), key=lambda item: (item[1][2], item[0])
+        )
+        self.groups = {}
+        for _, (start, stop, _, group) in files:
+            self.groups.setdefault(tuple(group), []).append((start, stop))
+        self.columns = {
+            column: np.memmap(
+                column_path(self.directory, column),
+                dtype=column_dtype(column),
+                mode="r",
+                shape=(self.rows,),
+            )
+            if self.rows
+            else np.empty(0, dtype=column_dtype(column))
+            for column in COLUMNS
+        }
+
+    def __len__(self) -> int:
+        return sum(
+            stop - start for ranges in self.groups.values() for start, stop in ranges
+        )
+
+    def _frame(self, ranges):
+        """DataFrame (see COLUMNS) of the rows of the given (start, stop) ranges"""
+        if len(ranges) == 1:
+            rows = slice(*ranges[0])
+        else:
+            rows = np.concatenate(
+                [np.arange(start, stop) for start, stop in ranges] or [np.arange(0)]
+            )
+        data = {}
+        for column in COLUMNS:
+            values = self.columns[column][rows]
+            if column in self.categories:
+                values = self.categories[column][values]
+            data[column] = np.asarray(values)
+        return pd.DataFrame(data, columns=COLUMNS)
+
+    def group(self, experiment_id, plate, inoculation):
+        """Rows of one graph, in time order"""
+        return self._frame(self.groups[(experiment_id, plate, inoculation)])
+
+    def query(self, experiment_id=None, plate=None, inoculation=None):
+        """Rows matching every given field (all rows if none are given),
+        sorted by (experiment, plate, inoculation, time)"""
+        ranges = [
+            file_range
+            for (
+                group_experiment,
+                group_plate,
+                group_inoculation,
+            ), file_ranges in sorted(self.groups.items())
+            if experiment_id in (None, group_experiment)
+            and plate in (None, group_plate)
+            and inoculation in (None, group_inoculation)
+            for file_range in file_ranges
+        ]
+        return self._frame(ranges)
+
+    def to_frame(self):
+        """Every row of the store"""
+        return self.query()
+
+
+def ingest(
+    input_data_folder, store_directory, workers=1, rehash=False, timestamps=None
+):
+    """Adds the new and changed reading files of a folder to the store.
+    Returns the graph keys whose readings changed, or whose recorded
+    `timestamps` changed (see IngestManifest.update_timestamps)."""
+    manifest = IngestManifest(store_directory, cache_readings=False)
+    manifest.readings_path.unlink(missing_ok=True)  # readings cache of version 1 stores
+    try:
+        metadata = load_metadata(store_directory)
+    except ValueError as e:
+        print(f"{e}, rebuilding it")
+        metadata = None
+    if metadata is None:
+        manifest.files = {}  # (re)build the store from every file
+
+    frames, changed, removed, changed_groups = manifest.read_changes(
+        input_data_folder, workers=workers, rehash=rehash
+    )
+    if metadata is None:
+        write_store(combine_readings(frames), store_directory)
+    elif changed or removed:
+        append_store(frames, store_directory, removed=removed)
+    if timestamps is not None:
+        changed_groups |= manifest.update_timestamps(timestamps)
+    manifest.save()
+    return changed_groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="add reading files to the store")
+    ingest_parser.add_argument(
+        "-i", required=True, help="input directory of bmg reading files"
+    )
+    ingest_parser.add_argument("-s", required=True, help="store directory")
+    ingest_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes used to parse the reading files",
+    )
+
+    query_parser = commands.add_parser("query", help="print rows of the store")
+    query_parser.add_argument("-s", required=True, help="store directory")
+    query_parser.add_argument("--experiment", help="experiment id")
+    query_parser.add_argument("--plate", type=int)
+    query_parser.add_argument("--inoculation", type=int)
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        start = time.perf_counter()
+        changed_groups = ingest(args.i, args.s, workers=args.workers)
+        print(
+            f"{len(changed_groups)} graphs changed, ingest took {time.perf_counter() - start:.2f} s"
+        )
+    else:
+        start = time.perf_counter()
+        store = ReadingStore(args.s)
+        rows = store.query(args.experiment, args.plate, args.inoculation)
+        elapsed = time.perf_counter() - start
+        print(rows)
+        print(f"{len(rows)} of {len(store)} rows in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,91 @@
+"""Accurate reading times from the experiment apps
+
+The reading files' mtimes are only as good as the copy that brought them
+here. The exp2/exp3 apps record the end of every bmg run_assay step in
+{experiment_id}.journal and export it as {experiment_id}.csv ("bmg
+filename", "utc timestamp"). load_timestamps reads those into one
+{bmg filename: unix time} dict and apply_timestamps swaps them in for the
+mtimes, keeping the mtime of files the apps did not record.
+"""
+
+import csv
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helper_functions.collect_info_and_sort_by_graph import combine_readings
+
+BMG_READING = "bmg_reading"  # journal event of a bmg reading (see timestamp_journal.py)
+
+
+def _unix_time(timestamp):
+    """Unix time of a recorded timestamp, naive timestamps are UTC"""
+    moment = datetime.fromisoformat(timestamp.strip())
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _timestamp_files(paths):
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(path.glob("*.csv"))
+            yield from sorted(path.glob("*.journal"))
+        else:
+            yield path
+
+
+def load_timestamps(*paths):
+    """{bmg filename: unix time} of the timestamp csvs and journals given,
+    directories are searched for *.csv and *.journal"""
+    timestamps = {}
+    for path in _timestamp_files(paths):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                if path.suffix == ".journal":
+                    rows = (
+                        line.rstrip("\n").split("\t")[1:]
+                        for line in f
+                        if line.startswith(f"{BMG_READING}\t") and line.endswith("\n")
+                    )
+                else:
+                    reader = csv.reader(f)
+                    if next(reader, None) != ["bmg filename", "utc timestamp"]:
+                        continue  # some other csv
+                    rows = reader
+                for row in rows:
+                    if len(row) != 2:
+                        continue
+                    try:
+                        timestamps[row[0]] = _unix_time(row[1])
+                    except ValueError:
+                        print(f"{path}: bad timestamp for {row[0]}: {row[1]}")
+        except OSError as e:
+            print(f"Could not read timestamps from {path}: {e}")
+    return timestamps
+
+
+def apply_timestamps(data, timestamps):
+    """Long-form readings with the time of every recorded file replaced by
+    its recorded time, sorted by time again"""
+    if not timestamps or data.empty:
+        return data
+    # one dict lookup per file, then spread to the rows
+    codes, files = pd.factorize(data["file"])
+    file_times = np.array(
+        [timestamps.get(os.path.basename(file), np.nan) for file in files]
+    )
+    missing = np.isnan(file_times)
+    if missing.any():
+        print(
+            f"{missing.sum()} of {len(files)} files have no recorded timestamp, using mtime"
+        )
+    recorded = file_times[codes]
+    data = data.assign(
+        time=np.where(np.isnan(recorded), data["time"].to_numpy(dtype=float), recorded)
+    )
+    return combine_readings([data])
@@ -0,0 +1,246 @@
+"""Live graphs of a running experiment
+
+Polls the reading directory, reads every new bmg file as soon as it has
+stopped growing, redraws only the graphs of its (experiment, plate,
+inoculation) and serves the graphs on a small local web page:
+
+    python main.py -i <reading files dir> -o <graphs dir> --watch --port 8050
+
+then open http://localhost:8050 (the page is only served to this PC
+unless --host is given; 8000 is taken by the WEI server). Starts from the
+ingestion manifest of the output directory, so only files that arrived
+since the last run are read, and saves it again on Ctrl+C. Each poll only
+re-lists directories whose mtime changed (see ReadingFilePoller). A file
+that cannot be read is only retried once its size or mtime changes.
+Timestamp journals given with --timestamps are re-read whenever new files
+arrive, so the graphs use the times the apps recorded.
+"""
+
+import html
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from helper_functions.collect_info_and_sort_by_graph import (
+    COLUMNS,
+    GRAPH_KEYS,
+    combine_readings,
+    graph_groups,
+    parse_filename,
+    read_reading_file,
+)
+from helper_functions.graph import graph
+from helper_functions.ingest_manifest import IngestManifest, file_hash
+from helper_functions.timestamps import apply_timestamps, load_timestamps
+
+INDEX_FILE = "index.html"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+
+
+class ReadingFilePoller:
+    """Lists the reading files under a folder without walking the whole
+    tree on every poll. A directory is only re-listed when its mtime
+    changed (a file or sub-folder was added, removed or renamed in it), so
+    a poll costs one stat per directory. Every `full_scan_every` polls
+    every directory is re-listed and every file checked again, which also
+    catches files edited in place."""
+
+    def __init__(self, folder, full_scan_every=30):
+        self.folder = folder
+        self.full_scan_every = full_scan_every
+        self._polls = 0
+        self._directories = {}  # directory -> (mtime_ns, reading file paths, sub-directories)
+
+    def _list(self, directory):
+        paths, subdirectories = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if not entry.name.startswith("."):
+                        subdirectories.append(entry.path)
+                elif (
+                    entry.name.endswith(".txt")
+                    and parse_filename(entry.name) is not None
+                ):
+                    paths.append(entry.path)
+        return paths, subdirectories
+
+    def poll(self):
+        """Returns (reading file paths, whether this was a full scan)"""
+        full = self._polls % self.full_scan_every == 0
+        self._polls += 1
+        paths = []
+        seen = {}
+        directories = [self.folder]
+        while directories:
+            directory = directories.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+                cached = self._directories.get(directory)
+                if full or cached is None or cached[0] != mtime:
+                    cached = (mtime, *self._list(directory))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            seen[directory] = cached
+            paths.extend(cached[1])
+            directories.extend(cached[2])
+        self._directories = seen
+        return sorted(paths), full
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, port, host=DEFAULT_HOST):
+    """Serves a directory over http in a background thread"""
+    server = ThreadingHTTPServer(
+        (host, port), partial(QuietHandler, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(
+        f"Serving graphs on http://{server.server_address[0]}:{server.server_address[1]}"
+    )
+    return server
+
+
+def write_index(output_directory, groups, updated, refresh=10):
+    """Writes the web page listing the graphs of every group, newest first"""
+    sections = []
+    for key in sorted(groups, key=lambda key: -updated.get(key, 0)):
+        experiment_id, plate, inoculation = key
+        readings = groups[key]["file"].nunique()
+        images = "".join(
+            f'<img src="{html.escape(name)}.png?v={int(updated.get(key, 0))}" width="400">'
+            for name in (
+                f"{experiment_id}_{plate}_{inoculation}_set{set_num}"
+                for set_num in sorted(groups[key]["set"].unique())
+            )
+        )
+        stamp = (
+            time.strftime("%H:%M:%S", time.localtime(updated[key]))
+            if key in updated
+            else "-"
+        )
+        sections.append(
+            f"<h3>{html.escape(str(experiment_id))} plate {plate} inoculation {inoculation}"
+            f" &mdash; {readings} readings, updated {stamp}</h3>{images}"
+        )
+    page = (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><meta http-equiv="refresh" content="{refresh}">'
+        f"<title>Growth curves</title></head><body><h2>Growth curves</h2>"
+        f"<p>last update {time.strftime('%Y-%m-%d %H:%M:%S')}</p>{''.join(sections)}</body></html>"
+    )
+    temp_path = os.path.join(output_directory, f".{INDEX_FILE}.tmp")
+    with open(temp_path, "w") as f:
+        f.write(page)
+    os.replace(temp_path, os.path.join(output_directory, INDEX_FILE))
+
+
+def watch(
+    input_data_folder,
+    output_directory,
+    interval=2.0,
+    port=DEFAULT_PORT,
+    host=DEFAULT_HOST,
+    workers=1,
+    timestamp_paths=(),
+):
+    """Keeps the graphs of output_directory up to date until Ctrl+C"""
+    os.makedirs(output_directory, exist_ok=True)
+
+    # catch up from the manifest, drawing only graphs that changed while we were away
+    manifest = IngestManifest(output_directory)
+    timestamps = load_timestamps(*timestamp_paths)
+    data, changed_groups = manifest.update(
+        input_data_folder, workers=workers, timestamps=timestamps
+    )
+    groups = {key: rows for key, rows in graph_groups(data)}
+    updated = {}
+    for key in sorted(changed_groups & set(groups)):
+        graph(apply_timestamps(groups[key], timestamps), output_directory)
+        updated[key] = time.time()
+    manifest.save()
+    write_index(output_directory, groups, updated)
+
+    server = serve(output_directory, port, host) if port is not None else None
+    poller = ReadingFilePoller(input_data_folder)
+    pending = {}  # path -> (size, mtime_ns) seen on the previous poll
+    failed = {}  # path -> (size, mtime_ns) it could not be read at, retried once it changes
+    print(f"Watching {input_data_folder} every {interval:g} s, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(interval)
+            ready = []
+            paths, full_scan = poller.poll()
+            for path in paths:
+                # between full scans only files not ingested yet are checked
+                entry = manifest.files.get(path)
+                if entry is not None and not full_scan and path not in pending:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if (
+                    entry is not None
+                    and (entry["size"], entry["mtime_ns"]) == signature
+                ):
+                    continue
+                if failed.get(path) == signature:
+                    continue
+                # only read a file once it looks the same on two polls in a row
+                if pending.get(path) == signature:
+                    ready.append((path, signature))
+                    del pending[path]
+                else:
+                    pending[path] = signature
+
+            changed = set()
+            for path, signature in ready:
+                try:
+                    rows = read_reading_file(path)
+                except Exception as e:
+                    # DO NOT stop watching because of one bad file
+                    print(f"Could not read {path}: {e} (retried when it changes)")
+                    failed[path] = signature
+                    continue
+                failed.pop(path, None)
+                key = parse_filename(os.path.basename(path))[: len(GRAPH_KEYS)]
+                old_rows = groups.get(key, pd.DataFrame(columns=COLUMNS))
+                groups[key] = combine_readings(
+                    [old_rows[old_rows["file"] != path], rows]
+                )
+                stat = os.stat(path)
+                manifest.files[path] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": file_hash(path),
+                    "group": list(key),
+                }
+                changed.add(key)
+
+            if changed:
+                timestamps = load_timestamps(*timestamp_paths)
+                changed |= manifest.update_timestamps(timestamps) & set(groups)
+            for key in sorted(changed):
+                start = time.perf_counter()
+                graph(apply_timestamps(groups[key], timestamps), output_directory)
+                updated[key] = time.time()
+                print(f"redrew {key} in {time.perf_counter() - start:.2f} s")
+            if changed:
+                write_index(output_directory, groups, updated)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        if server is not None:
+            server.shutdown()
+        manifest.readings = combine_readings(list(groups.values()))
+        manifest.save()
@@ -1,28 +1,88 @@
 import argparse
-from helper_functions.collect_info_and_sort_by_graph import collect_and_sort
-from helper_functions.graph import graph
+from helper_functions.collect_info_and_sort_by_graph import collect_and_sort, graph_groups
+from helper_functions.graph import graph_all
+from helper_functions.ingest_manifest import IngestManifest
+from helper_functions.reading_store import ReadingStore, ingest
+from helper_functions.timestamps import apply_timestamps, load_timestamps
+from helper_functions.watch import DEFAULT_HOST, DEFAULT_PORT, watch
 
 # import numpy as np
 # from pathlib import Path
 
 
-def graph_results(input_file_dir, output_graphs_dir):
-    data_sorted_by_graph = collect_and_sort(input_file_dir)
+def graph_results(input_file_dir, output_graphs_dir, workers=1, full=False, rehash=False, store=None, timestamps=None):
+    """Graphs the readings of input_file_dir. Only files that are new or
+    changed since the last run are parsed and only their graphs redrawn,
+    unless `full` is set. With a `store` directory the readings are also
+    ingested into the columnar store and graphed from it. `timestamps`
+    ({bmg filename: unix time}, see load_timestamps) replace file mtimes."""
+    if store is not None:
+        changed_groups = ingest(input_file_dir, store, workers=workers, rehash=rehash, timestamps=timestamps or {})
+        reading_store = ReadingStore(store)
+        groups = (
+            apply_timestamps(reading_store.group(*key), timestamps)
+            for key in sorted(reading_store.groups)
+            if full or key in changed_groups
+        )
+        graph_all(groups, output_graphs_dir, workers=workers)
+        return
 
-    # Testing
-    for set in data_sorted_by_graph:
-        if len(set) > 0:
-            graph(set, output_graphs_dir)
+    if full:
+        data = collect_and_sort(input_file_dir, workers=workers)
+        changed_groups = None
+    else:
+        manifest = IngestManifest(output_graphs_dir)
+        data, changed_groups = manifest.update(input_file_dir, workers=workers, rehash=rehash, timestamps=timestamps or {})
+    data = apply_timestamps(data, timestamps)
+
+    groups = (
+        data_for_one_graph
+        for key, data_for_one_graph in graph_groups(data)
+        if changed_groups is None or key in changed_groups
+    )
+    graph_all(groups, output_graphs_dir, workers=workers)
+
+    if not full:
+        manifest.save()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("-i", help="input dirextory path")
+    parser.add_argument("-i", help="input dirextory path (sub-folders are read too)")
     parser.add_argument("-o", help="output graphs directory")
+    parser.add_argument("--workers", type=int, default=1, help="processes used to parse the reading files and draw the graphs")
+    parser.add_argument("--full", action="store_true", help="re-read every file and redraw every graph")
+    parser.add_argument("--rehash", action="store_true", help="also re-read files whose contents changed without a new mtime")
+    parser.add_argument("--store", help="columnar store directory to ingest into and graph from")
+    parser.add_argument("--timestamps", nargs="*", default=[], help="timestamp csvs/journals (or directories of them) written by the apps")
+    parser.add_argument("--watch", action="store_true", help="keep redrawing graphs as new readings arrive")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port of the --watch web page")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address the --watch web page is served on (0.0.0.0 for every interface)")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between --watch polls")
 
     args = parser.parse_args()
     input_file_dir = args.i
     output_graphs_dir = args.o
+    timestamps = load_timestamps(*args.timestamps)
 
-    graph_results(input_file_dir, output_graphs_dir)
+    if args.watch:
+        watch(
+            input_file_dir,
+            output_graphs_dir,
+            interval=args.interval,
+            port=args.port,
+            host=args.host,
+            workers=args.workers,
+            timestamp_paths=args.timestamps,
+        )
+    else:
+        graph_results(
+            input_file_dir,
+            output_graphs_dir,
+            workers=args.workers,
+            full=args.full,
+            rehash=args.rehash,
+            store=args.store,
+            timestamps=timestamps,
+        )
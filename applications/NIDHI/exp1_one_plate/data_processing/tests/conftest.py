@@ -0,0 +1,30 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# helper_functions is imported from the data_processing directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+READING_TIME = 1_700_000_000
+
+
+@pytest.fixture
+def write_reading():
+    """Writes a bmg reading file (an OD grid, 0.1 + column / 100 + row / 10
+    unless given) with its mtime set to the reading time"""
+
+    def write(path, od=None, mtime=READING_TIME):
+        path = Path(path)
+        if od is None:
+            od = 0.1 + np.arange(12) / 100 + np.arange(8)[:, None] / 10
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            "\n".join(",".join(f"{value:.4f}" for value in row) for row in od) + "\n"
+        )
+        os.utime(path, (mtime, mtime))
+        return str(path)
+
+    return write
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from helper_functions.collect_info_and_sort_by_graph import (
+    COLUMNS,
+    WHOLE_PLATE,
+    collect_and_sort,
+    inoculation_columns,
+    list_reading_files,
+    parse_filename,
+    read_reading_file,
+)
+
+
+@pytest.mark.parametrize(
+    "filename, expected",
+    [
+        ("SUB4_2_3_12.txt", ("SUB4", 2, 3, "12")),
+        ("SUB4_2_3_T12.txt", ("SUB4", 2, 3, "T12")),
+        # exp2/exp3 app names, the experiment id may contain underscores
+        (
+            "Substrate_1712345678_01HXYZ_run_2_exp3_1_T4.txt",
+            ("01HXYZ_run_2_exp3", 1, WHOLE_PLATE, "T4"),
+        ),
+        (
+            "Substrate_1712345678_01HXYZ_exp2_2_contam.txt",
+            ("01HXYZ_exp2", 2, 0, "contam"),
+        ),
+        ("SUB4_2_3_12.csv", None),
+        ("SUB4_two_3_12.txt", None),
+        ("notes.txt", None),
+    ],
+)
+def test_parse_filename(filename, expected):
+    assert parse_filename(filename) == expected
+
+
+def test_inoculation_columns():
+    assert inoculation_columns(1) == [0, 4, 8]
+    assert inoculation_columns(4) == [3, 7, 11]
+    assert inoculation_columns(WHOLE_PLATE) == list(range(12))
+
+
+def test_read_reading_file_keeps_the_inoculations_wells(tmp_path, write_reading):
+    path = write_reading(tmp_path / "SUB4_2_3_12.txt", mtime=1_700_000_123)
+
+    rows = read_reading_file(path)
+
+    assert list(rows.columns) == COLUMNS
+    assert len(rows) == 8 * 3
+    assert list(rows["well"][:4]) == ["A3", "A7", "A11", "B3"]
+    assert list(rows["set"][:4]) == [1, 2, 3, 1]
+    np.testing.assert_allclose(rows["od"][:4], [0.12, 0.16, 0.20, 0.22])
+    assert (rows["time"] == 1_700_000_123).all()
+    assert (rows["experiment"] == "SUB4").all()
+    assert set(rows["inoculation"]) == {3}
+    assert set(rows["file"]) == {path}
+
+
+def test_whole_plate_files_keep_every_well(tmp_path, write_reading):
+    path = write_reading(tmp_path / "Substrate_1712345678_01HXYZ_exp2_1_T4.txt")
+
+    rows = read_reading_file(path)
+
+    assert len(rows) == 96
+    assert rows["well"].iloc[-1] == "H12"
+
+
+def test_list_reading_files_reads_sub_folders(tmp_path, write_reading):
+    flat = write_reading(tmp_path / "SUB4_1_1_1.txt")
+    routed = write_reading(tmp_path / "SUB4" / "plate_2" / "SUB4_2_1_1.txt")
+    write_reading(tmp_path / ".hidden" / "SUB4_3_1_1.txt")
+    (tmp_path / "notes.txt").write_text("not a reading")
+
+    assert list_reading_files(tmp_path) == sorted([flat, routed])
+    assert list_reading_files(tmp_path / "missing") == []
+
+
+def test_collect_and_sort_orders_by_reading_time(tmp_path, write_reading):
+    write_reading(tmp_path / "SUB4_1_1_2.txt", mtime=2000)
+    write_reading(tmp_path / "SUB4_1_1_1.txt", mtime=1000)
+
+    data = collect_and_sort(tmp_path)
+
+    assert list(data["reading"].drop_duplicates()) == ["1", "2"]
+    assert data["time"].is_monotonic_increasing
+    assert data.equals(collect_and_sort(tmp_path, workers=2))
@@ -0,0 +1,93 @@
+import os
+
+from helper_functions.collect_info_and_sort_by_graph import collect_and_sort
+from helper_functions.ingest_manifest import IngestManifest
+
+
+def test_update_reads_only_new_and_changed_files(tmp_path, write_reading, capsys):
+    input_folder = tmp_path / "readings"
+    write_reading(input_folder / "SUB4_1_1_1.txt", mtime=1000)
+    write_reading(input_folder / "SUB4_1_2_1.txt", mtime=2000)
+    output = tmp_path / "graphs"
+
+    manifest = IngestManifest(output)
+    readings, changed = manifest.update(input_folder)
+    manifest.save()
+    assert changed == {("SUB4", 1, 1), ("SUB4", 1, 2)}
+    assert readings.equals(collect_and_sort(input_folder))
+    capsys.readouterr()
+
+    write_reading(input_folder / "SUB4_2_1_1.txt", mtime=3000)
+    manifest = IngestManifest(output)
+    readings, changed = manifest.update(input_folder)
+    manifest.save()
+
+    assert changed == {("SUB4", 2, 1)}
+    assert "ingesting 1 new or changed files, 0 removed, 2 unchanged" in (
+        capsys.readouterr().out
+    )
+    assert readings.equals(collect_and_sort(input_folder))
+
+
+def test_removed_files_leave_the_cached_readings(tmp_path, write_reading):
+    input_folder = tmp_path / "readings"
+    write_reading(input_folder / "SUB4_1_1_1.txt", mtime=1000)
+    removed = write_reading(input_folder / "SUB4_1_2_1.txt", mtime=2000)
+    manifest = IngestManifest(tmp_path / "graphs")
+    manifest.update(input_folder)
+    manifest.save()
+
+    os.remove(removed)
+    manifest = IngestManifest(tmp_path / "graphs")
+    readings, changed = manifest.update(input_folder)
+
+    assert changed == {("SUB4", 1, 2)}
+    assert removed not in set(readings["file"])
+    assert removed not in manifest.files
+
+
+def test_rehash_finds_edits_that_kept_the_mtime(tmp_path, write_reading):
+    input_folder = tmp_path / "readings"
+    path = write_reading(input_folder / "SUB4_1_1_1.txt", mtime=1000)
+    manifest = IngestManifest(tmp_path / "graphs")
+    manifest.update(input_folder)
+
+    with open(path, "r+") as f:
+        f.write("0.9")  # same size
+    os.utime(path, (1000, 1000))
+
+    assert manifest.changes([path]) == ([], [])
+    assert manifest.changes([path], rehash=True) == ([path], [])
+
+
+def test_update_timestamps_reports_graphs_of_moved_readings(tmp_path, write_reading):
+    input_folder = tmp_path / "readings"
+    write_reading(input_folder / "SUB4_1_1_1.txt")
+    write_reading(input_folder / "SUB4_2_1_1.txt")
+    manifest = IngestManifest(tmp_path / "graphs")
+    manifest.update(input_folder, timestamps={"SUB4_1_1_1.txt": 10.0})
+    manifest.save()
+
+    manifest = IngestManifest(tmp_path / "graphs")
+    assert manifest.timestamps == {"SUB4_1_1_1.txt": 10.0}
+    assert manifest.update_timestamps({"SUB4_1_1_1.txt": 10.0}) == set()
+    assert manifest.update_timestamps({"SUB4_2_1_1.txt": 20.0}) == {
+        ("SUB4", 1, 1),
+        ("SUB4", 2, 1),
+    }
+    # files that were never ingested don't mark a graph
+    assert manifest.update_timestamps({"SUB4_9_1_1.txt": 30.0}) == {("SUB4", 2, 1)}
+
+
+def test_a_stale_manifest_starts_again(tmp_path, write_reading):
+    input_folder = tmp_path / "readings"
+    write_reading(input_folder / "SUB4_1_1_1.txt")
+    manifest = IngestManifest(tmp_path / "graphs")
+    manifest.update(input_folder)
+    manifest.save()
+    manifest.readings_path.write_bytes(b"not a pickle")
+
+    manifest = IngestManifest(tmp_path / "graphs")
+
+    assert manifest.files == {}
+    assert manifest.update(input_folder)[1] == {("SUB4", 1, 1)}
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from helper_functions.plate_reader import PlateShapeError, read_plate, read_plates
+
+
+def write(path, text):
+    path.write_text(text)
+    return path
+
+
+def grid(rows, columns):
+    return np.arange(rows * columns, dtype=np.float64).reshape(rows, columns) / 100
+
+
+def csv(values):
+    return "\n".join(",".join(f"{value:.2f}" for value in row) for row in values) + "\n"
+
+
+@pytest.mark.parametrize("shape", [(8, 12), (16, 24)])
+def test_read_plate_matches_pandas(tmp_path, shape):
+    path = write(tmp_path / "plate.txt", csv(grid(*shape)))
+
+    od = read_plate(path)
+
+    assert od.shape == shape
+    assert od.dtype == np.float32
+    np.testing.assert_array_equal(
+        od, pd.read_csv(path, header=None).to_numpy(dtype=np.float32)
+    )
+
+
+def test_trailing_commas_spaces_and_blank_lines(tmp_path):
+    lines = csv(grid(8, 12)).splitlines()
+    text = "\n".join(line.replace(",", ", ") + "," for line in lines) + "\n\n"
+    path = write(tmp_path / "plate.txt", text)
+
+    np.testing.assert_array_equal(read_plate(path, dtype=np.float64), grid(8, 12))
+
+
+def test_blank_cells_are_nan(tmp_path):
+    lines = csv(grid(8, 12)).splitlines()
+    lines[0] = "," + lines[0].split(",", 1)[1]
+    lines[1] = lines[1].rsplit(",", 1)[0] + ","
+    fields = lines[2].split(",")
+    fields[1] = ""
+    lines[2] = ",".join(fields)
+    path = write(tmp_path / "plate.txt", "\n".join(lines))
+
+    od = read_plate(path)
+
+    assert np.isnan(od[0, 0])
+    assert np.isnan(od[1, 11])
+    assert np.isnan(od[2, 1])
+    assert np.isnan(od).sum() == 3
+    np.testing.assert_array_equal(
+        od, pd.read_csv(path, header=None).to_numpy(dtype=np.float32)
+    )
+
+
+def test_a_transposed_export_is_an_error(tmp_path):
+    path = write(tmp_path / "plate.txt", csv(grid(12, 8)))
+
+    with pytest.raises(PlateShapeError, match="12 rows"):
+        read_plate(path)
+
+
+def test_a_short_row_is_an_error(tmp_path):
+    lines = csv(grid(8, 12)).splitlines()
+    lines[3] = lines[3].rsplit(",", 2)[0]
+    path = write(tmp_path / "plate.txt", "\n".join(lines))
+
+    with pytest.raises(PlateShapeError, match="line 4 has 10 values"):
+        read_plate(path)
+
+
+def test_a_value_that_is_not_a_number_names_its_row(tmp_path):
+    lines = csv(grid(8, 12)).splitlines()
+    lines[5] = lines[5].replace("0.60", "OVRFLW")
+    path = write(tmp_path / "plate.txt", "\n".join(lines))
+
+    with pytest.raises(PlateShapeError, match="row 6"):
+        read_plate(path)
+
+
+def test_shape_is_checked_when_given(tmp_path):
+    path = write(tmp_path / "plate.txt", csv(grid(8, 12)))
+
+    with pytest.raises(PlateShapeError):
+        read_plate(path, shape=(16, 24))
+
+
+def test_read_plates_stacks_files(tmp_path):
+    paths = [write(tmp_path / f"plate_{i}.txt", csv(grid(8, 12) + i)) for i in range(3)]
+
+    plates = read_plates(paths)
+
+    assert plates.shape == (3, 8, 12)
+    np.testing.assert_allclose(plates[2], grid(8, 12) + 2, rtol=1e-6)
+    assert read_plates([]).shape == (0, 8, 12)
@@ -0,0 +1,184 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helper_functions import reading_store
+from helper_functions.collect_info_and_sort_by_graph import COLUMNS, collect_and_sort
+from helper_functions.reading_store import (
+    METADATA_FILE,
+    ReadingStore,
+    column_path,
+    ingest,
+    load_metadata,
+)
+
+
+def expected_rows(input_folder, **query):
+    """What the store should hold: the reading files parsed directly"""
+    data = collect_and_sort(input_folder)
+    for column, value in query.items():
+        data = data[data[column] == value]
+    data = data.sort_values(
+        ["experiment", "plate", "inoculation", "time", "file", "row", "set"],
+        kind="stable",
+        ignore_index=True,
+    )
+    return data.astype({"od": np.float32})
+
+
+def assert_same_rows(store_rows, expected):
+    assert list(store_rows.columns) == COLUMNS
+    assert len(store_rows) == len(expected)
+    for column in COLUMNS:
+        if column == "od":
+            np.testing.assert_allclose(store_rows[column], expected[column], rtol=1e-6)
+        else:
+            assert list(store_rows[column]) == list(expected[column]), column
+
+
+@pytest.fixture
+def folders(tmp_path, write_reading):
+    input_folder = tmp_path / "readings"
+    for plate in (1, 2):
+        for inoculation in (1, 2):
+            for reading in (1, 2, 3):
+                write_reading(
+                    input_folder / f"SUB4_{plate}_{inoculation}_{reading}.txt",
+                    mtime=1_700_000_000 + inoculation * 86400 + reading * 1800,
+                )
+    return input_folder, tmp_path / "store"
+
+
+def test_ingest_builds_a_store_of_every_file(folders):
+    input_folder, store_folder = folders
+
+    changed = ingest(input_folder, store_folder)
+
+    assert changed == {("SUB4", plate, inoc) for plate in (1, 2) for inoc in (1, 2)}
+    store = ReadingStore(store_folder)
+    assert len(store) == 12 * 24
+    assert_same_rows(store.to_frame(), expected_rows(input_folder))
+    assert_same_rows(store.query(plate=2), expected_rows(input_folder, plate=2))
+    assert_same_rows(
+        store.group("SUB4", 1, 2), expected_rows(input_folder, plate=1, inoculation=2)
+    )
+    assert len(store.query(experiment_id="other")) == 0
+
+
+def test_ingest_appends_only_new_files(folders, write_reading):
+    input_folder, store_folder = folders
+    ingest(input_folder, store_folder)
+    old_plates = column_path(store_folder, "plate").read_bytes()
+
+    assert ingest(input_folder, store_folder) == set()
+    new_file = write_reading(input_folder / "SUB4_1_1_4.txt", mtime=1_700_200_000)
+    changed = ingest(input_folder, store_folder)
+
+    assert changed == {("SUB4", 1, 1)}
+    # earlier rows are left as they were, the new ones added at the end
+    plates = column_path(store_folder, "plate").read_bytes()
+    assert plates.startswith(old_plates)
+    assert len(plates) == len(old_plates) + 24 * np.dtype(np.int16).itemsize
+    store = ReadingStore(store_folder)
+    assert list(store.group("SUB4", 1, 1)["file"].drop_duplicates())[-1] == new_file
+    assert_same_rows(store.to_frame(), expected_rows(input_folder))
+
+
+def test_changed_and_removed_files_drop_their_old_rows(folders, write_reading):
+    input_folder, store_folder = folders
+    ingest(input_folder, store_folder)
+
+    write_reading(
+        input_folder / "SUB4_2_1_2.txt",
+        od=np.full((8, 12), 0.5),
+        mtime=1_700_000_000 + 86400 + 2 * 1800 + 60,
+    )
+    (input_folder / "SUB4_1_2_3.txt").unlink()
+    changed = ingest(input_folder, store_folder)
+
+    assert changed == {("SUB4", 2, 1), ("SUB4", 1, 2)}
+    store = ReadingStore(store_folder)
+    assert len(store) == 11 * 24
+    assert_same_rows(store.to_frame(), expected_rows(input_folder))
+    # the replaced rows are still on disk until the store is compacted
+    assert store.rows == 13 * 24
+
+
+def test_dead_rows_are_compacted_once_they_outnumber_live_ones(
+    folders, write_reading, monkeypatch
+):
+    input_folder, store_folder = folders
+    ingest(input_folder, store_folder)
+    monkeypatch.setattr(reading_store, "COMPACT_MIN_DEAD_ROWS", 0)
+
+    for path in sorted(input_folder.iterdir()):
+        write_reading(path, mtime=path.stat().st_mtime + 60)
+    ingest(input_folder, store_folder)
+    assert ReadingStore(store_folder).rows == 2 * 12 * 24
+
+    for path in sorted(input_folder.glob("SUB4_2_*.txt")):
+        path.unlink()
+    ingest(input_folder, store_folder)
+
+    store = ReadingStore(store_folder)
+    assert store.rows == len(store) == 6 * 24
+    assert_same_rows(store.to_frame(), expected_rows(input_folder))
+
+
+def test_an_uncommitted_append_is_overwritten(folders, write_reading):
+    input_folder, store_folder = folders
+    ingest(input_folder, store_folder)
+    # rows written by an append that crashed before store.json was saved
+    for column in COLUMNS:
+        with open(column_path(store_folder, column), "ab") as f:
+            f.write(b"\xff" * 40)
+
+    write_reading(input_folder / "SUB4_1_1_4.txt", mtime=1_700_200_000)
+    ingest(input_folder, store_folder)
+
+    assert_same_rows(ReadingStore(store_folder).to_frame(), expected_rows(input_folder))
+
+
+def test_a_store_of_another_version_is_rebuilt(folders):
+    input_folder, store_folder = folders
+    ingest(input_folder, store_folder)
+    metadata_path = store_folder / METADATA_FILE
+    metadata = json.loads(metadata_path.read_text())
+    metadata["version"] = 1
+    metadata_path.write_text(json.dumps(metadata))
+
+    with pytest.raises(ValueError):
+        load_metadata(store_folder)
+    ingest(input_folder, store_folder)
+
+    assert load_metadata(store_folder)["version"] == reading_store.STORE_VERSION
+    assert_same_rows(ReadingStore(store_folder).to_frame(), expected_rows(input_folder))
+
+
+def test_changed_timestamps_mark_their_graphs(folders):
+    input_folder, store_folder = folders
+    ingest(input_folder, store_folder, timestamps={})
+
+    changed = ingest(
+        input_folder, store_folder, timestamps={"SUB4_2_2_1.txt": 1_700_100_000.0}
+    )
+
+    assert changed == {("SUB4", 2, 2)}
+    assert (
+        ingest(
+            input_folder, store_folder, timestamps={"SUB4_2_2_1.txt": 1_700_100_000.0}
+        )
+        == set()
+    )
+
+
+def test_an_empty_folder_gives_an_empty_store(tmp_path):
+    (tmp_path / "readings").mkdir()
+
+    ingest(tmp_path / "readings", tmp_path / "store")
+
+    store = ReadingStore(tmp_path / "store")
+    assert len(store) == 0
+    assert isinstance(store.to_frame(), pd.DataFrame)
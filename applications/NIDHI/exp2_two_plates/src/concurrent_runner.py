@@ -0,0 +1,171 @@
+"""Concurrent workflow runner for multi-plate experiments
+
+Each plate is described as a pipeline: a generator that yields
+(workflow, payload) pairs and receives the finished run_info for each one,
+e.g.
+
+    def plate_steps():
+        run_info = yield incubator_to_run_bmg_wf, payload
+        ...
+        yield bmg_to_run_incubator_wf, payload
+
+The runner submits runs to the WEI server without blocking, polls them for
+completion and starts any waiting run whose modules and locations (see
+resource_analyzer) are not held by another plate. Plates that only need
+their own OT-2 or incubator floor then run at the same time as the other
+plates' PF400/BMG work.
+"""
+
+import time
+from collections import defaultdict
+
+from wei.types.workflow_types import WorkflowRun, WorkflowStatus
+
+from resource_analyzer import LockTable, resolve_workflow_resources
+
+FINISHED_STATUSES = (
+    WorkflowStatus.COMPLETED,
+    WorkflowStatus.FAILED,
+    WorkflowStatus.CANCELLED,
+)
+
+
+class ConcurrentRunner:
+    """Runs several plate pipelines at once, never letting two plates' runs
+    share a module or a location
+
+    Waiting runs are started in submission order, except that a pipeline's
+    next run goes to the front of the queue as soon as its previous run
+    finishes, so a plate left in a shared instrument (e.g. the BMG) is moved
+    on as soon as possible. Locations a plate's run leaves occupied stay
+    locked to that plate until one of its later runs clears them.
+    """
+
+    def __init__(
+        self, experiment_client, polling_interval=2.0, sleep=time.sleep, clock=time.time
+    ):
+        self.experiment_client = experiment_client
+        self.polling_interval = polling_interval
+        self.sleep = sleep
+        self.clock = clock
+
+        self.locks = LockTable()
+        self.results = {}  # pipeline name -> value returned by its generator
+        self._pipelines = {}  # pipeline name -> generator
+        self._pipeline_resources = {}  # pipeline name -> lock names held until it finishes
+        # (pipeline name, lock name) -> seconds queued behind it
+        self.waits = defaultdict(float)
+        self._waiting = []  # [(pipeline name, workflow, payload, RunResources)]
+        self._queued = {}  # id(request) -> (time queued, lock names that first blocked it)
+        self._active = {}  # run_id -> (pipeline name, RunResources)
+
+    def add_pipeline(self, name, steps, resources=()) -> None:
+        """Registers a plate pipeline. `resources` are extra lock names held
+        from the pipeline's first run until it finishes."""
+        if name in self._pipelines:
+            raise ValueError(f"Pipeline {name} is already running")
+        self._pipelines[name] = steps
+        self._pipeline_resources[name] = set(resources)
+        self._advance(name, None)
+
+    def is_running(self, name) -> bool:
+        """True while a pipeline of that name is registered and unfinished"""
+        return name in self._pipelines
+
+    def run(self, on_poll=None) -> dict:
+        """Runs every registered pipeline to completion and returns the
+        pipelines' return values by name. `on_poll()` is called after every
+        poll and may add pipelines (e.g. for plates that became due)."""
+        while self._waiting or self._active:
+            started = self._dispatch()
+            if not self._active:
+                if not started:
+                    waiting = [request[0] for request in self._waiting]
+                    raise RuntimeError(
+                        f"Pipelines {waiting} are waiting on resources that are never released"
+                    )
+                continue
+            self.sleep(self.polling_interval)
+            self._poll()
+            if on_poll is not None:
+                on_poll()
+        return self.results
+
+    def _advance(self, name, run_info, front=False) -> None:
+        """Sends the finished run_info into a pipeline and queues its next run"""
+        try:
+            workflow, payload = self._pipelines[name].send(run_info)
+        except StopIteration as finished:
+            self.results[name] = finished.value
+            del self._pipelines[name]
+            self.locks.release(name, self._pipeline_resources.pop(name))
+            return
+
+        # copied at submission, the pipeline may keep editing its own
+        payload = dict(payload)
+        request = (
+            name,
+            workflow,
+            payload,
+            resolve_workflow_resources(workflow, payload),
+        )
+        self._queued[id(request)] = (self.clock(), None)
+        if front:
+            self._waiting.insert(0, request)
+        else:
+            self._waiting.append(request)
+
+    def _dispatch(self) -> int:
+        """Starts every waiting run whose locks are free. A run also waits
+        behind any earlier waiting run it conflicts with, so plates queue for a
+        shared module in order. Returns the number of runs started."""
+        started = 0
+        claimed = set()  # lock names wanted by runs still waiting ahead
+        still_waiting = []
+        for request in self._waiting:
+            name, workflow, payload, resources = request
+            names = resources.names | self._pipeline_resources[name]
+            blockers = self.locks.blockers(name, names) or names & claimed
+            if blockers:
+                still_waiting.append(request)
+                claimed |= names
+                queued_at, blocked_on = self._queued[id(request)]
+                if blocked_on is None:
+                    self._queued[id(request)] = (queued_at, blockers)
+                continue
+
+            run_info = self.experiment_client.start_run(
+                workflow,
+                payload=payload,
+                blocking=False,
+                simulate=False,
+            )
+            self.locks.start_run(name, resources)
+            self.locks.acquire(name, self._pipeline_resources[name])
+            self._active[run_info.run_id] = (name, resources)
+            queued_at, blocked_on = self._queued.pop(id(request))
+            for lock_name in blocked_on or ():
+                self.waits[(name, lock_name)] += self.clock() - queued_at
+            started += 1
+            print(f"\tstarted {name} run {run_info.run_id}")
+        self._waiting = still_waiting
+        return started
+
+    def _poll(self) -> None:
+        """Checks active runs, releases the locks of finished ones and
+        advances their pipelines"""
+        for run_id in list(self._active):
+            run_info = self.experiment_client.query_run(run_id)
+            if isinstance(run_info, dict):
+                run_info = WorkflowRun(**run_info)
+            if run_info.status not in FINISHED_STATUSES:
+                continue
+
+            name, resources = self._active.pop(run_id)
+            self.locks.finish_run(name, resources)
+            if run_info.status != WorkflowStatus.COMPLETED:
+                raise RuntimeError(
+                    f"{name} run {run_id} ended with status {run_info.status}"
+                )
+            print(f"\tfinished {name} run {run_id}")
+            self._advance(name, run_info, front=True)
@@ -1,28 +1,95 @@
 
+import hashlib
+import json
+import re
 import tempfile
-import csv
+import time
 import os
 from pathlib import Path
 
 from ot2_offsets import ot2biobeta, ot2bioalpha
 from wei.types.workflow_types import Workflow
 
-def generate_ot2_protocol(template_path, replacement_dict: dict) -> str: 
+# rendered OT-2 protocols, one file per (template contents, replacement values)
+ot2_protocol_cache_directory = Path(tempfile.gettempdir()) / "ot2_protocol_cache"
+ot2_protocol_cache_max_entries = 64
+ot2_protocol_temp_max_age = 3600  # seconds before an unfinished temp render is deleted
+_template_cache = {}  # template path -> (mtime, contents, sha256 of contents)
 
-    # collect template contents and replace variables
-    with template_path.open(mode="r") as f: 
-        edited_template_contents = f.read()
-        for key in replacement_dict.keys(): 
-            edited_template_contents = edited_template_contents.replace("$" + key, str(replacement_dict[key]))
-            
-    # write to another temp file 
-    output_file_name = None
-    """ create a temporary file using a context manager"""
-    with tempfile.NamedTemporaryFile(delete=False) as fp:
-        fp.write(edited_template_contents.encode('utf-8'))
-        output_file_name = fp.name
 
-    return output_file_name
+def generate_ot2_protocol(template_path, replacement_dict: dict) -> str: 
+    """Fills the $variables of an OT-2 protocol template and returns the path
+        of the rendered protocol. Identical renders (same template, same tip
+        box and offsets) return the same file instead of writing a new one."""
+
+    # collect template contents (only re-read if the template changed)
+    template_path = Path(template_path).resolve()
+    mtime = template_path.stat().st_mtime_ns
+    cached_template = _template_cache.get(template_path)
+    if cached_template is None or cached_template[0] != mtime: 
+        with template_path.open(mode="r") as f: 
+            template_contents = f.read()
+        template_hash = hashlib.sha256(template_contents.encode("utf-8")).hexdigest()
+        cached_template = (mtime, template_contents, template_hash)
+        _template_cache[template_path] = cached_template
+    _, template_contents, template_hash = cached_template
+
+    # name the output after the template and replacement values
+    replacements = json.dumps(replacement_dict, sort_keys=True, default=str)
+    render_hash = hashlib.sha256(f"{template_hash}{replacements}".encode("utf-8")).hexdigest()
+    output_path = ot2_protocol_cache_directory / f"{template_path.stem}_{render_hash[:16]}.py"
+
+    if output_path.exists(): 
+        os.utime(output_path)  # mark as recently used
+        return str(output_path)
+
+    # replace variables in one pass (longest names first so $x can't eat $x_offset)
+    if replacement_dict: 
+        names = sorted((re.escape(str(key)) for key in replacement_dict), key=len, reverse=True)
+        edited_template_contents = re.sub(
+            r"\$(" + "|".join(names) + ")", 
+            lambda match: str(replacement_dict[match.group(1)]), 
+            template_contents,
+        )
+    else: 
+        edited_template_contents = template_contents
+
+    # write to a temp file next to the cache entry, then move it into place
+    ot2_protocol_cache_directory.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=ot2_protocol_cache_directory, suffix=".tmp", delete=False) as fp:
+        try: 
+            fp.write(edited_template_contents.encode('utf-8'))
+        except BaseException: 
+            os.unlink(fp.name)
+            raise
+    os.replace(fp.name, output_path)
+
+    prune_ot2_protocol_cache()
+    return str(output_path)
+
+
+def prune_ot2_protocol_cache(max_entries: int = None) -> None: 
+    """Deletes the least recently used rendered protocols beyond the cap,
+        and temp renders left behind by a crash before they were moved into
+        place (once they are older than any render in progress could be)"""
+    if max_entries is None: 
+        max_entries = ot2_protocol_cache_max_entries
+    try: 
+        entries = sorted(
+            ot2_protocol_cache_directory.glob("*.py"), 
+            key=lambda path: path.stat().st_mtime, 
+            reverse=True,
+        )
+        for stale_entry in entries[max_entries:]: 
+            stale_entry.unlink(missing_ok=True)
+        oldest_temp = time.time() - ot2_protocol_temp_max_age
+        for temp_entry in ot2_protocol_cache_directory.glob("*.tmp"): 
+            if temp_entry.stat().st_mtime < oldest_temp: 
+                temp_entry.unlink(missing_ok=True)
+    except OSError as e: 
+        # a full cache is not worth failing the experiment over
+        print("Could not prune the OT-2 protocol cache")
+        print(e)
 
 
 def collect_ot2_replacement_variables(payload: dict) -> dict:
@@ -44,44 +111,53 @@ def collect_ot2_replacement_variables(payload: dict) -> dict:
     return replacement_dict
 
 
-def replace_wf_node_names(workflow: Path, payload: dict): 
-    edited_wf = Workflow.from_yaml(workflow.resolve())
-    for step in edited_wf.flowdef:
+# compiled workflows, keyed by (file path, file mtime, incubator_node, ot2_node)
+_workflow_cache = {}
+workflow_cache_stats = {"hits": 0, "misses": 0}
+
+
+def replace_wf_node_names(workflow: Path, payload: dict) -> Workflow: 
+    """Returns the workflow with payload.incubator_node and payload.ot2_node
+        modules replaced. The yaml is only parsed once per file version and
+        node names; later calls get a deep copy of the cached Workflow (wei
+        edits workflows while submitting them, so the cached one is never
+        handed out)."""
+    path = workflow.resolve()
+    key = (
+        str(path), 
+        path.stat().st_mtime_ns, 
+        payload.get("incubator_node"), 
+        payload.get("ot2_node"),
+    )
+
+    compiled_wf = _workflow_cache.get(key)
+    if compiled_wf is not None: 
+        workflow_cache_stats["hits"] += 1
+        return compiled_wf.model_copy(deep=True)
+
+    workflow_cache_stats["misses"] += 1
+    # drop entries for older versions of the file (other node names of this version stay)
+    for stale_key in [cached for cached in _workflow_cache if cached[0] == key[0] and cached[1] != key[1]]: 
+        del _workflow_cache[stale_key]
+    compiled_wf = Workflow.from_yaml(path)
+    for step in compiled_wf.flowdef:
         if step.module == "payload.incubator_node":
             step.module = payload["incubator_node"]
         if step.module == "payload.ot2_node": 
             step.module = payload["ot2_node"]
-    return edited_wf
-
-def write_timestamps_to_csv(
-        csv_directory_path: str, 
-        experiment_id: str, 
-        bmg_filename: str, 
-        accurate_timestamp: str): 
-    """Writes the more accurate timestamp data from each two plate
-        substrate experiment to a file in the specified csv directory"""
-    try: 
-        # format the file path
-        csv_path = os.path.join(csv_directory_path, f"{experiment_id}.csv")
-
-        # check if the file already exists
-        already_exists = os.path.exists(csv_path) 
-
-        with open(csv_path, "a+") as f: 
-            csv_writer = csv.writer(f)
-
-            # write header row if file was just created
-            if not already_exists: 
-                csv_writer.writerow(["bmg filename", "utc timestamp"])
-            
-            # write the data to the csv
-            csv_writer.writerow([bmg_filename, accurate_timestamp])
-            
-
-    except Exception as e: 
-        # DO NOT fail the experiment if data cannot write to csv file!
-        print("Could not write bmg reading utc timestamp to file")
-        print(e)
+    _workflow_cache[key] = compiled_wf
+    return compiled_wf.model_copy(deep=True)
+
+
+def invalidate_workflow_cache(workflow: Path = None) -> None: 
+    """Forgets compiled copies of one workflow file (or of all workflows if
+        no path is given), e.g. after editing a yaml during an experiment"""
+    if workflow is None: 
+        _workflow_cache.clear()
+        return
+    path = str(Path(workflow).resolve())
+    for key in [key for key in _workflow_cache if key[0] == path]: 
+        del _workflow_cache[key]
 
 
 # TESTING
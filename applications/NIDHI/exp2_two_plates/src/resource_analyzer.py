@@ -0,0 +1,174 @@
+"""Derives the modules and locations a workflow run holds from its flowdef
+
+Workflow steps name their module (possibly as a `payload.` placeholder such
+as `payload.incubator_node`) and move plates and lids between `source` and
+`target` locations. resolve_workflow_resources() resolves those placeholders
+against the run's payload and works out:
+
+    modules   - every module the run uses
+    locations - every location the run touches while it is active
+    placed    - locations left occupied (by a plate or lid) when the run ends
+    cleared   - locations the run empties that it did not fill itself
+
+LockTable uses this to decide which runs of different plates can safely be
+started at the same time.
+"""
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from wei.types.workflow_types import Workflow
+
+import helper_functions
+
+PAYLOAD_PREFIX = "payload."
+
+# step args that name a physical location (approaches are only motion paths)
+LOCATION_ARGS = ("source", "target")
+
+# actions that move an object from source to target
+MOVE_ACTIONS = ("transfer", "transfer_labware")
+
+# PF400 names the same nest differently per plate height and rotation,
+# e.g. exchange_deck_low_narrow and exchange_deck_high_wide are both "exchange"
+_NEST_SUFFIX = re.compile(r"(_deck_(low|high))?(_(narrow|wide))?$")
+
+
+def physical_location(location: str) -> str:
+    """Maps a location name to the physical nest it refers to"""
+    return _NEST_SUFFIX.sub("", location)
+
+
+def resolve_value(value, payload: dict):
+    """Replaces a `payload.<key>` placeholder with the payload value"""
+    if isinstance(value, str) and value.startswith(PAYLOAD_PREFIX):
+        return payload[value[len(PAYLOAD_PREFIX) :]]
+    return value
+
+
+@dataclass(frozen=True)
+class RunResources:
+    """Modules and locations held by one workflow run"""
+
+    modules: frozenset
+    locations: frozenset
+    placed: frozenset
+    cleared: frozenset
+
+    @property
+    def names(self) -> frozenset:
+        """All lock names (modules and locations) the run needs while active"""
+        return self.modules | self.locations
+
+
+def resolve_workflow_resources(workflow, payload: dict) -> RunResources:
+    """Computes the RunResources of a workflow (Workflow object or yaml path)
+    run with the given payload"""
+    if not isinstance(workflow, Workflow):
+        workflow = helper_functions.replace_wf_node_names(Path(workflow), payload)
+
+    modules = set()
+    locations = set()
+    occupied = set()  # filled during this run and still full
+    cleared = set()  # emptied during this run without being filled by it first
+    for step in workflow.flowdef:
+        modules.add(resolve_value(step.module, payload))
+        args = step.args or {}
+        source, target = (
+            physical_location(str(resolve_value(args[key], payload)))
+            if key in args
+            else None
+            for key in LOCATION_ARGS
+        )
+        locations.update(
+            location for location in (source, target) if location is not None
+        )
+
+        # track what is left where: plates move source -> target, a removed
+        # lid fills its target and a replaced lid empties its source
+        if step.action in MOVE_ACTIONS or step.action == "replace_lid":
+            if source in occupied:
+                occupied.discard(source)
+            elif source is not None:
+                cleared.add(source)
+        if step.action in MOVE_ACTIONS or step.action == "remove_lid":
+            if target is not None:
+                occupied.add(target)
+                cleared.discard(target)
+
+    return RunResources(
+        modules=frozenset(modules),
+        locations=frozenset(locations),
+        placed=frozenset(occupied),
+        cleared=frozenset(cleared),
+    )
+
+
+class LockTable:
+    """Which plate holds each module and location
+
+    `held` covers modules and locations in use by an active run (plus any
+    extra names a plate holds explicitly). `occupied` covers locations a
+    plate's run left something in, until a later run of that plate clears
+    them. A run may start when none of its lock names are held or occupied
+    by another plate.
+    """
+
+    def __init__(self):
+        self.held = {}  # lock name -> holder
+        self.occupied = {}  # location -> holder
+
+    def blockers(self, holder, names) -> set:
+        """Lock names that another holder currently has"""
+        return {
+            name
+            for name in names
+            if self.held.get(name, holder) != holder
+            or self.occupied.get(name, holder) != holder
+        }
+
+    def acquire(self, holder, names) -> None:
+        """Marks lock names as held by `holder`"""
+        for name in names:
+            self.held[name] = holder
+
+    def release(self, holder, names) -> None:
+        """Drops `holder`'s hold on lock names"""
+        for name in names:
+            if self.held.get(name) == holder:
+                del self.held[name]
+
+    def start_run(self, holder, resources: RunResources) -> None:
+        self.acquire(holder, resources.names)
+
+    def finish_run(self, holder, resources: RunResources) -> None:
+        """Releases a finished run's locks and records what it left behind"""
+        self.release(holder, resources.names)
+        for location in resources.cleared:
+            if self.occupied.get(location) == holder:
+                del self.occupied[location]
+        for location in resources.placed:
+            self.occupied[location] = holder
+
+    def __str__(self) -> str:
+        rows = [
+            f"{name:<32} held by {holder}" for name, holder in sorted(self.held.items())
+        ]
+        rows += [
+            f"{name:<32} occupied by {holder}"
+            for name, holder in sorted(self.occupied.items())
+        ]
+        return "\n".join(rows) if rows else "(no locks held)"
+
+
+if __name__ == "__main__":
+    # usage: python resource_analyzer.py <workflow.yaml> [key=value ...]
+    workflow_path = Path(sys.argv[1])
+    payload = dict(argument.split("=", 1) for argument in sys.argv[2:])
+    resources = resolve_workflow_resources(workflow_path, payload)
+    print(f"modules:   {sorted(resources.modules)}")
+    print(f"locations: {sorted(resources.locations)}")
+    print(f"placed:    {sorted(resources.placed)}")
+    print(f"cleared:   {sorted(resources.cleared)}")
@@ -9,8 +9,12 @@ from wei.types.workflow_types import Workflow
 
 from ot2_offsets import ot2biobeta, ot2bioalpha
 import helper_functions
-import time
-import csv
+from incubation_scheduler import IncubationScheduler
+from concurrent_runner import ConcurrentRunner
+import timestamp_journal
+from timestamp_journal import TimestampJournal
+from step_profiler import StepProfiler
+from run_index import RunIndex
 from datetime import datetime
 
 
@@ -111,17 +115,17 @@ def main() -> None:
     # other variables (for loop tracking)
     csv_data_direcory = "/home/rpl/workspace/Nidhi_data"
     experiment_label = "2a"
-    transfer_loop_num = 0       # outer loop
-    incubation_loop_num = 0     # inner loop
+    journal = TimestampJournal(csv_data_direcory, experiment_id)   # utc timestamps of both plates' timelines
+    run_index = RunIndex()   # steps of every run by name, module and action
+    profiler = StepProfiler(Path(csv_data_direcory) / f"{experiment_id}_steps.jsonl", index=run_index)   # duration of every step run
+    experiment_client = profiler.wrap(experiment_client)
     exp1_reading_num_in_plate = 1
     exp2_reading_num_in_plate = 1
     exp1_plate_num = 1
     exp2_plate_num = 1
     exp1_into_incubator_time = None
     exp2_into_incubator_time = None
-    total_transfers = 20
-    continue_exp1 = True
-    continue_exp2 = True
+    scheduler = IncubationScheduler()   # tracks when each plate is done incubating
 
     # initial payload setup  (experiment 1 focused at start)
     payload = {
@@ -141,917 +145,446 @@ def main() -> None:
     }
 
 
-    # EXPERIMENT STEPS: ------------------------------------------------------------------------------
-    """Before running this experiment, extra substrate plates should be prepped 
-        by running extra_media_plates_app.py. The prepped plates for experiment 1 should 
-        be placed in ScoClops stack 1, and the prepped plates for experiment 2 should be
-        placed in SciClops stack2. The OT-2 deck of ot2biobeta should be prepped for 
-        first_inoculate_both.py"""
+    try:
+        # EXPERIMENT STEPS: ------------------------------------------------------------------------------
+        """Before running this experiment, extra substrate plates should be prepped 
+            by running extra_media_plates_app.py. The prepped plates for experiment 1 should 
+            be placed in ScoClops stack 1, and the prepped plates for experiment 2 should be
+            placed in SciClops stack2. The OT-2 deck of ot2biobeta should be prepped for 
+            first_inoculate_both.py"""
     
-    # REMOVED FOR RESTART WITH PAUL (07/08/25)
-    # # WF: Transfer a new plate from each experiment stack to ot2biobeta for first inoculation
-    # experiment_client.start_run(
-    #     setup_for_first_inoculation_wf.resolve(),
-    #     payload=payload,
-    #     blocking=True,
-    #     simulate=False,
-    # )
-
-    # # TESTING
-    # print("\nSetting up for first inoculation. New plates from stacks 1 and 2 into ot2biobeta decks 1 and 3")
-    # print("\tvariables hardcoded")
-    # print(f"\tpayload: {payload}")
-
-    # WF: Run first_inoculate_both OT-2 protocol 
-    payload["current_ot2_protocol"] = str(first_inoculate_both_protocol)
-    # edited_ot2_wf = helper_functions.replace_wf_node_names(
-    #     workflow = run_ot2_wf, 
-    #     payload = payload
-    # )
-    # experiment_client.start_run(   
-    #     edited_ot2_wf,
-    #     payload=payload,
-    #     blocking=True,
-    #     simulate=False,
-    # )
-
-    # # TESTING
-    # print("\nRan Inoculate both OT-2 protocol")
-    # print(f"\tot2 protocol: {payload["current_ot2_protocol"]}")
-    # print("\t\tnot specified yet")
-    # print(f"\tot2 node: {payload["ot2_node"]}")
-    # print(f"\tpayload: {payload}")
-
-    # WFs: Transfer experiment 1 plate to bmg, read, then place into incubator
-    # TESTING
-    print("\nTransfer from ot2 to bmg, read, then incubate")
-
-    timestamp_now = int(datetime.now().timestamp())
-    payload["bmg_data_output_name"] = (
-        f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{exp1_plate_num}_{exp1_reading_num_in_plate}.txt"
-    )
-    # ot2 to bmg
-    run_info = experiment_client.start_run(
-        ot2_to_run_bmg_wf.resolve(),
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-    # TESTING
-    print("\tot2 to bmg")
-    print(f"\tpayload: {payload}")
-    print(f"\tot2 grab location: {payload["ot2_node"]} (hardcoded) @ {payload["ot2_node"]}, {payload['current_ot2_protocol']}")
-    print(f"\tbmg reading name: {payload['bmg_data_output_name']}")
-
-    exp1_reading_num_in_plate += 1
-
-    # TESTING
-    print(f"\tincreasing exp1 reading in plate number: {exp1_reading_num_in_plate}")
-
-    # write utc bmg timestamp to csv data file
-    helper_functions.write_timestamps_to_csv(
-        csv_directory_path=csv_data_direcory,
-        experiment_id=experiment_id,
-        bmg_filename=payload["bmg_data_output_name"],
-        accurate_timestamp=run_info.steps[4].end_time,  # index 4 = bmg reading
-    )
-
-    # Testing
-    print(f"\twriting data to csv: {payload["bmg_data_output_name"]}, with timestamp")
-
-    # bmg to inheco incubator
-    edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-        workflow=bmg_to_run_incubator_wf, 
-        payload=payload
-    )
-    experiment_client.start_run(
-        edited_to_inheco_wf,
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-
-    # TESTING 
-    print(f"\n\tbmg to inheco")
-    print(f"\tpayload: {payload}")
-    print(f"\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
-
-    # capture incubation start time
-    exp1_into_incubator_time = time.time()
+        # REMOVED FOR RESTART WITH PAUL (07/08/25)
+        # # WF: Transfer a new plate from each experiment stack to ot2biobeta for first inoculation
+        # experiment_client.start_run(
+        #     setup_for_first_inoculation_wf.resolve(),
+        #     payload=payload,
+        #     blocking=True,
+        #     simulate=False,
+        # )
 
-    # TESTING
-    print(f"\texperiment 1: incubation started at {exp1_into_incubator_time}")  
-
-    # WFs: Transfer experiment 2 plate to bmg, read, then place into incubator -- Done 
-    # TESTING
-    print("\nWFs: Transfer experiment 2 plate to bmg, read, then place into incubator")
-
-    # update payload variables
-    payload["ot2_location"] = exp1_variables["ot2_old_plate_location"]   # ok that this says exp1!
-    payload["lid_location"] = exp2_variables["lid_location"]
-    payload["incubator_node"] = exp2_variables["incubator_node"]
-    payload["incubator_location"] = exp2_variables["incubator_location"]
-    payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
-    
-    # ot2 to bmg
-    timestamp_now = int(datetime.now().timestamp())
-    payload["bmg_data_output_name"] = (
-        f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
-    )
-    run_info = experiment_client.start_run(
-        ot2_to_run_bmg_wf.resolve(),
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-
-    # TESTING
-    print("\tot2 to bmg")
-    print(f"\tpayload: {payload}")
-    print(f"\tot2 grab location: {payload["ot2_node"]} (hardcoded) @ {payload["ot2_node"]}, {payload['current_ot2_protocol']}")
-    print(f"\tbmg reading name: {payload['bmg_data_output_name']}")
-
-    # write utc bmg timestamp to csv data file
-    helper_functions.write_timestamps_to_csv(
-        csv_directory_path=csv_data_direcory,
-        experiment_id=experiment_id,
-        bmg_filename=payload["bmg_data_output_name"],
-        accurate_timestamp=run_info.steps[4].end_time,  # index 4 = bmg reading
-    )
-    # Testing
-    print(f"\twriting data to csv: {payload["bmg_data_output_name"]}, with timestamp")
-
-    exp2_reading_num_in_plate += 1
-    # TESTING
-    print(f"\tincreasing exp2 reading in plate number: {exp2_reading_num_in_plate}")
-
-    # bmg to inheco incubator
-    edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-        workflow=bmg_to_run_incubator_wf, 
-        payload=payload
-    )
-    experiment_client.start_run(
-        edited_to_inheco_wf,
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-    # TESTING 
-    print(f"\n\tbmg to inheco")
-    print(f"\tpayload: {payload}")
-    print(f"\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
+        # # TESTING
+        # print("\nSetting up for first inoculation. New plates from stacks 1 and 2 into ot2biobeta decks 1 and 3")
+        # print("\tvariables hardcoded")
+        # print(f"\tpayload: {payload}")
+
+        # WF: Run first_inoculate_both OT-2 protocol 
+        payload["current_ot2_protocol"] = str(first_inoculate_both_protocol)
+        # edited_ot2_wf = helper_functions.replace_wf_node_names(
+        #     workflow = run_ot2_wf, 
+        #     payload = payload
+        # )
+        # experiment_client.start_run(   
+        #     edited_ot2_wf,
+        #     payload=payload,
+        #     blocking=True,
+        #     simulate=False,
+        # )
 
-    exp2_into_incubator_time = time.time()
-    print(f"\texperiment 2: incubation started at {exp2_into_incubator_time}")
+        # # TESTING
+        # print("\nRan Inoculate both OT-2 protocol")
+        # print(f"\tot2 protocol: {payload["current_ot2_protocol"]}")
+        # print("\t\tnot specified yet")
+        # print(f"\tot2 node: {payload["ot2_node"]}")
+        # print(f"\tpayload: {payload}")
 
-    # increase variables
-    transfer_loop_num += 1
+        # WFs: Transfer experiment 1 plate to bmg, read, then place into incubator
+        # TESTING
+        print("\nTransfer from ot2 to bmg, read, then incubate")
+
+        timestamp_now = int(datetime.now().timestamp())
+        payload["bmg_data_output_name"] = (
+            f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{exp1_plate_num}_{exp1_reading_num_in_plate}.txt"
+        )
+        # ot2 to bmg
+        run_info = experiment_client.start_run(
+            helper_functions.replace_wf_node_names(ot2_to_run_bmg_wf, payload),
+            payload=payload,
+            blocking=True,
+            simulate=False,
+        )
+        # TESTING
+        print("\tot2 to bmg")
+        print(f"\tpayload: {payload}")
+        print(f"\tot2 grab location: {payload["ot2_node"]} (hardcoded) @ {payload["ot2_node"]}, {payload['current_ot2_protocol']}")
+        print(f"\tbmg reading name: {payload['bmg_data_output_name']}")
 
-    print(f"\ttransfer loop number increased: {transfer_loop_num}")
+        exp1_reading_num_in_plate += 1
 
-    # sleep until experiment 1 plate is ready for next reading (1 hr total)
-    while time.time() - exp1_into_incubator_time < exp1_variables["incubation_seconds"]: 
-        print(f"will continue in... {int(exp1_variables["incubation_seconds"]-(time.time() - exp1_into_incubator_time))} seconds")
-        time.sleep(5) # 5 seconds
+        # TESTING
+        print(f"\tincreasing exp1 reading in plate number: {exp1_reading_num_in_plate}")
+
+        # journal utc bmg timestamp
+        journal.record_bmg_reading(payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+
+        # Testing
+        print(f"\tjournaling timestamp of {payload["bmg_data_output_name"]}")
+
+        # bmg to inheco incubator
+        edited_to_inheco_wf = helper_functions.replace_wf_node_names(
+            workflow=bmg_to_run_incubator_wf, 
+            payload=payload
+        )
+        run_info = experiment_client.start_run(
+            edited_to_inheco_wf,
+            payload=payload,
+            blocking=True,
+            simulate=False,
+        )
+
+        # TESTING 
+        print(f"\n\tbmg to inheco")
+        print(f"\tpayload: {payload}")
+        print(f"\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
+
+        # capture incubation start time
+        scheduler.schedule("exp1", exp1_variables["incubation_seconds"])
+        journal.record(timestamp_journal.INCUBATOR_IN, f"exp1_{exp1_plate_num}", run_index.add(run_info).step(action="incubate").start_time)
+        exp1_into_incubator_time = scheduler.started_at("exp1")
 
-    # TESTING
-    print("\nSleeping until plate 1 has incubated for 1 hour")
-    print(f"\tsleeping for: {int(exp1_variables["incubation_seconds"]-(time.time() - exp1_into_incubator_time))} seconds")
+        # TESTING
+        print(f"\texperiment 1: incubation started at {exp1_into_incubator_time}")  
 
-    """Now that both experiment plates are in the incubator, 
-        we can start the both the outer transfers loop and
-        the inner incubation loop."""
+        # WFs: Transfer experiment 2 plate to bmg, read, then place into incubator -- Done 
+        # TESTING
+        print("\nWFs: Transfer experiment 2 plate to bmg, read, then place into incubator")
+
+        # update payload variables
+        payload["ot2_location"] = exp1_variables["ot2_old_plate_location"]   # ok that this says exp1!
+        payload["lid_location"] = exp2_variables["lid_location"]
+        payload["incubator_node"] = exp2_variables["incubator_node"]
+        payload["incubator_location"] = exp2_variables["incubator_location"]
+        payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
     
-    # LOOP START -----------------------------------------------------------
+        # ot2 to bmg
+        timestamp_now = int(datetime.now().timestamp())
+        payload["bmg_data_output_name"] = (
+            f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
+        )
+        run_info = experiment_client.start_run(
+            helper_functions.replace_wf_node_names(ot2_to_run_bmg_wf, payload),
+            payload=payload,
+            blocking=True,
+            simulate=False,
+        )
 
-    # TESTING: 
-    print("\nSTARTING LOOPS")
+        # TESTING
+        print("\tot2 to bmg")
+        print(f"\tpayload: {payload}")
+        print(f"\tot2 grab location: {payload["ot2_node"]} (hardcoded) @ {payload["ot2_node"]}, {payload['current_ot2_protocol']}")
+        print(f"\tbmg reading name: {payload['bmg_data_output_name']}")
 
-    while exp2_plate_num < 21: 
+        # journal utc bmg timestamp
+        journal.record_bmg_reading(payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+        # Testing
+        print(f"\tjournaling timestamp of {payload["bmg_data_output_name"]}")
 
+        exp2_reading_num_in_plate += 1
         # TESTING
-        print(f"\nOUTER LOOP (exp2 plate number) AT TOP = {exp2_plate_num}")
-
-        print("\tINNER LOOP")
-        while incubation_loop_num < 9: 
-
-            """NOTEs: 
-                - ~ 8 min to remove, read, and replace
-            """
-
-            print(f"\n\tincubation_loop_num = {incubation_loop_num} -------------------------")
-
-            if continue_exp1: 
-                # WFs: Transfer experiment 1 plate from incubator, to bmg, read, and return to incubator
-
-                # TESTING
-                print("\tEXP1: taking reading and returning to incubator")
-                print(f"\n\t\tcontinue exp1?: {continue_exp1}")
-
-                # update payload variables
-                payload["ot2_location"] = exp1_variables["ot2_new_plate_location"]  
-                payload["lid_location"] = exp1_variables["lid_location"]
-                payload["incubator_node"] = exp1_variables["incubator_node"]
-                payload["incubator_location"] = exp1_variables["incubator_location"]
-                payload["incubation_seconds"] = exp1_variables["incubation_seconds"]
-
-                # inheco incubator to bmg
-                timestamp_now = int(datetime.now().timestamp())
-                payload["bmg_data_output_name"] = (
-                    f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{exp1_plate_num}_{exp1_reading_num_in_plate}.txt"
-                )
-                edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                    workflow=incubator_to_run_bmg_wf, 
-                    payload=payload
-                )
-                run_info = experiment_client.start_run(
-                    edited_to_bmg_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-
-                # TESTING
-                print(f"\t\tinheco to bmg and read")
-                print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-                print(f"\t\tbmg data filename: {payload['bmg_data_output_name']}")
-
-                # write utc bmg timestamp to csv data file
-                helper_functions.write_timestamps_to_csv(
-                    csv_directory_path=csv_data_direcory,
-                    experiment_id=experiment_id,
-                    bmg_filename=payload["bmg_data_output_name"],
-                    accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
-                )
-                # TESTING
-                print("\t\t writing timestamp to csv")
-
-                exp1_reading_num_in_plate += 1
-
-                # bmg to inheco incubator
-                edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-                    workflow=bmg_to_run_incubator_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_to_inheco_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING 
-                print(f"\t\tbmg to inheco")
-                print(f"\t\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
+        print(f"\tincreasing exp2 reading in plate number: {exp2_reading_num_in_plate}")
+
+        # bmg to inheco incubator
+        edited_to_inheco_wf = helper_functions.replace_wf_node_names(
+            workflow=bmg_to_run_incubator_wf, 
+            payload=payload
+        )
+        run_info = experiment_client.start_run(
+            edited_to_inheco_wf,
+            payload=payload,
+            blocking=True,
+            simulate=False,
+        )
+        # TESTING 
+        print(f"\n\tbmg to inheco")
+        print(f"\tpayload: {payload}")
+        print(f"\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
+
+        scheduler.schedule("exp2", exp2_variables["incubation_seconds"])
+        journal.record(timestamp_journal.INCUBATOR_IN, f"exp2_{exp2_plate_num}", run_index.add(run_info).step(action="incubate").start_time)
+        exp2_into_incubator_time = scheduler.started_at("exp2")
+        print(f"\texperiment 2: incubation started at {exp2_into_incubator_time}")
+
+        """Now that both experiment plates are in the incubator, 
+            each plate's readings and transfers are dispatched by the
+            scheduler when its incubation is done."""
     
-                exp1_into_incubator_time = time.time()
-                print(f"\t\texperiment 1 into incubator time: {exp1_into_incubator_time}")
-
-            if incubation_loop_num % 2 == 1:   # only read exp 2 plate every 2 hours (each loop =~ 1hr)
-                # Wfs: Transfer experiment 2 plate from incubator, to bmg, read, and return to incubator
-
-                # TESTING
-                print("\n\tEXP2: taking reading and returning to incubator")
-
-                # update payload variables
-                payload["lid_location"] = exp2_variables["lid_location"]
-                payload["incubator_node"] = exp2_variables["incubator_node"]
-                payload["incubator_location"] = exp2_variables["incubator_location"]
-                payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
-
-                # inheco incubator to bmg
-                timestamp_now = int(datetime.now().timestamp())
-                payload["bmg_data_output_name"] = (
-                    f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
-                )
-                edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                    workflow=incubator_to_run_bmg_wf, 
-                    payload=payload
-                )
-                run_info = experiment_client.start_run(
-                    edited_to_bmg_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print(f"\t\tinheco to bmg and read")
-                print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-                print(f"\t\tbmg data filename: {payload['bmg_data_output_name']}")
-
-                # write utc bmg timestamp to csv data file
-                helper_functions.write_timestamps_to_csv(
-                    csv_directory_path=csv_data_direcory,
-                    experiment_id=experiment_id,
-                    bmg_filename=payload["bmg_data_output_name"],
-                    accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
-                )
-                # TESTING
-                print("\t\t writing timestamp to csv")
-
-                exp2_reading_num_in_plate += 1
-
-                # # bmg to inheco incubator
-                edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-                    workflow=bmg_to_run_incubator_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_to_inheco_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING 
-                print(f"\t\tbmg to inheco")
-                print(f"\t\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
-
-                exp2_into_incubator_time = time.time()
-                print(f"\t\texperiment 2 into incubator time: {exp2_into_incubator_time}")
-
-            # sleep to incubate
-
-            # TESTING
-            print("\n\tsleeping to incubate")
-            if continue_exp1: 
-                print("\t\tcontinue exp 1 = True")
-                while (time.time() - exp1_into_incubator_time) < exp1_variables["incubation_seconds"]: 
-                    print(f"will continue in... {int(exp1_variables["incubation_seconds"]-(time.time() - exp1_into_incubator_time))} seconds")
-                    time.sleep(5)
-
-            else: 
-                print("\t\tcontinue exp1 = False")
-                while (time.time() - exp2_into_incubator_time) < exp1_variables["incubation_seconds"]: 
-                    print(f"will continue in... {int(exp1_variables["incubation_seconds"]-(time.time() - exp2_into_incubator_time))} seconds")
-                    time.sleep(5)
-
-            incubation_loop_num += 1
-
-        # reset incubation loop number 
-        incubation_loop_num = 0
-
-        # OUTER LOOP ACTIONS - TRANSFERS HANDLING --------------------------------------------
-        """One loop in the transfers loop (outer loop, is roughly 
-            10 hours or 10 incubation loops (inner loops)"""
-        
-        # testing
-        print(f"exp1 plate num: {exp1_plate_num}")
-        print(f"exp2 plate num: {exp2_plate_num}")
-        
-        # TRASH exp 1 plate 20
-        if exp1_plate_num == 20:    
-            """means final incubaton cycle on experiment 1 plate is complete. 
-                Need to complete the final absorbance reading on the final
-                plate in experiment 1."""
-            
-            # TESTING
-            print(f"\nLAST EXP1 PLATE = {exp1_plate_num}")
-            continue_exp1 = False
+        # PLATE PIPELINES ------------------------------------------------------
+        """Each transfer/reading sequence below is a plate pipeline for the
+            ConcurrentRunner: it yields (workflow, payload) for every run and
+            receives the finished run_info back. Pipelines work on their own
+            copy of the payload so the two experiments can run side by side."""
 
-            # change variables
-            payload["lid_location"] = exp1_variables["lid_location"]
-            payload["incubator_node"] = exp1_variables["incubator_node"]
-            payload["incubator_location"] = exp1_variables["incubator_location"]
-            payload["incubation_seconds"] = exp1_variables["incubation_seconds"]
-            payload["trash_stack"] = exp1_variables["trash_stack"]
+        def transfer_steps(exp, exp_variables, plate_num, reading_num):
+            """Reads the old plate, inoculates a new plate from it on the OT-2,
+                reads and incubates the new plate, then trashes the old plate.
+                Returns the updated (plate_num, reading_num)."""
 
-            # inheco incubator to bmg
-            timestamp_now = int(datetime.now().timestamp())
-            payload["bmg_data_output_name"] = (
-                f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{exp1_plate_num}_{exp1_reading_num_in_plate}.txt"
-            )
-            edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                workflow=incubator_to_run_bmg_wf, 
-                payload=payload
-            )
-            run_info = experiment_client.start_run(
-                edited_to_bmg_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
             # TESTING
-            print(f"\t\tinheco to bmg and read")
-            print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-            print(f"\t\tbmg data filename: {payload['bmg_data_output_name']}")
-
-            # write utc bmg timestamp to csv data file
-            helper_functions.write_timestamps_to_csv(
-                csv_directory_path=csv_data_direcory,
-                experiment_id=experiment_id,
-                bmg_filename=payload["bmg_data_output_name"],
-                accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
-            )
-            # TESTING
-            print("\t\t writing timestamp to csv")
-
-            exp1_reading_num_in_plate += 1
-            print(f"\t\texperiment 1 into incubator time: {exp1_into_incubator_time}")
-
-            # bmg to trash stack   
-            experiment_client.start_run(
-                at_end_bmg_to_trash_wf.resolve(),
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
-            # TESTING
-            print("\t\tbmg to trash stack")
-            print(f"\t\tlid location: {payload["lid_location"]}")
-            print(f"\t\ttrash stack: {payload["trash_stack"]}")
-
-            exp1_plate_num += 1  # important
-
-        if continue_exp1: 
-            # TESTING
-            print("\nTransfering exp 1 plate")
-
-            # set up variables 
-            payload["ot2_node"] = exp1_variables["ot2_node"]
-            payload["ot2_location"] = exp1_variables["ot2_old_plate_location"]
-            payload["ot2_safe_path"] = exp1_variables["ot2_safe_path"]
-            payload["stack"] = exp1_variables["new_stack"]
-            payload["lid_location"] = exp1_variables["lid_location"]
-            payload["tip_box_location"] = exp1_variables["tip_box_location"]
-            payload["incubator_node"] = exp1_variables["incubator_node"]
-            payload["incubator_location"] = exp1_variables["incubator_location"]
-            payload["incubation_seconds"] = exp1_variables["incubation_seconds"]
+            print(f"\nTransfering {exp} plate")
+
+            # set up variables
+            plate_payload = dict(payload)
+            plate_payload["ot2_node"] = exp_variables["ot2_node"]
+            plate_payload["ot2_location"] = exp_variables["ot2_old_plate_location"]
+            plate_payload["ot2_safe_path"] = exp_variables["ot2_safe_path"]
+            plate_payload["stack"] = exp_variables["new_stack"]
+            plate_payload["lid_location"] = exp_variables["lid_location"]
+            plate_payload["tip_box_location"] = exp_variables["tip_box_location"]
+            plate_payload["incubator_node"] = exp_variables["incubator_node"]
+            plate_payload["incubator_location"] = exp_variables["incubator_location"]
+            plate_payload["incubation_seconds"] = exp_variables["incubation_seconds"]
 
             # inheco incubator to bmg (BUT REPLACE LID ON PF400 lidnest 3 narrow)
-
-            # TESTING
-            print("\n\tinheco incubator to bmg (BUT REPLACE LID ON PF400 lidnest 3 narrow)")
             timestamp_now = int(datetime.now().timestamp())
-            payload["bmg_data_output_name"] = (
-                f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{exp1_plate_num}_{exp1_reading_num_in_plate}.txt"
+            plate_payload["bmg_data_output_name"] = (
+                f"{experiment_label}_{timestamp_now}_{experiment_id}_{exp}_{plate_num}_{reading_num}.txt"
             )
             edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                workflow=incubator_to_run_bmg_PF400_LID_wf, 
-                payload=payload
-            )
-            run_info = experiment_client.start_run(
-                edited_to_bmg_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
-            # TESTING
-            print(f"\t\tinheco to bmg and read")
-            print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-            print(f"\t\tbmg data filename: {payload["bmg_data_output_name"]}")
-
-            # write utc bmg timestamp to csv data file
-            helper_functions.write_timestamps_to_csv(
-                csv_directory_path=csv_data_direcory,
-                experiment_id=experiment_id,
-                bmg_filename=payload["bmg_data_output_name"],
-                accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
+                workflow=incubator_to_run_bmg_PF400_LID_wf,
+                payload=plate_payload
             )
+            run_info = yield edited_to_bmg_wf, plate_payload
             # TESTING
-            print("\t\t writing timestamp to csv")
+            print(f"\t\t{exp}: inheco to bmg and read, bmg data filename: {plate_payload['bmg_data_output_name']}")
 
-            exp1_reading_num_in_plate += 1
+            # journal utc bmg timestamp
+            journal.record_bmg_reading(plate_payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+            journal.record(timestamp_journal.INCUBATOR_OUT, f"{exp}_{plate_num}", run_index.add(run_info).step(name="transfer to exchange").start_time)  # plate leaves the incubator
+            reading_num += 1
 
             # bmg to OLD OT-2 location
-            experiment_client.start_run(
-                replace_ot2_old_wf.resolve(),
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
-            print(f"\n\t\tbmg to old ot2 location: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")  # TESTING
+            yield helper_functions.replace_wf_node_names(replace_ot2_old_wf, plate_payload), plate_payload
+            print(f"\t\t{exp}: bmg to old ot2 location: {plate_payload['ot2_node']}, {plate_payload['ot2_location']}")  # TESTING
 
             # get a new plate from the stack
-            payload["ot2_location"] = exp1_variables["ot2_new_plate_location"]
-            payload["ot2_safe_path"] = exp1_variables["ot2_safe_path"]
+            plate_payload["ot2_location"] = exp_variables["ot2_new_plate_location"]
+            plate_payload["ot2_safe_path"] = exp_variables["ot2_safe_path"]
             edited_get_new_plate_wf = helper_functions.replace_wf_node_names(
-                workflow=get_new_plate_wf, 
-                payload=payload
-            )
-            experiment_client.start_run(
-                edited_get_new_plate_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
+                workflow=get_new_plate_wf,
+                payload=plate_payload
             )
-            # TESTING
-            print(f"\t\tget a new plate from the stack: {payload["stack"]}, lid location: {payload["lid_location"]}")
-            print(f"\t\tto ot2: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
+            yield edited_get_new_plate_wf, plate_payload
+            print(f"\t\t{exp}: get a new plate from the stack: {plate_payload['stack']}")  # TESTING
 
             # run ot2 inoculation protocol
-            ot2_replacement_variables = helper_functions.collect_ot2_replacement_variables(payload)
+            ot2_replacement_variables = helper_functions.collect_ot2_replacement_variables(plate_payload)
             temp_ot2_file_str = helper_functions.generate_ot2_protocol(inoculate_protocol, ot2_replacement_variables)
-            payload["current_ot2_protocol"] = temp_ot2_file_str
-
+            plate_payload["current_ot2_protocol"] = temp_ot2_file_str
             edited_ot2_wf = helper_functions.replace_wf_node_names(
-                workflow=run_ot2_wf, 
-                payload=payload
-            )
-            experiment_client.start_run(
-                edited_ot2_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
+                workflow=run_ot2_wf,
+                payload=plate_payload
             )
-            # TESTING
-            print("\n\t\trun ot2 inoculation protocol")
-            print(f"\t\tot2: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-            print(f"\t\ttip location: {payload["tip_box_location"]}")
-            
+            run_info = yield edited_ot2_wf, plate_payload
+            journal.record(timestamp_journal.OT2_START, f"{exp}_{plate_num + 1}", run_index.add(run_info).step(action="run_protocol").start_time)
+            journal.record(timestamp_journal.OT2_END, f"{exp}_{plate_num + 1}", run_index.add(run_info).step(action="run_protocol").end_time)
+            print(f"\t\t{exp}: ran ot2 inoculation protocol, tip location: {plate_payload['tip_box_location']}")  # TESTING
+
             # increase variables
-            exp1_plate_num += 1
-            exp1_variables["tip_box_location"] += 1
-            
+            plate_num += 1
+            exp_variables["tip_box_location"] += 1
+
             # reset variables if necessary
-            exp1_reading_num_in_plate = 1
-            if exp1_variables["tip_box_location"] == 12:   
-                exp1_variables["tip_box_location"] = 4
+            reading_num = 1
+            if exp_variables["tip_box_location"] == 12:
+                exp_variables["tip_box_location"] = 4
 
             # ot2 to bmg (new plate)
-            payload["ot2_location"] = exp1_variables["ot2_new_plate_location"]
+            plate_payload["ot2_location"] = exp_variables["ot2_new_plate_location"]
             timestamp_now = int(datetime.now().timestamp())
-            payload["bmg_data_output_name"] = (
-                f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{exp1_plate_num}_{exp1_reading_num_in_plate}.txt"
-            )
-            run_info = experiment_client.start_run(
-                ot2_to_run_bmg_wf.resolve(),
-                payload=payload,
-                blocking=True,
-                simulate=False,
+            plate_payload["bmg_data_output_name"] = (
+                f"{experiment_label}_{timestamp_now}_{experiment_id}_{exp}_{plate_num}_{reading_num}.txt"
             )
-            # TESTING
-            print(f"\n\t\tnew plate ot2 to bmg: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-            print(f"\t\tbmg filename: {payload["bmg_data_output_name"]}")
+            run_info = yield helper_functions.replace_wf_node_names(ot2_to_run_bmg_wf, plate_payload), plate_payload
+            print(f"\t\t{exp}: new plate ot2 to bmg, bmg filename: {plate_payload['bmg_data_output_name']}")  # TESTING
+            reading_num += 1
 
-            exp1_reading_num_in_plate += 1
-
-            # write utc bmg timestamp to csv data file
-            helper_functions.write_timestamps_to_csv(
-                csv_directory_path=csv_data_direcory,
-                experiment_id=experiment_id,
-                bmg_filename=payload["bmg_data_output_name"],
-                accurate_timestamp=run_info.steps[4].end_time,  # index 4 = bmg reading
-            )
-            # TESTING
-            print("\t\t writing timestamp to csv")
+            # journal utc bmg timestamp
+            journal.record_bmg_reading(plate_payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
 
             # bmg to inheco incubator
-            payload["incubator_node"] = exp1_variables["incubator_node"]  # redundant but feels safer
-            payload["incubator_location"] = exp1_variables["incubator_location"]
-            payload["incubation_seconds"] = exp1_variables["incubation_seconds"]
             edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-                workflow=bmg_to_run_incubator_wf, 
-                payload=payload
-            )
-            experiment_client.start_run(
-                edited_to_inheco_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
+                workflow=bmg_to_run_incubator_wf,
+                payload=plate_payload
             )
-            # # TESTING 
-            print(f"\n\t\tbmg to inheco")
-            print(f"\t\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
-
-            exp1_into_incubator_time = time.time()
-            print(f"\t\texperiment 1 into incubator time: {exp1_into_incubator_time}")
+            run_info = yield edited_to_inheco_wf, plate_payload
+            scheduler.schedule(exp, exp_variables["incubation_seconds"])
+            journal.record(timestamp_journal.INCUBATOR_IN, f"{exp}_{plate_num}", run_index.add(run_info).step(action="incubate").start_time)
+            print(f"\t\t{exp}: bmg to inheco, into incubator time: {scheduler.started_at(exp)}")  # TESTING
 
             # remove the old plate to trash stack
-            payload["trash_stack"] = exp1_variables["trash_stack"]
-            payload["ot2_location"] = exp1_variables["ot2_old_plate_location"]
+            plate_payload["trash_stack"] = exp_variables["trash_stack"]
+            plate_payload["ot2_location"] = exp_variables["ot2_old_plate_location"]
             edited_old_to_trash_wf = helper_functions.replace_wf_node_names(
-                workflow=remove_old_substrate_plate_wf, 
-                payload=payload
+                workflow=remove_old_substrate_plate_wf,
+                payload=plate_payload
             )
-            experiment_client.start_run(
-                edited_old_to_trash_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
-            # TESTING
-            print(f"\n\t\tremove old plate to trash stack")
-            print(f"\t\tot2: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-            print(f"\t\ttrash stack: {payload["trash_stack"]}, lid location: {payload["lid_location"]}")
-
-            
-        # trash experiment 2 plate if complete
-        if exp2_plate_num == 20: 
-            """means final incubaton cycle on experiment 2 plate is complete. 
-                Need to complete the final absorbance reading on the final
-                plate in experiment 2."""
-            
+            yield edited_old_to_trash_wf, plate_payload
+            print(f"\t\t{exp}: removed old plate to trash stack: {plate_payload['trash_stack']}")  # TESTING
+
+            return plate_num, reading_num
+
+        def reading_steps(exp, exp_variables, plate_num, reading_num):
+            """Takes a plate out of the incubator, reads it and returns it to
+                the incubator. Returns the updated reading_num."""
+
             # TESTING
-            print(f"\nLAST PLATE EXP 2 = {exp2_plate_num}")
-            continue_exp2 = False
+            print(f"\n\tNO TRANSFER ({exp}): only taking reading and returning to incubator")
 
-            # change variables
-            # payload["ot2_location"] = exp1_variables["ot2_new_plate_location"]   # needed?
-            payload["lid_location"] = exp2_variables["lid_location"]
-            payload["incubator_node"] = exp2_variables["incubator_node"]
-            payload["incubator_location"] = exp2_variables["incubator_location"]
-            payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
-            payload["trash_stack"] = exp2_variables["trash_stack"]
+            # update payload variables
+            plate_payload = dict(payload)
+            plate_payload["lid_location"] = exp_variables["lid_location"]
+            plate_payload["incubator_node"] = exp_variables["incubator_node"]
+            plate_payload["incubator_location"] = exp_variables["incubator_location"]
+            plate_payload["incubation_seconds"] = exp_variables["incubation_seconds"]
 
             # inheco incubator to bmg
             timestamp_now = int(datetime.now().timestamp())
-            payload["bmg_data_output_name"] = (
-                f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
+            plate_payload["bmg_data_output_name"] = (
+                f"{experiment_label}_{timestamp_now}_{experiment_id}_{exp}_{plate_num}_{reading_num}.txt"
             )
             edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                workflow=incubator_to_run_bmg_wf, 
-                payload=payload
-            )
-            run_info = experiment_client.start_run(
-                edited_to_bmg_wf,
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
-            # TESTING
-            print(f"\t\tinheco to bmg and read")
-            print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-            print(f"\t\tbmg data filename: {payload['bmg_data_output_name']}")
-
-            # write utc bmg timestamp to csv data file
-            helper_functions.write_timestamps_to_csv(
-                csv_directory_path=csv_data_direcory,
-                experiment_id=experiment_id,
-                bmg_filename=payload["bmg_data_output_name"],
-                accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
-            )
-            print("\t\t writing timestamp to csv") # TESTING
-            exp2_reading_num_in_plate += 1
-
-            # bmg to trash stack  
-            experiment_client.start_run(
-                at_end_bmg_to_trash_wf.resolve(),
-                payload=payload,
-                blocking=True,
-                simulate=False,
+                workflow=incubator_to_run_bmg_wf,
+                payload=plate_payload
             )
+            run_info = yield edited_to_bmg_wf, plate_payload
+            print(f"\t\t{exp}: inheco to bmg and read, bmg data filename: {plate_payload['bmg_data_output_name']}")  # TESTING
 
-            # TESTING
-            print("\t\tbmg to trash stack")
-            print(f"\t\tlid location: {payload["lid_location"]}")
-            print(f"\t\ttrash stack: {payload["trash_stack"]}")
+            # journal utc bmg timestamp
+            journal.record_bmg_reading(plate_payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+            journal.record(timestamp_journal.INCUBATOR_OUT, f"{exp}_{plate_num}", run_index.add(run_info).step(name="transfer to exchange").start_time)  # plate leaves the incubator
+            reading_num += 1
+
+            # bmg to inheco incubator
+            edited_to_inheco_wf = helper_functions.replace_wf_node_names(
+                workflow=bmg_to_run_incubator_wf,
+                payload=plate_payload
+            )
+            run_info = yield edited_to_inheco_wf, plate_payload
+            scheduler.schedule(exp, exp_variables["incubation_seconds"])
+            journal.record(timestamp_journal.INCUBATOR_IN, f"{exp}_{plate_num}", run_index.add(run_info).step(action="incubate").start_time)
+            print(f"\t\t{exp}: bmg to inheco, into incubator time: {scheduler.started_at(exp)}")  # TESTING
 
-            # end the experiment after experiment 2 plate 20
-            exp2_plate_num += 1   # unnecessary if break is below
-            break   
+            return reading_num
 
-        if continue_exp2: 
+        def final_steps(exp, exp_variables, plate_num, reading_num):
+            """Takes the last reading of an experiment's final plate, then
+                moves the plate from the bmg to the trash stack. Returns the
+                updated reading_num."""
 
             # TESTING
-            print("HANDLING PLATE 2")
-
-            if transfer_loop_num % 2 == 0:
-                """Only transfer exp 2 every 20 hours, one transfer loop = ~10 hrs"""
-
-                # TESTING
-                print("\nTransfer exp 2")
-                
-                # set up variables 
-                payload["ot2_node"] = exp2_variables["ot2_node"]
-                payload["ot2_location"] = exp2_variables["ot2_old_plate_location"]   
-                payload["ot2_safe_path"] = exp2_variables["ot2_safe_path"]
-                payload["stack"] = exp2_variables["new_stack"]
-                payload["lid_location"] = exp2_variables["lid_location"]
-                payload["tip_box_location"] = exp2_variables["tip_box_location"]
-                payload["incubator_node"] = exp2_variables["incubator_node"]
-                payload["incubator_location"] = exp2_variables["incubator_location"]
-                payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
-
-                # inheco incubator to bmg (BUT REPLACE LID ON PF400 lidnest 3 narrow)
-                timestamp_now = int(datetime.now().timestamp())
-                payload["bmg_data_output_name"] = (
-                    f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
-                )
-                edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                    workflow=incubator_to_run_bmg_PF400_LID_wf, 
-                    payload=payload
-                )
-                run_info = experiment_client.start_run(
-                    edited_to_bmg_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print(f"\t\tinheco to bmg and read")
-                print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-                print(f"\t\tbmg data filename: {payload['bmg_data_output_name']}")
-                
-                # write utc bmg timestamp to csv data file
-                helper_functions.write_timestamps_to_csv(
-                    csv_directory_path=csv_data_direcory,
-                    experiment_id=experiment_id,
-                    bmg_filename=payload["bmg_data_output_name"],
-                    accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
-                )
-                print("\t\t writing timestamp to csv") # TESTING
-                exp2_reading_num_in_plate += 1
-
-                # bmg to OLD OT-2 location -- DONE
-                experiment_client.start_run(
-                    replace_ot2_old_wf.resolve(),
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                print(f"\n\t\tbmg to old ot2 location: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")  # TESTING
-
-                # get a new plate from the stack  -- DONE
-                payload["ot2_location"] = exp2_variables["ot2_new_plate_location"]
-                payload["ot2_safe_path"] = exp2_variables["ot2_safe_path"]
-                edited_get_new_plate_wf = helper_functions.replace_wf_node_names(
-                    workflow=get_new_plate_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_get_new_plate_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print(f"\n\t\tget a new plate from the stack: {payload["stack"]}, lid location: {payload["lid_location"]}")
-                print(f"\t\tto ot2: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-
-                # run ot2 inoculation protocol
-                ot2_replacement_variables = helper_functions.collect_ot2_replacement_variables(payload)
-                temp_ot2_file_str = helper_functions.generate_ot2_protocol(inoculate_protocol, ot2_replacement_variables)
-                payload["current_ot2_protocol"] = temp_ot2_file_str
-                edited_ot2_wf = helper_functions.replace_wf_node_names(
-                    workflow=run_ot2_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_ot2_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print("\n\t\trun ot2 inoculation protocol")
-                print(f"\t\tot2: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-                print(f"\t\ttip location: {payload["tip_box_location"]}")
-
-                # increase variables
-                exp2_plate_num += 1
-                exp2_variables["tip_box_location"] += 1
-                
-                # reset variables if necessary
-                exp2_reading_num_in_plate = 1
-                if exp2_variables["tip_box_location"] == 12:   
-                    exp2_variables["tip_box_location"] = 4
-
-                # ot2 to bmg (new plate) -- DONE
-                payload["ot2_location"] = exp2_variables["ot2_new_plate_location"]
-                timestamp_now = int(datetime.now().timestamp())
-                payload["bmg_data_output_name"] = (
-                    f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
-                )
-                run_info = experiment_client.start_run(
-                    ot2_to_run_bmg_wf.resolve(),
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print(f"\n\t\tnew plate ot2 to bmg: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-                print(f"\t\tbmg filename: {payload["bmg_data_output_name"]}")
-                exp2_reading_num_in_plate += 1
-
-                # write utc bmg timestamp to csv data file
-                helper_functions.write_timestamps_to_csv(
-                    csv_directory_path=csv_data_direcory,
-                    experiment_id=experiment_id,
-                    bmg_filename=payload["bmg_data_output_name"],
-                    accurate_timestamp=run_info.steps[4].end_time,  # index 4 = bmg reading
-                )
-                print("\t\t writing timestamp to csv") # TESTING
-
-                # bmg to inheco incubator
-                payload["incubator_node"] = exp2_variables["incubator_node"]  # redundant but feels safer
-                payload["incubator_location"] = exp2_variables["incubator_location"]
-                payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
-                edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-                    workflow=bmg_to_run_incubator_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_to_inheco_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING 
-                print(f"\n\t\tbmg to inheco")
-                print(f"\t\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
-
-                exp2_into_incubator_time = time.time()
-                print(f"\n\t\texp2 into incubator time: {exp2_into_incubator_time}")
-
-                # remove the old plate to trash stack  -- DONE
-                payload["trash_stack"] = exp2_variables["trash_stack"]
-                payload["ot2_location"] = exp2_variables["ot2_old_plate_location"]
-                edited_old_to_trash_wf = helper_functions.replace_wf_node_names(
-                    workflow=remove_old_substrate_plate_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_old_to_trash_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print(f"\n\t\tremove old plate to trash stack")
-                print(f"\t\tot2: {payload["ot2_node"]}, {payload["ot2_location"]}, {payload["ot2_safe_path"]}")
-                print(f"\t\ttrash stack: {payload["trash_stack"]}, lid location: {payload["lid_location"]}")
-        
-            else:  # still need to remove and read plate 2 now if not transferring
-
-                # TODO: TEST
-                # Wfs: Transfer experiment 2 plate from incubator, to bmg, read, and return to incubator
-                # TESTING
-                print("\n\tNO TRANSFER (experiment 2): only taking reading and returning to incubator")
-
-                # update payload variables
-                payload["lid_location"] = exp2_variables["lid_location"]
-                payload["incubator_node"] = exp2_variables["incubator_node"]
-                payload["incubator_location"] = exp2_variables["incubator_location"]
-                payload["incubation_seconds"] = exp2_variables["incubation_seconds"]
-
-                # inheco incubator to bmg
-                timestamp_now = int(datetime.now().timestamp())
-                payload["bmg_data_output_name"] = (
-                    f"{experiment_label}_{timestamp_now}_{experiment_id}_exp2_{exp2_plate_num}_{exp2_reading_num_in_plate}.txt"
-                )
-                edited_to_bmg_wf = helper_functions.replace_wf_node_names(
-                    workflow=incubator_to_run_bmg_wf, 
-                    payload=payload
-                )
-                run_info = experiment_client.start_run(
-                    edited_to_bmg_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING
-                print(f"\t\tinheco to bmg and read")
-                print(f"\t\tinheco node: {payload['incubator_node']} @ {payload["incubator_location"]}")
-                print(f"\t\tbmg data filename: {payload['bmg_data_output_name']}")
-
-                # write utc bmg timestamp to csv data file
-                helper_functions.write_timestamps_to_csv(
-                    csv_directory_path=csv_data_direcory,
-                    experiment_id=experiment_id,
-                    bmg_filename=payload["bmg_data_output_name"],
-                    accurate_timestamp=run_info.steps[7].end_time,  # index 7 = bmg reading
-                )
-                # TESTING
-                print("\t\t writing timestamp to csv")
-
-                exp2_reading_num_in_plate += 1
-
-                # bmg to inheco incubator
-                edited_to_inheco_wf = helper_functions.replace_wf_node_names(
-                    workflow=bmg_to_run_incubator_wf, 
-                    payload=payload
-                )
-                experiment_client.start_run(
-                    edited_to_inheco_wf,
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # TESTING 
-                print(f"\t\tbmg to inheco")
-                print(f"\t\tinheco node: {payload["incubator_node"]} @ {payload["incubator_location"]}, inc time = {payload['incubation_seconds']}")
-
-                exp2_into_incubator_time = time.time()
-                print(f"\t\texperiment 2 into incubator time: {exp2_into_incubator_time}")
-
-
-
-        # # sleep until experiment 1 incubation time is complete
-        # # TESTING
-        print("\nsleeping to incubate")
-        if continue_exp1: 
-            print("continue exp 1 = True")
-            while (time.time() - exp1_into_incubator_time) < exp1_variables["incubation_seconds"]: 
-                print(f"will continue in... {int(exp1_variables["incubation_seconds"]-(time.time() - exp1_into_incubator_time))} seconds")
-                time.sleep(5)
-        else: 
-            if continue_exp2:
-                print("continue exp1 = False")
-                while (time.time() - exp2_into_incubator_time) < exp1_variables["incubation_seconds"]: 
-                    print(f"will continue in... {int(exp1_variables["incubation_seconds"]-(time.time() - exp2_into_incubator_time))} seconds")
-                    time.sleep(5)
-
-
-        transfer_loop_num += 1
+            print(f"\nLAST {exp} PLATE = {plate_num}")
+
+            # change variables
+            plate_payload = dict(payload)
+            plate_payload["lid_location"] = exp_variables["lid_location"]
+            plate_payload["incubator_node"] = exp_variables["incubator_node"]
+            plate_payload["incubator_location"] = exp_variables["incubator_location"]
+            plate_payload["incubation_seconds"] = exp_variables["incubation_seconds"]
+            plate_payload["trash_stack"] = exp_variables["trash_stack"]
+
+            # inheco incubator to bmg
+            timestamp_now = int(datetime.now().timestamp())
+            plate_payload["bmg_data_output_name"] = (
+                f"{experiment_label}_{timestamp_now}_{experiment_id}_{exp}_{plate_num}_{reading_num}.txt"
+            )
+            edited_to_bmg_wf = helper_functions.replace_wf_node_names(
+                workflow=incubator_to_run_bmg_wf,
+                payload=plate_payload
+            )
+            run_info = yield edited_to_bmg_wf, plate_payload
+            print(f"\t\t{exp}: inheco to bmg and read, bmg data filename: {plate_payload['bmg_data_output_name']}")  # TESTING
+
+            # journal utc bmg timestamp
+            journal.record_bmg_reading(plate_payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+            journal.record(timestamp_journal.INCUBATOR_OUT, f"{exp}_{plate_num}", run_index.add(run_info).step(name="transfer to exchange").start_time)  # plate leaves the incubator
+            reading_num += 1
+
+            # bmg to trash stack
+            yield helper_functions.replace_wf_node_names(at_end_bmg_to_trash_wf, plate_payload), plate_payload
+            print(f"\t\t{exp}: bmg to trash stack: {plate_payload['trash_stack']}, lid location: {plate_payload['lid_location']}")  # TESTING
+
+            return reading_num
+
+        # PLATE DISPATCH -------------------------------------------------------
+        """Every reading and transfer starts when its own plate is done
+            incubating: scheduler.run_next() sleeps until whichever plate is due
+            first and plate_due() queues that plate's next pipeline. Plates due
+            at the same time run side by side in one ConcurrentRunner, so
+            neither plate waits on the other plate's timer.
+
+            Each plate is transferred to a new plate every 10 incubations
+            (10 hrs for exp1, 20 hrs for exp2) and trashed after the last
+            incubation of its plate 20."""
+        incubations_per_plate = 10
+        plates = {
+            "exp1": {
+                "variables": exp1_variables,
+                "plate_num": exp1_plate_num,
+                "reading_num": exp1_reading_num_in_plate,
+                "incubations": 0,   # since the plate was inoculated
+                "last_plate": 20,
+                "last_plate_incubations": incubations_per_plate,
+            },
+            "exp2": {
+                "variables": exp2_variables,
+                "plate_num": exp2_plate_num,
+                "reading_num": exp2_reading_num_in_plate,
+                "incubations": 0,
+                "last_plate": 20,
+                "last_plate_incubations": incubations_per_plate // 2,   # exp2 plate 20 is only read for 10 hrs
+            },
+        }
+        runner = ConcurrentRunner(experiment_client)   # runs the pipelines of the plates that are due
+
+        def plate_due(exp):
+            """Queues the next pipeline of a plate that is done incubating"""
+            plate = plates[exp]
+            plate["incubations"] += 1
+            if plate["plate_num"] == plate["last_plate"] and plate["incubations"] == plate["last_plate_incubations"]:
+                pipeline = "final"
+                steps = final_steps(exp, plate["variables"], plate["plate_num"], plate["reading_num"])
+            elif plate["incubations"] == incubations_per_plate:
+                pipeline = "transfer"
+                steps = transfer_steps(exp, plate["variables"], plate["plate_num"], plate["reading_num"])
+            else:
+                pipeline = "reading"
+                steps = reading_steps(exp, plate["variables"], plate["plate_num"], plate["reading_num"])
+            print(f"\n{exp} plate {plate['plate_num']} is done incubating ({plate['incubations']}): {pipeline}")  # TESTING
+            runner.add_pipeline(exp, plate_steps(plate, pipeline, steps))
+
+        def plate_steps(plate, pipeline, steps):
+            """Runs a plate's pipeline, then updates the plate's numbers"""
+            result = yield from steps
+            if pipeline == "transfer":
+                plate["plate_num"], plate["reading_num"] = result
+                plate["incubations"] = 0
+            else:
+                plate["reading_num"] = result
+
+        def dispatch_due_plates():
+            """Queues every plate that is done incubating. A plate still busy
+                with its last pipeline stays scheduled until that finishes,
+                without holding up the other plates."""
+            scheduler.run_due(plate_due, skip=runner.is_running)
+
+        # TESTING: 
+        print("\nSTARTING LOOPS")
+
+        while len(scheduler):
+            # sleep until the next plate is done incubating
+            scheduler.run_next(plate_due)
+            dispatch_due_plates()
+
+            # run the plates' pipelines, overlapping runs that don't share modules
+            # or locations (e.g. the old plate's lid waits on lidnest 3 for a whole
+            # transfer, so two transfers can't overlap, but a transfer and a reading
+            # can). Plates that become due meanwhile join in.
+            runner.run(on_poll=dispatch_due_plates)
+    finally:
+        # flush the journal and export the bmg timestamp csv (also if a run fails)
+        journal.close()
+        profiler.close()
+
+    profiler.print_report()
 
 
 
@@ -0,0 +1,192 @@
+"""Append-only timestamp journal for experiment runs
+
+One journal file stays open for the whole experiment, instead of reopening
+the timestamp csv for every BMG reading. Each record is a single line
+
+    <event>\t<name>\t<utc timestamp>
+
+e.g. `bmg_reading\t2_1718300000_<id>_exp1_3_T4.txt\t2024-06-13 17:33:20.120000`.
+Besides BMG readings the apps record incubator in/out and OT-2 start/end, so
+the journal holds the full plate timeline. A line is only ever appended, so
+after a crash the journal is intact up to (at most) a partial last line,
+which read_records() skips.
+
+The csv the data processing expects ({experiment_id}.csv with
+"bmg filename", "utc timestamp" columns) is exported from the journal on
+close() or on demand with export_csv(). From the command line:
+
+    python timestamp_journal.py <experiment_id>.journal [output.csv]
+"""
+
+import csv
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+BMG_READING = "bmg_reading"
+INCUBATOR_IN = "incubator_in"
+INCUBATOR_OUT = "incubator_out"
+OT2_START = "ot2_start"
+OT2_END = "ot2_end"
+
+CSV_HEADER = ["bmg filename", "utc timestamp"]
+TIMELINE_HEADER = ["event", "name", "utc timestamp"]
+
+
+def utc_now() -> datetime:
+    """Current UTC time, naive like the WEI step timestamps"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _field(value) -> str:
+    """Formats a record field, keeping the line structure intact"""
+    return str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+def _ends_with_newline(path) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class TimestampJournal:
+    """Buffered writer of experiment timestamps
+
+    `flush_every` is the number of records buffered before they are written
+    to the file (1 = every record), `fsync` additionally forces each flush
+    to disk. The defaults never lose a reading; a larger `flush_every` with
+    `fsync=False` trades the last few records on a crash for less I/O.
+    Write errors are printed, never raised, so a full disk or missing
+    directory does not fail the experiment.
+    """
+
+    def __init__(self, directory, experiment_id, flush_every=1, fsync=True):
+        self.directory = Path(directory)
+        self.experiment_id = experiment_id
+        self.flush_every = max(1, flush_every)
+        self.fsync = fsync
+
+        self.journal_path = self.directory / f"{experiment_id}.journal"
+        self.csv_path = self.directory / f"{experiment_id}.csv"
+        self._buffer = []
+        self._file = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+            if self._file.tell() > 0 and not _ends_with_newline(self.journal_path):
+                self._file.write("\n")  # terminate a partial line left by a crash
+        except OSError as e:
+            # DO NOT fail the experiment if the journal cannot be opened!
+            print(f"Could not open timestamp journal {self.journal_path}")
+            print(e)
+
+    def record(self, event, name, timestamp=None) -> None:
+        """Appends one record, `timestamp` defaults to the current UTC time"""
+        if timestamp is None:
+            timestamp = utc_now()
+        self._buffer.append(f"{_field(event)}\t{_field(name)}\t{_field(timestamp)}\n")
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def record_bmg_reading(self, bmg_filename, accurate_timestamp) -> None:
+        """Records the utc timestamp of a BMG reading file"""
+        self.record(BMG_READING, bmg_filename, accurate_timestamp)
+
+    def flush(self) -> None:
+        """Writes buffered records to the journal file"""
+        if not self._buffer or self._file is None:
+            return
+        try:
+            self._file.write("".join(self._buffer))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._buffer.clear()
+        except OSError as e:
+            # keep the records buffered and try again on the next flush
+            print("Could not write timestamps to journal")
+            print(e)
+
+    def close(self) -> None:
+        """Flushes the journal, closes it and exports the bmg timestamp csv"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.export_csv()
+
+    def export_csv(self, path=None) -> Path:
+        """Writes the "bmg filename", "utc timestamp" csv from the journal"""
+        self.flush()
+        return export_csv(self.journal_path, path or self.csv_path)
+
+    def export_timeline_csv(self, path=None) -> Path:
+        """Writes every journal record (event, name, utc timestamp) to a csv"""
+        self.flush()
+        return export_timeline_csv(
+            self.journal_path,
+            path or self.directory / f"{self.experiment_id}_timeline.csv",
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_records(journal_path) -> list:
+    """Returns the journal's (event, name, timestamp) records, skipping a
+    partial last line left by a crash"""
+    records = []
+    try:
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if not line.endswith("\n") or len(fields) != 3:
+                    continue
+                records.append(tuple(fields))
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def _write_csv(path, header, rows) -> Path:
+    path = Path(path)
+    try:
+        temp_path = path.with_name(f".{path.name}.tmp")
+        with open(temp_path, "w", newline="") as f:
+            csv_writer = csv.writer(f)
+            csv_writer.writerow(header)
+            csv_writer.writerows(rows)
+        os.replace(temp_path, path)
+    except OSError as e:
+        # DO NOT fail the experiment if data cannot write to csv file!
+        print(f"Could not export timestamps to {path}")
+        print(e)
+    return path
+
+
+def export_csv(journal_path, csv_path) -> Path:
+    """Writes the BMG reading records of a journal to a timestamp csv"""
+    rows = [
+        (name, timestamp)
+        for event, name, timestamp in read_records(journal_path)
+        if event == BMG_READING
+    ]
+    return _write_csv(csv_path, CSV_HEADER, rows)
+
+
+def export_timeline_csv(journal_path, csv_path) -> Path:
+    """Writes all records of a journal to a timeline csv"""
+    return _write_csv(csv_path, TIMELINE_HEADER, read_records(journal_path))
+
+
+if __name__ == "__main__":
+    # usage: python timestamp_journal.py <experiment_id>.journal [output.csv]
+    journal_path = Path(sys.argv[1])
+    csv_path = (
+        Path(sys.argv[2]) if len(sys.argv) > 2 else journal_path.with_suffix(".csv")
+    )
+    print(f"wrote {export_csv(journal_path, csv_path)}")
@@ -0,0 +1,477 @@
+"""Discrete-event simulator for experiment apps
+
+Runs an experiment app's own main() against a virtual clock and a simulated
+WEI server, so a multi-day experiment finishes in seconds. Every workflow
+step takes a duration drawn from the step durations recorded in earlier
+runs (run_info.steps start/end times), and each module runs one step at a
+time. The report gives the predicted makespan, how busy each module was and
+how long runs (and the plates they move) waited for a busy module.
+
+Step durations are read from jsonl files with one step per line:
+
+    {"module": "pf400", "action": "transfer", "start_time": "...", "end_time": "..."}
+
+("duration" in seconds may be given instead of start/end times). Steps with
+no history fall back to DEFAULT_DURATIONS.
+
+usage:
+    python workcell_simulator.py --history steps.jsonl
+    python workcell_simulator.py --incubation-scale 1 2     # 1 h vs 2 h cadence
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib
+import inspect
+import io
+import itertools
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from wei.types.workflow_types import Workflow, WorkflowStatus
+
+import helper_functions
+from incubation_scheduler import IncubationScheduler
+
+PAYLOAD_PREFIX = "payload."
+
+# experiment app simulated when --app is not given (whichever is next to this file)
+DEFAULT_APPS = ("substrate_2_plate_app", "experiment_app")
+
+# seconds per step when there is no history for its module and action
+DEFAULT_DURATIONS = {
+    "open": 10.0,
+    "close": 10.0,
+    "transfer": 45.0,
+    "transfer_labware": 45.0,
+    "remove_lid": 30.0,
+    "replace_lid": 30.0,
+    "get_plate": 60.0,
+    "incubate": 5.0,
+    "run_assay": 240.0,
+    "run_protocol": 900.0,
+}
+DEFAULT_DURATION = 30.0
+
+# ExperimentClient methods SimulatedExperimentClient stands in for. The
+# app's real client must have them too, so a simulation cannot pass on a
+# call that fails on the workcell.
+CLIENT_METHODS = ("start_run", "query_run")
+
+
+class VirtualClock:
+    """Clock whose sleep() only moves the time forward"""
+
+    def __init__(self, start=None):
+        self.now = time.time() if start is None else start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds) -> None:
+        self.now += max(0.0, seconds)
+
+    def advance_to(self, when) -> None:
+        self.now = max(self.now, when)
+
+    def datetime(self, when=None) -> datetime:
+        """Naive UTC datetime of a clock time, like the WEI step timestamps"""
+        when = self.now if when is None else when
+        return datetime.fromtimestamp(when, timezone.utc).replace(tzinfo=None)
+
+
+def _seconds(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+class DurationModel:
+    """Empirical step duration distributions keyed by (module, action)"""
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self.samples = defaultdict(list)  # (module, action) -> [seconds]
+
+    def add(self, module, action, seconds) -> None:
+        if seconds is not None and seconds >= 0:
+            self.samples[(module, action)].append(float(seconds))
+            self.samples[("*", action)].append(float(seconds))
+
+    def add_step(self, step) -> None:
+        """Adds a finished step (WEI Step or step dict) with start/end times"""
+        if isinstance(step, dict):
+            step = SimpleNamespace(**step)
+        duration = getattr(step, "duration", None)
+        if duration is None:
+            start, end = (
+                getattr(step, "start_time", None),
+                getattr(step, "end_time", None),
+            )
+            if start is None or end is None:
+                return
+            duration = _seconds(end) - _seconds(start)
+        self.add(step.module, step.action, duration)
+
+    def add_run(self, run_info) -> None:
+        """Adds every step of a finished WorkflowRun"""
+        for step in run_info.steps:
+            self.add_step(step)
+
+    def load(self, path) -> None:
+        """Adds the steps of a jsonl step history file"""
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    self.add_step(json.loads(line))
+
+    def sample(self, module, action) -> float:
+        for key in ((module, action), ("*", action)):
+            if self.samples.get(key):
+                return self.rng.choice(self.samples[key])
+        return DEFAULT_DURATIONS.get(action, DEFAULT_DURATION)
+
+
+@dataclass
+class SimulatedRun:
+    """Stands in for the WorkflowRun returned by the WEI server"""
+
+    run_id: str
+    name: str
+    steps: list
+    start_time: datetime
+    end_time: datetime
+    finish: float  # clock time the last step ends
+    clock: VirtualClock = field(repr=False)
+
+    @property
+    def status(self):
+        if self.clock.now >= self.finish:
+            return WorkflowStatus.COMPLETED
+        return WorkflowStatus.RUNNING
+
+
+class SimulatedExperimentClient:
+    """ExperimentClient stand-in that schedules workflow steps on simulated
+    modules instead of sending them to the WEI server
+
+    A step starts once the run's previous step is done and its module is
+    free, so runs started together (e.g. by the ConcurrentRunner) queue for
+    shared modules. The waits and module busy times are kept for the report.
+    """
+
+    def __init__(self, clock, durations, experiment_id="simulated_experiment"):
+        self.clock = clock
+        self.durations = durations
+        self.experiment = SimpleNamespace(experiment_id=experiment_id)
+
+        self.runs = {}  # run_id -> SimulatedRun
+        self.module_free_at = defaultdict(float)
+        self.module_busy = defaultdict(float)  # module -> seconds running steps
+        self.module_wait = defaultdict(float)  # module -> seconds runs waited for it
+        # plate -> module -> seconds
+        self.plate_wait = defaultdict(lambda: defaultdict(float))
+        self.start = clock.now
+        self._run_ids = itertools.count(1)
+
+    def start_run(
+        self, workflow, payload=None, blocking=True, simulate=False, **kwargs
+    ):
+        payload = payload or {}
+        if not isinstance(workflow, Workflow):
+            workflow = helper_functions.replace_wf_node_names(Path(workflow), payload)
+        # the plate is identified by its incubator slot (one per plate)
+        plate = payload.get("incubator_node", "plate")
+
+        run_start = t = self.clock.now
+        steps = []
+        for step in workflow.flowdef:
+            module = step.module
+            if isinstance(module, str) and module.startswith(PAYLOAD_PREFIX):
+                module = payload.get(module[len(PAYLOAD_PREFIX) :], module)
+            duration = self.durations.sample(module, step.action)
+            start = max(t, self.module_free_at[module])
+            if start > t:
+                self.module_wait[module] += start - t
+                self.plate_wait[plate][module] += start - t
+            t = start + duration
+            self.module_free_at[module] = t
+            self.module_busy[module] += duration
+            steps.append(
+                SimpleNamespace(
+                    name=step.name,
+                    module=module,
+                    action=step.action,
+                    start_time=self.clock.datetime(start),
+                    end_time=self.clock.datetime(t),
+                )
+            )
+
+        run_info = SimulatedRun(
+            run_id=f"sim_{next(self._run_ids)}",
+            name=workflow.name,
+            steps=steps,
+            start_time=self.clock.datetime(run_start),
+            end_time=self.clock.datetime(t),
+            finish=t,
+            clock=self.clock,
+        )
+        self.runs[run_info.run_id] = run_info
+        if blocking:
+            self.clock.advance_to(t)
+        return run_info
+
+    def query_run(self, run_id):
+        return self.runs[run_id]
+
+    def report(self) -> dict:
+        """Makespan, module utilization and waits of the simulated runs"""
+        makespan = max(self.clock.now - self.start, 1e-9)
+        return {
+            "makespan_hours": makespan / 3600,
+            "runs": len(self.runs),
+            "modules": {
+                module: {
+                    "busy_hours": busy / 3600,
+                    "utilization": busy / makespan,
+                    "wait_hours": self.module_wait[module] / 3600,
+                }
+                for module, busy in sorted(self.module_busy.items())
+            },
+            "plate_waits_hours": {
+                plate: {
+                    module: seconds / 3600 for module, seconds in sorted(waits.items())
+                }
+                for plate, waits in sorted(self.plate_wait.items())
+            },
+        }
+
+
+_simulation_ids = itertools.count(1)
+
+
+class ScaledIncubationScheduler(IncubationScheduler):
+    """IncubationScheduler whose incubations last `scale` times longer"""
+
+    def __init__(self, *args, scale=1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scale = scale
+
+    def schedule(self, plate, seconds, action=None, start_time=None) -> float:
+        return super().schedule(
+            plate, seconds * self.scale, action=action, start_time=start_time
+        )
+
+
+def simulate(
+    app_name, durations, incubation_scale=1.0, verbose=False, data_directory=None
+) -> dict:
+    """Runs an experiment app's main() in simulation and returns the report.
+    The app's journal, csv, step history and checkpoint go to
+    `data_directory`, or to a temporary directory deleted afterwards."""
+    clock = VirtualClock()
+    client = SimulatedExperimentClient(
+        clock, durations, experiment_id=f"simulation_{next(_simulation_ids)}"
+    )
+    app = importlib.import_module(app_name)
+    missing = [
+        name for name in CLIENT_METHODS if not hasattr(app.ExperimentClient, name)
+    ]
+    if missing:
+        raise AttributeError(
+            f"{app_name}.ExperimentClient has no {', '.join(missing)}, the simulation would not match the workcell"
+        )
+
+    # swap the app's WEI client, clocks and output files for simulated ones
+    scratch_directory = (
+        tempfile.TemporaryDirectory(prefix="workcell_simulation_")
+        if data_directory is None
+        else None
+    )
+    data_directory = Path(data_directory or scratch_directory.name)
+    app_client = app.ExperimentClient
+
+    def simulated_client(*args, **kwargs):
+        # same arguments as the real client, so a call it rejects fails here too
+        arguments = inspect.signature(app_client).bind(*args, **kwargs).arguments
+        if isinstance(
+            arguments.get("experiment"), str
+        ):  # continuing an experiment by id
+            client.experiment.experiment_id = arguments["experiment"]
+        return client
+
+    patches = {
+        "ExperimentClient": simulated_client,
+        "IncubationScheduler": functools.partial(
+            ScaledIncubationScheduler,
+            clock=clock.time,
+            sleep=clock.sleep,
+            scale=incubation_scale,
+        ),
+        "time": SimpleNamespace(time=clock.time, sleep=clock.sleep),
+    }
+    runners = []
+    if hasattr(app, "ConcurrentRunner"):
+        app_runner = app.ConcurrentRunner
+
+        def simulated_runner(*args, **kwargs):
+            runners.append(
+                app_runner(*args, sleep=clock.sleep, clock=clock.time, **kwargs)
+            )
+            return runners[-1]
+
+        patches["ConcurrentRunner"] = simulated_runner
+    if hasattr(app, "TimestampJournal"):
+        app_journal = app.TimestampJournal
+        patches["TimestampJournal"] = (
+            lambda directory, experiment_id, **kwargs: app_journal(
+                data_directory, experiment_id, fsync=False
+            )
+        )
+    if hasattr(app, "StepProfiler"):
+        app_profiler = app.StepProfiler
+        patches["StepProfiler"] = lambda path, **kwargs: app_profiler(
+            data_directory / Path(path).name, **kwargs
+        )
+    if hasattr(app, "RunCheckpoint"):
+        app_checkpoint = app.RunCheckpoint
+        patches["RunCheckpoint"] = lambda path, **kwargs: app_checkpoint(
+            data_directory / Path(path).name, **kwargs
+        )
+
+    originals = {name: getattr(app, name, None) for name in patches}
+    try:
+        for name, value in patches.items():
+            setattr(app, name, value)
+        output = (
+            contextlib.nullcontext()
+            if verbose
+            else contextlib.redirect_stdout(io.StringIO())
+        )
+        with output:
+            app.main()
+    finally:
+        for name, value in originals.items():
+            setattr(app, name, value)
+        if scratch_directory is not None:
+            scratch_directory.cleanup()
+
+    report = client.report()
+    report["incubation_scale"] = incubation_scale
+    # time plate pipelines spent queued behind another plate's locks
+    queue_waits = defaultdict(lambda: defaultdict(float))
+    for runner in runners:
+        for (pipeline, lock_name), seconds in runner.waits.items():
+            queue_waits[pipeline][lock_name] += seconds / 3600
+    report["queue_waits_hours"] = {
+        pipeline: dict(sorted(waits.items()))
+        for pipeline, waits in sorted(queue_waits.items())
+    }
+    return report
+
+
+def print_report(report) -> None:
+    print(
+        f"\nincubation scale {report['incubation_scale']}: "
+        f"makespan {report['makespan_hours']:.1f} h over {report['runs']} runs"
+    )
+    print(f"\t{'module':<28}{'busy h':>9}{'util':>8}{'wait h':>9}")
+    for module, stats in report["modules"].items():
+        print(
+            f"\t{module:<28}{stats['busy_hours']:>9.2f}{stats['utilization']:>8.1%}{stats['wait_hours']:>9.2f}"
+        )
+    for plate, waits in report["plate_waits_hours"].items():
+        waited = ", ".join(
+            f"{module} {hours:.2f} h" for module, hours in waits.items() if hours > 0
+        )
+        if waited:
+            print(f"\t{plate} waited on: {waited}")
+    for pipeline, waits in report.get("queue_waits_hours", {}).items():
+        waited = ", ".join(
+            f"{lock_name} {hours:.2f} h"
+            for lock_name, hours in waits.items()
+            if hours > 0
+        )
+        if waited:
+            print(f"\t{pipeline} queued behind: {waited}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Simulate an experiment app against a virtual clock"
+    )
+    parser.add_argument("--app", help="experiment app module to simulate")
+    parser.add_argument(
+        "--history", nargs="*", default=[], help="jsonl step duration history files"
+    )
+    parser.add_argument(
+        "--incubation-scale",
+        nargs="*",
+        type=float,
+        default=[1.0],
+        help="incubation length multipliers to compare (e.g. 1 2)",
+    )
+    parser.add_argument(
+        "--replications", type=int, default=1, help="simulations per incubation scale"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the reports to this json file")
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the app's own prints"
+    )
+    parser.add_argument(
+        "--data-directory",
+        help="keep the simulated journal, csv, steps and checkpoint here (default: a temporary directory)",
+    )
+    args = parser.parse_args()
+
+    src_directory = Path(__file__).parent
+    sys.path.insert(0, str(src_directory))
+    app_name = args.app or next(
+        name for name in DEFAULT_APPS if (src_directory / f"{name}.py").exists()
+    )
+    rng = random.Random(args.seed)
+    durations = DurationModel(rng)
+    for path in args.history:
+        durations.load(path)
+    print(
+        f"step duration samples for {len([key for key in durations.samples if key[0] != '*'])} module actions"
+    )
+
+    reports = []
+    for scale in args.incubation_scale:
+        makespans = []
+        for _ in range(args.replications):
+            report = simulate(
+                app_name,
+                durations,
+                incubation_scale=scale,
+                verbose=args.verbose,
+                data_directory=args.data_directory,
+            )
+            makespans.append(report["makespan_hours"])
+            reports.append(report)
+        print_report(report)
+        if len(makespans) > 1:
+            print(
+                f"\tmakespan over {len(makespans)} replications: mean {statistics.mean(makespans):.1f} h, "
+                f"min {min(makespans):.1f} h, max {max(makespans):.1f} h"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
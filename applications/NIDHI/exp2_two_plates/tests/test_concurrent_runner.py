@@ -0,0 +1,223 @@
+from types import SimpleNamespace
+
+import pytest
+from wei.types.step_types import Step
+from wei.types.workflow_types import Workflow, WorkflowStatus
+
+from concurrent_runner import ConcurrentRunner
+
+
+def make_workflow(name, *steps):
+    return Workflow(
+        name=name,
+        flowdef=[
+            Step(name=f"{name} {i}", module=module, action=action, args=args)
+            for i, (module, action, args) in enumerate(steps)
+        ],
+    )
+
+
+class FakeClient:
+    """Runs finish after a number of polls (by workflow name, default 1)"""
+
+    def __init__(self, polls=None, fail=()):
+        self.polls = polls or {}
+        self.fail = set(fail)
+        self.events = []
+        self.payloads = []
+        self._runs = {}
+
+    def start_run(self, workflow, payload, blocking, simulate):
+        assert not blocking
+        run_id = f"run{len(self._runs)}"
+        self._runs[run_id] = [workflow.name, self.polls.get(workflow.name, 1)]
+        self.events.append(("start", workflow.name))
+        self.payloads.append(payload)
+        return SimpleNamespace(run_id=run_id)
+
+    def query_run(self, run_id):
+        run = self._runs[run_id]
+        run[1] -= 1
+        if run[1] > 0:
+            return SimpleNamespace(status=WorkflowStatus.RUNNING)
+        self.events.append(("finish", run[0]))
+        if run[0] in self.fail:
+            return SimpleNamespace(status=WorkflowStatus.FAILED)
+        return SimpleNamespace(status=WorkflowStatus.COMPLETED)
+
+
+def make_runner(client):
+    return ConcurrentRunner(client, polling_interval=0, sleep=lambda seconds: None)
+
+
+def pipeline(*workflows, payload=None):
+    run_infos = []
+    for workflow in workflows:
+        run_infos.append((yield workflow, payload or {}))
+    return len(run_infos)
+
+
+def test_plates_on_different_modules_run_at_the_same_time():
+    client = FakeClient(polls={"ot2 a": 3, "ot2 b": 3})
+    runner = make_runner(client)
+    runner.add_pipeline(
+        "a", pipeline(make_workflow("ot2 a", ("ot2_a", "run_protocol", {})))
+    )
+    runner.add_pipeline(
+        "b", pipeline(make_workflow("ot2 b", ("ot2_b", "run_protocol", {})))
+    )
+
+    assert runner.run() == {"a": 1, "b": 1}
+    assert client.events[:2] == [("start", "ot2 a"), ("start", "ot2 b")]
+
+
+def test_plates_sharing_a_module_wait_in_order():
+    client = FakeClient(polls={"read a": 3})
+    runner = make_runner(client)
+    runner.add_pipeline(
+        "a", pipeline(make_workflow("read a", ("bmg", "run_assay", {})))
+    )
+    runner.add_pipeline(
+        "b", pipeline(make_workflow("read b", ("bmg", "run_assay", {})))
+    )
+
+    runner.run()
+
+    assert client.events == [
+        ("start", "read a"),
+        ("finish", "read a"),
+        ("start", "read b"),
+        ("finish", "read b"),
+    ]
+    assert set(runner.waits) == {("b", "bmg")}
+
+
+def test_a_finished_run_moves_its_plate_on_before_others_start():
+    client = FakeClient()
+    runner = make_runner(client)
+    to_bmg = make_workflow(
+        "to bmg", ("pf400", "transfer", {"source": "inc_a", "target": "bmg_nest"})
+    )
+    from_bmg = make_workflow(
+        "from bmg", ("pf400", "transfer", {"source": "bmg_nest", "target": "inc_a"})
+    )
+    other = make_workflow(
+        "other", ("pf400", "transfer", {"source": "inc_b", "target": "bmg_nest"})
+    )
+    runner.add_pipeline("a", pipeline(to_bmg, from_bmg))
+    runner.add_pipeline("b", pipeline(other))
+
+    runner.run()
+
+    # b's plate can't go to the bmg nest while a's plate is still in it
+    assert client.events == [
+        ("start", "to bmg"),
+        ("finish", "to bmg"),
+        ("start", "from bmg"),
+        ("finish", "from bmg"),
+        ("start", "other"),
+        ("finish", "other"),
+    ]
+
+
+def test_a_location_never_cleared_is_reported():
+    client = FakeClient()
+    runner = make_runner(client)
+    runner.add_pipeline(
+        "a",
+        pipeline(
+            make_workflow(
+                "park", ("pf400", "transfer", {"source": "inc_a", "target": "nest"})
+            )
+        ),
+    )
+    runner.add_pipeline(
+        "b",
+        pipeline(
+            make_workflow(
+                "use", ("pf400", "transfer", {"source": "inc_b", "target": "nest"})
+            )
+        ),
+    )
+
+    with pytest.raises(RuntimeError, match="never released"):
+        runner.run()
+
+
+def test_failed_runs_stop_the_runner():
+    client = FakeClient(fail={"read a"})
+    runner = make_runner(client)
+    runner.add_pipeline(
+        "a", pipeline(make_workflow("read a", ("bmg", "run_assay", {})))
+    )
+
+    with pytest.raises(RuntimeError, match="ended with status"):
+        runner.run()
+
+
+def test_pipeline_resources_are_held_until_it_finishes():
+    client = FakeClient()
+    runner = make_runner(client)
+    runner.add_pipeline(
+        "a",
+        pipeline(
+            make_workflow("first", ("ot2_a", "run_protocol", {})),
+            make_workflow("second", ("ot2_a", "run_protocol", {})),
+        ),
+        resources={"tip_rack"},
+    )
+    runner.add_pipeline(
+        "b",
+        pipeline(make_workflow("other", ("ot2_b", "run_protocol", {}))),
+        resources={"tip_rack"},
+    )
+
+    assert runner.is_running("a")
+    runner.run()
+
+    assert not runner.is_running("a")
+    assert client.events.index(("start", "other")) > client.events.index(
+        ("finish", "second")
+    )
+
+
+def test_payloads_are_copied_at_submission():
+    client = FakeClient()
+    runner = make_runner(client)
+    payload = {"plate": 1}
+
+    def steps():
+        yield make_workflow("first", ("bmg", "run_assay", {})), payload
+        payload["plate"] = 2
+        yield make_workflow("second", ("bmg", "run_assay", {})), payload
+
+    runner.add_pipeline("a", steps())
+    runner.run()
+
+    assert client.payloads == [{"plate": 1}, {"plate": 2}]
+
+
+def test_on_poll_can_add_pipelines():
+    client = FakeClient(polls={"first": 2})
+    runner = make_runner(client)
+    runner.add_pipeline(
+        "a", pipeline(make_workflow("first", ("ot2_a", "run_protocol", {})))
+    )
+
+    def on_poll():
+        if not runner.is_running("b") and "b" not in runner.results:
+            runner.add_pipeline(
+                "b", pipeline(make_workflow("late", ("ot2_b", "run_protocol", {})))
+            )
+
+    assert runner.run(on_poll=on_poll) == {"a": 1, "b": 1}
+
+
+def test_a_pipeline_name_runs_once_at_a_time():
+    runner = make_runner(FakeClient())
+    runner.add_pipeline("a", pipeline(make_workflow("first", ("bmg", "run_assay", {}))))
+
+    with pytest.raises(ValueError):
+        runner.add_pipeline(
+            "a", pipeline(make_workflow("again", ("bmg", "run_assay", {})))
+        )
@@ -0,0 +1,126 @@
+from incubation_scheduler import IncubationScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock):
+    return IncubationScheduler(clock=clock, sleep=clock.sleep, report_interval=600)
+
+
+def test_run_next_dispatches_earliest_deadline_first():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.schedule("exp2", 300)
+    scheduler.schedule("exp1", 100)
+    scheduler.schedule("exp3", 200)
+
+    dispatched = []
+    while scheduler.run_next(dispatched.append) is not None:
+        pass
+
+    assert dispatched == ["exp1", "exp3", "exp2"]
+    assert clock.now == 1300
+    assert len(scheduler) == 0
+
+
+def test_rescheduling_replaces_the_old_deadline():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.schedule("exp1", 100)
+    scheduler.schedule("exp2", 200)
+    scheduler.schedule("exp1", 500)
+
+    assert scheduler.peek() == ("exp2", 1200)
+    assert scheduler.pending() == [(1200, "exp2"), (1500, "exp1")]
+    assert scheduler.run_next() == "exp2"
+    assert scheduler.run_next() == "exp1"
+    assert clock.now == 1500
+    assert scheduler.run_next() is None
+
+
+def test_cancelled_plates_are_skipped():
+    scheduler = make_scheduler(FakeClock())
+    scheduler.schedule("exp1", 100)
+    scheduler.schedule("exp2", 200)
+    scheduler.cancel("exp1")
+    scheduler.cancel("exp3")  # never scheduled
+
+    assert "exp1" not in scheduler
+    assert scheduler.peek() == ("exp2", 1200)
+
+
+def test_wait_until_prints_a_countdown_every_report_interval(capsys):
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.schedule("exp1", 1500)
+
+    scheduler.wait_for("exp1")
+
+    assert clock.slept == [600, 600, 300]
+    assert len(capsys.readouterr().out.splitlines()) == 3
+    assert "exp1" not in scheduler
+
+
+def test_schedule_from_a_past_start_time():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    deadline = scheduler.schedule("exp1", 3600, start_time=clock.now - 3000)
+
+    assert deadline == clock.now + 600
+    assert scheduler.started_at("exp1") == clock.now - 3000
+    assert scheduler.time_remaining("exp1") == 600
+
+
+def test_dispatch_prefers_the_plates_own_action():
+    scheduler = make_scheduler(FakeClock())
+    calls = []
+    scheduler.schedule("exp1", 0, action=lambda plate: calls.append(("own", plate)))
+    scheduler.schedule("exp2", 0)
+
+    scheduler.dispatch("exp1", lambda plate: calls.append(("default", plate)))
+    scheduler.dispatch("exp2", lambda plate: calls.append(("default", plate)))
+
+    assert calls == [("own", "exp1"), ("default", "exp2")]
+
+
+def test_run_due_skips_busy_plates_without_holding_up_later_ones():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.schedule("exp1", 10)
+    scheduler.schedule("exp2", 20)
+    scheduler.schedule("exp3", 5000)
+    clock.now += 100
+
+    dispatched = scheduler.run_due(skip=lambda plate: plate == "exp1")
+
+    assert dispatched == ["exp2"]
+    assert clock.slept == []
+    assert "exp1" in scheduler  # still due, dispatched once it is not busy
+    assert scheduler.run_due() == ["exp1"]
+    assert scheduler.run_due() == []
+
+
+def test_run_due_skips_plates_rescheduled_by_an_earlier_action():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.schedule("exp1", 10)
+    scheduler.schedule("exp2", 20)
+    clock.now += 100
+
+    def action(plate):
+        if plate == "exp1":
+            scheduler.schedule("exp2", 3600)
+
+    assert scheduler.run_due(action) == ["exp1"]
+    assert scheduler.deadline("exp2") == clock.now + 3600
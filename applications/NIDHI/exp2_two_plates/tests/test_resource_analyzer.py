@@ -0,0 +1,109 @@
+from pathlib import Path
+
+from wei.types.step_types import Step
+from wei.types.workflow_types import Workflow
+
+from resource_analyzer import (
+    LockTable,
+    RunResources,
+    physical_location,
+    resolve_workflow_resources,
+)
+
+WORKFLOWS = Path(__file__).resolve().parents[1] / "workflows"
+
+
+def make_workflow(*steps):
+    return Workflow(
+        name="test",
+        flowdef=[
+            Step(name=f"step {i}", module=module, action=action, args=args)
+            for i, (module, action, args) in enumerate(steps)
+        ],
+    )
+
+
+def test_physical_location_drops_height_and_rotation():
+    assert physical_location("exchange_deck_low_narrow") == "exchange"
+    assert physical_location("exchange_deck_high_wide") == "exchange"
+    assert physical_location("lidnest_1_wide") == "lidnest_1"
+    assert physical_location("bmg_reader_nest") == "bmg_reader_nest"
+
+
+def test_workflow_file_resources():
+    payload = {
+        "incubator_node": "inheco_devID2_floor0",
+        "incubator_location": "inheco_devID2_floor0_nest",
+        "lid_location": "lidnest_1_wide",
+        "incubation_seconds": 3600,
+    }
+    resources = resolve_workflow_resources(
+        WORKFLOWS / "run_instrument" / "bmg_to_run_incubator_wf.yaml", payload
+    )
+
+    assert resources.modules == {
+        "bio_bmg",
+        "biopf400",
+        "sciclops",
+        "inheco_devID2_floor0",
+    }
+    assert resources.locations == {
+        "bmg_reader_nest",
+        "exchange",
+        "lidnest_1",
+        "inheco_devID2_floor0_nest",
+    }
+    # the plate ends up in the incubator, its lid back on it
+    assert resources.placed == {"inheco_devID2_floor0_nest"}
+    assert resources.cleared == {"bmg_reader_nest", "lidnest_1"}
+
+
+def test_a_location_filled_and_emptied_in_one_run_is_neither_placed_nor_cleared():
+    workflow = make_workflow(
+        ("pf400", "transfer", {"source": "a", "target": "b"}),
+        ("sciclops", "remove_lid", {"source": "b", "target": "lidnest_1"}),
+        ("sciclops", "replace_lid", {"source": "lidnest_1", "target": "b"}),
+        ("pf400", "transfer", {"source": "b", "target": "c"}),
+    )
+    resources = resolve_workflow_resources(workflow, {})
+
+    assert resources.placed == {"c"}
+    assert resources.cleared == {"a"}
+    assert resources.names == {"pf400", "sciclops", "a", "b", "c", "lidnest_1"}
+
+
+def test_lock_table_blocks_other_holders_only():
+    locks = LockTable()
+    run = RunResources(
+        modules=frozenset({"pf400"}),
+        locations=frozenset({"a", "b"}),
+        placed=frozenset({"b"}),
+        cleared=frozenset({"a"}),
+    )
+    locks.start_run("plate1", run)
+
+    assert locks.blockers("plate1", {"pf400", "a"}) == set()
+    assert locks.blockers("plate2", {"pf400", "c"}) == {"pf400"}
+
+    locks.finish_run("plate1", run)
+    # the plate it left in b keeps b locked to plate1
+    assert locks.blockers("plate2", {"pf400", "a", "b"}) == {"b"}
+
+    locks.finish_run(
+        "plate1",
+        RunResources(
+            modules=frozenset({"pf400"}),
+            locations=frozenset({"b", "c"}),
+            placed=frozenset({"c"}),
+            cleared=frozenset({"b"}),
+        ),
+    )
+    assert locks.blockers("plate2", {"b"}) == set()
+    assert locks.occupied == {"c": "plate1"}
+
+
+def test_release_keeps_other_holders_locks():
+    locks = LockTable()
+    locks.acquire("plate1", {"ot2"})
+    locks.release("plate2", {"ot2"})
+    assert locks.held == {"ot2": "plate1"}
@@ -10,20 +10,34 @@ TODO:
 
 """
 
+import argparse
 from pathlib import Path
 
 from wei import ExperimentClient
 from wei.types.experiment_types import CampaignDesign, ExperimentDesign
 
 from datetime import datetime
-import time
 import helper_functions
+from incubation_scheduler import IncubationScheduler
+import timestamp_journal
+from timestamp_journal import TimestampJournal
+from step_profiler import StepProfiler
+from run_index import RunIndex
+from run_checkpoint import RunCheckpoint
 
 
-def main() -> None:
-    """Runs the Substrate Experiment Application"""
+def main(resume: bool = False) -> None:
+    """Runs the Substrate Experiment Application. With `resume`, continues
+    the experiment from its last checkpoint (see run_checkpoint.py)"""
 
     # INITIAL EXPERIMENT SETUP -------------------------------------------------
+    # data and checkpoint directory
+    csv_data_directory = "/home/rpl/workspace/Nidhi_data"
+    checkpoint = RunCheckpoint(
+        Path(csv_data_directory) / "Substrate_Experiment_3a_checkpoint.json",
+        resume=resume,
+    )
+
     # define the ExperimentDesign object that will be used to register the experiment
     experiment_design = ExperimentDesign(
         experiment_name="Substrate_Experiment_3a",
@@ -36,11 +50,12 @@ def main() -> None:
         campaign_description="Campaign to collect substrate experiments",
     )
     # define the experiment client object that will communicate with the WEI server
+    # (given the checkpoint's experiment id when resuming, the client continues that experiment and its campaign)
     experiment_client = ExperimentClient(
         server_host="localhost",
         server_port="8000",
-        experiment=experiment_design,
-        campaign=campaign,
+        experiment=checkpoint.experiment_id or experiment_design,
+        campaign=None if checkpoint.experiment_id else campaign,
     )
 
     # DEFINE PATHS AND VARIABLES
@@ -77,7 +92,7 @@ def main() -> None:
         wf_directory / "remove_old_substrate_plate_wf.yaml"
     )
     at_end_ot2_to_exchange_wf = (
-        wf_directory / "at_end_ot2_to_exchange_wf.yaml"
+        wf_directory / "at_end_ot2_to_exchange.yaml"
     )
 
     # protocol paths (for OT-2)
@@ -89,10 +104,14 @@ def main() -> None:
     plate_num = 0
     reading_in_plate_num = 10
     current_tower_deck = 1
-    csv_data_directory = "/home/rpl/workspace/Nidhi_data"
     test_prints = True  # if True, print out extra info for testing purposes
     incubation_seconds_initial = 36000 # 36000 seconds = 10 hours
     incubation_seconds_between_readings = 3600 # 3600 seconds = 1 hour
+    scheduler = IncubationScheduler()   # tracks when the plate is done incubating
+    journal = TimestampJournal(csv_data_directory, experiment_id)   # utc timestamps of the plate timeline
+    run_index = RunIndex()   # steps of every run by name, module and action
+    profiler = StepProfiler(Path(csv_data_directory) / f"{experiment_id}_steps.jsonl", index=run_index)   # duration of every step run
+    experiment_client = profiler.wrap(experiment_client)
 
     exp1_variables = {
         "old_lid_location": "lidnest_2_wide", # use old lid location at start
@@ -128,266 +147,257 @@ def main() -> None:
         "bmg_assay_name": "NIDHI",
     }
 
-    # EXPERIMENT ACTIONS -------------------------------------------------------
-    """
-    Experiment setup at start:
-
-    Location:
-        exchange: inoculated microplate plate with lid
-        Tower decks 1-5: extra substrate microplates with lids
-        OT-2 (ot2biobeta) decks 4-11: 20uL tip racks
-        ALL OTHER LOCATIONS: EMPTY
-    """
-
-    # 1. Move immediately into incubator with lid on for 10 hours
-    experiment_client.start_run(
-        exchange_to_run_incubator_wf.resolve(),
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-    # capture incubation start time
-    incubation_start_time = time.time()
-
-    # wait for incubation to finish   # NOT TESTED
-    while time.time() - incubation_start_time < payload["incubation_seconds"]:
-        print(f"will continue in... {int(payload["incubation_seconds"]-(time.time() - incubation_start_time))} seconds")
-        time.sleep(5) # 5 seconds
-
-    # 2. Transfer plate 0 into bmg and take reading (plate0_T10)
-    timestamp_now = int(datetime.now().timestamp())
-    payload["bmg_data_output_name"] = (
-        f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{plate_num}_T{reading_in_plate_num}.txt"
-    )
-    run_info = experiment_client.start_run(
-        incubator_to_run_bmg_wf.resolve(),
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-    # write utc bmg timestamp to csv data file
-    helper_functions.write_timestamps_to_csv(
-        csv_directory_path=csv_data_directory,
-        experiment_id=experiment_id,
-        bmg_filename=payload["bmg_data_output_name"],
-        accurate_timestamp=run_info.steps[8].end_time,  # index 8 = bmg reading
-    )
-    if test_prints:
-        print(f"\twriting data to csv: {payload['bmg_data_output_name']}, with timestamp {run_info.steps[8].end_time}")
-
-    # 3. Transfer old plate into the OT-2
-    experiment_client.start_run(
-        bmg_to_ot2_wf.resolve(),
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
-
-    # OUTER LOOP START
-    for i in range(total_outer_loops):
-
-        # modify variables
-        plate_num += 1
-        reading_in_plate_num = 0
-        payload["lid_location"] = exp1_variables["new_lid_location"]
-        payload["lid_safe_path"] = exp1_variables["new_safe_lid_location"]
-        payload["ot2_location"] = exp1_variables["new_ot2_plate_location"]
-        payload["incubation_seconds"] = incubation_seconds_between_readings
-
-        # 4. Get new substrate plate, take contam reading, then move to OT-2 new location
-        timestamp_now = int(datetime.now().timestamp())
-        payload["bmg_data_output_name"] = (
-            f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{plate_num}_contam.txt"
-        )
-        run_info = experiment_client.start_run(
-            get_new_plate_and_run_bmg_wf.resolve(),
-            payload=payload,
-            blocking=True,
-            simulate=False,
-        )
-        # write utc bmg timestamp to csv data file
-        helper_functions.write_timestamps_to_csv(
-            csv_directory_path=csv_data_directory,
-            experiment_id=experiment_id,
-            bmg_filename=payload["bmg_data_output_name"],
-            accurate_timestamp=run_info.steps[5].end_time,  # index 5 = bmg reading
-        )
-        if test_prints:
-            print(f"\twriting data to csv: {payload['bmg_data_output_name']}, with timestamp {run_info.steps[5].end_time}")
-
-        # modify variables
-        reading_in_plate_num += 1
-
-        # 5. Transfer new plate from bmg to new ot2 location
-        experiment_client.start_run(
-            bmg_to_ot2_wf.resolve(),
-            payload=payload,
-            blocking=True,
-            simulate=False,
-        )
+    # checkpoint after every completed run
+    checkpoint.experiment_id = experiment_id
+    checkpoint.scheduler = scheduler
+    checkpoint.state = lambda: {
+        "plate_num": plate_num,
+        "reading_in_plate_num": reading_in_plate_num,
+        "current_tower_deck": current_tower_deck,
+        "exp1_variables": exp1_variables,
+        "payload": {key: value for key, value in payload.items() if key != "bmg_data_output_name"},
+    }
 
-        # 6. Run inoculation ot2 protocol
-        ot2_replacement_variables = helper_functions.collect_ot2_replacement_variables(payload)
-        temp_ot2_file_str = helper_functions.generate_ot2_protocol(inoculate_protocol, ot2_replacement_variables)
-        payload["current_ot2_protocol"] = temp_ot2_file_str
-        experiment_client.start_run(
-            run_ot2_wf.resolve(),
-            payload=payload,
-            blocking=True,
-            simulate=False,
+    try:
+        # EXPERIMENT ACTIONS -------------------------------------------------------
+        """
+        Experiment setup at start:
+
+        Location:
+            exchange: inoculated microplate plate with lid
+            Tower decks 1-5: extra substrate microplates with lids
+            OT-2 (ot2biobeta) decks 4-11: 20uL tip racks
+            ALL OTHER LOCATIONS: EMPTY
+        """
+
+        # 1. Move immediately into incubator with lid on for 10 hours
+        run_info = checkpoint.start_run(
+            experiment_client,
+            helper_functions.replace_wf_node_names(exchange_to_run_incubator_wf, payload),
+            payload,
+            incubation=("plate", payload["incubation_seconds"]),  # capture incubation start time
         )
+        if run_info is not None:  # None = run skipped on resume
+            journal.record(timestamp_journal.INCUBATOR_IN, f"exp1_{plate_num}", run_index.add(run_info).step(action="incubate").start_time)
 
-        # modify variables
-        exp1_variables["tip_box_location"] += 1
-        if exp1_variables["tip_box_location"] == 12:  # reset if necessary
-            exp1_variables["tip_box_location"] = 4
-        payload["tip_box_location"] = exp1_variables["tip_box_location"]
+        # wait for incubation to finish   # NOT TESTED
+        checkpoint.wait_for("plate")
 
-        # 7. Transfer new plate into bmg and take T1 reading
+        # 2. Transfer plate 0 into bmg and take reading (plate0_T10)
         timestamp_now = int(datetime.now().timestamp())
         payload["bmg_data_output_name"] = (
             f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{plate_num}_T{reading_in_plate_num}.txt"
         )
-        run_info = experiment_client.start_run(
-            ot2_to_run_bmg_wf.resolve(),
-            payload=payload,
-            blocking=True,
-            simulate=False,
+        run_info = checkpoint.start_run(
+            experiment_client,
+            helper_functions.replace_wf_node_names(incubator_to_run_bmg_wf, payload),
+            payload,
         )
-        # write utc bmg timestamp to csv data file
-        helper_functions.write_timestamps_to_csv(
-            csv_directory_path=csv_data_directory,
-            experiment_id=experiment_id,
-            bmg_filename=payload["bmg_data_output_name"],
-            accurate_timestamp=run_info.steps[4].end_time,  # index 5 = bmg reading
-        )
-        if test_prints:
-            print(f"\twriting data to csv: {payload['bmg_data_output_name']}, with timestamp {run_info.steps[4].end_time}")
-
-        # modify variables
-        reading_in_plate_num += 1
+        if run_info is not None:  # None = run skipped on resume
+            # journal utc bmg timestamp
+            journal.record_bmg_reading(payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+            journal.record(timestamp_journal.INCUBATOR_OUT, f"exp1_{plate_num}", run_index.add(run_info).step(name="transfer to exchange").start_time)  # plate leaves the incubator
+            if test_prints:
+                print(f"\tjournaling {payload['bmg_data_output_name']}, with timestamp {run_index.add(run_info).step(action='run_assay').end_time}")
 
-        # 8. Transfer from bmg to incubator and incubate (1hr)
-        experiment_client.start_run(
-            bmg_to_run_incubator_wf.resolve(),
-            payload=payload,
-            blocking=True,
-            simulate=False,
+        # 3. Transfer old plate into the OT-2
+        checkpoint.start_run(
+            experiment_client,
+            helper_functions.replace_wf_node_names(bmg_to_ot2_wf, payload),
+            payload,
         )
 
-        # capture incubation start time
-        incubation_start_time = time.time()
+        # OUTER LOOP START
+        for i in range(total_outer_loops):
 
-        # modify variables
-        payload["lid_location"] = exp1_variables["old_lid_location"]
-        payload["lid_safe_path"] = exp1_variables["old_safe_lid_location"]
-        payload["ot2_location"] = exp1_variables["old_ot2_plate_location"]
-
-        # 9. Get rid of the old substrate plate
-        experiment_client.start_run(
-            remove_old_substrate_plate_wf.resolve(),
-            payload=payload,
-            blocking=True,
-            simulate=False,
-        )
-
-        # modify variables
-        current_tower_deck += 1
-        if current_tower_deck == 6:  # reset if necessary
-            current_tower_deck = 1
-        payload["current_tower_deck"] = "tower_deck" + str(current_tower_deck)
-        payload["current_tower_deck_safe_path"] = "safe_path_tower_deck" + str(current_tower_deck)
+            # modify variables
+            plate_num += 1
+            reading_in_plate_num = 0
+            payload["lid_location"] = exp1_variables["new_lid_location"]
+            payload["lid_safe_path"] = exp1_variables["new_safe_lid_location"]
+            payload["ot2_location"] = exp1_variables["new_ot2_plate_location"]
+            payload["incubation_seconds"] = incubation_seconds_between_readings
+
+            # 4. Get new substrate plate, take contam reading, then move to OT-2 new location
+            timestamp_now = int(datetime.now().timestamp())
+            payload["bmg_data_output_name"] = (
+                f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{plate_num}_contam.txt"
+            )
+            run_info = checkpoint.start_run(
+                experiment_client,
+                helper_functions.replace_wf_node_names(get_new_plate_and_run_bmg_wf, payload),
+                payload,
+            )
+            if run_info is not None:  # None = run skipped on resume
+                # journal utc bmg timestamp
+                journal.record_bmg_reading(payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+                if test_prints:
+                    print(f"\tjournaling {payload['bmg_data_output_name']}, with timestamp {run_index.add(run_info).step(action='run_assay').end_time}")
 
-        # wait for incubation to finish
-        while (time.time() - incubation_start_time) < payload["incubation_seconds"]:
-            print(f"will continue in... {int(payload["incubation_seconds"]-(time.time() - incubation_start_time))} seconds")
-            time.sleep(5) # 5 seconds
+            # modify variables
+            reading_in_plate_num += 1
 
-        # INNER LOOP START HERE
-        for j in range(total_inner_loops):
+            # 5. Transfer new plate from bmg to new ot2 location
+            checkpoint.start_run(
+                experiment_client,
+                helper_functions.replace_wf_node_names(bmg_to_ot2_wf, payload),
+                payload,
+            )
 
-            # NOTE: lid can be removed to old location this whole time
+            # 6. Run inoculation ot2 protocol
+            ot2_replacement_variables = helper_functions.collect_ot2_replacement_variables(payload)
+            temp_ot2_file_str = helper_functions.generate_ot2_protocol(inoculate_protocol, ot2_replacement_variables)
+            payload["current_ot2_protocol"] = temp_ot2_file_str
+            run_info = checkpoint.start_run(
+                experiment_client,
+                helper_functions.replace_wf_node_names(run_ot2_wf, payload),
+                payload,
+            )
+            if run_info is not None:  # None = run skipped on resume
+                journal.record(timestamp_journal.OT2_START, f"exp1_{plate_num}", run_index.add(run_info).step(action="run_protocol").start_time)
+                journal.record(timestamp_journal.OT2_END, f"exp1_{plate_num}", run_index.add(run_info).step(action="run_protocol").end_time)
 
-            if test_prints:
-                print()
-                print(f"inner loop index = {j}")
+            # modify variables
+            exp1_variables["tip_box_location"] += 1
+            if exp1_variables["tip_box_location"] == 12:  # reset if necessary
+                exp1_variables["tip_box_location"] = 4
+            payload["tip_box_location"] = exp1_variables["tip_box_location"]
 
-            # 10. Incubator to run BMG  (T1 - T10 readings)
-            if test_prints:
-                print(f"running incubator to bmg, taking T{j+1} reading")
+            # 7. Transfer new plate into bmg and take T1 reading
             timestamp_now = int(datetime.now().timestamp())
             payload["bmg_data_output_name"] = (
                 f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{plate_num}_T{reading_in_plate_num}.txt"
             )
-            run_info = experiment_client.start_run(
-                incubator_to_run_bmg_wf.resolve(),
-                payload=payload,
-                blocking=True,
-                simulate=False,
-            )
-            # write utc bmg timestamp to csv data file
-            helper_functions.write_timestamps_to_csv(
-                csv_directory_path=csv_data_directory,
-                experiment_id=experiment_id,
-                bmg_filename=payload["bmg_data_output_name"],
-                accurate_timestamp=run_info.steps[8].end_time,  # index 8 = bmg reading
+            run_info = checkpoint.start_run(
+                experiment_client,
+                helper_functions.replace_wf_node_names(ot2_to_run_bmg_wf, payload),
+                payload,
             )
-            if test_prints:
-                print(f"\twriting data to csv: {payload['bmg_data_output_name']}, with timestamp {run_info.steps[8].end_time}")
+            if run_info is not None:  # None = run skipped on resume
+                # journal utc bmg timestamp
+                journal.record_bmg_reading(payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+                if test_prints:
+                    print(f"\tjournaling {payload['bmg_data_output_name']}, with timestamp {run_index.add(run_info).step(action='run_assay').end_time}")
 
             # modify variables
             reading_in_plate_num += 1
 
-            if j < (total_inner_loops-1):
-                # 11. Transfer from bmg to incubator, and incubate
-                if test_prints:
-                    print("running bmg to incubator")
-                experiment_client.start_run(
-                    bmg_to_run_incubator_wf.resolve(),
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
-                # capture incubation start time
-                incubation_start_time = time.time()
+            # 8. Transfer from bmg to incubator and incubate (1hr)
+            run_info = checkpoint.start_run(
+                experiment_client,
+                helper_functions.replace_wf_node_names(bmg_to_run_incubator_wf, payload),
+                payload,
+                incubation=("plate", payload["incubation_seconds"]),  # capture incubation start time
+            )
+            if run_info is not None:  # None = run skipped on resume
+                journal.record(timestamp_journal.INCUBATOR_IN, f"exp1_{plate_num}", run_index.add(run_info).step(action="incubate").start_time)
 
-                # sleep for incubation
-                if test_prints:
-                    print("running incubaton")
-                while time.time() - incubation_start_time < payload["incubation_seconds"]:
-                    print(f"will continue in... {int(payload["incubation_seconds"]-(time.time() - incubation_start_time))} seconds")
-                    time.sleep(5) # 5 seconds
+            # modify variables
+            payload["lid_location"] = exp1_variables["old_lid_location"]
+            payload["lid_safe_path"] = exp1_variables["old_safe_lid_location"]
+            payload["ot2_location"] = exp1_variables["old_ot2_plate_location"]
+
+            # 9. Get rid of the old substrate plate
+            checkpoint.start_run(
+                experiment_client,
+                helper_functions.replace_wf_node_names(remove_old_substrate_plate_wf, payload),
+                payload,
+            )
 
+            # modify variables
+            current_tower_deck += 1
+            if current_tower_deck == 6:  # reset if necessary
+                current_tower_deck = 1
+            payload["current_tower_deck"] = "tower_deck" + str(current_tower_deck)
+            payload["current_tower_deck_safe_path"] = "safe_path_tower_deck" + str(current_tower_deck)
 
-            else:  # plate will end in the bmg with bmg open
-                # 12. transfer from bmg to ot2 old location
-                if test_prints:
-                    print("running bmg to ot2")
-                experiment_client.start_run(
-                    bmg_to_ot2_wf.resolve(),
-                    payload=payload,
-                    blocking=True,
-                    simulate=False,
-                )
+            # wait for incubation to finish
+            checkpoint.wait_for("plate")
 
-        # INNER LOOP END HERE
+            # INNER LOOP START HERE
+            for j in range(total_inner_loops):
 
-    # OUTER LOOP ENDS HERE
+                # NOTE: lid can be removed to old location this whole time
 
-    # NOTE: if no more outer loops, plate ends at old ot-2 location with lid on lidnest 2
-    # can't return plate to tower since we didn't grab a new substrate plate
+                if test_prints:
+                    print()
+                    print(f"inner loop index = {j}")
 
-    # 13. Move from old ot-2 location to exchange, replace lid.
-    if test_prints:
-        print("END OF EXPEREMENT APP: returning old plate from ot2 to exchange")
-    experiment_client.start_run(
-        at_end_ot2_to_exchange_wf.resolve(),
-        payload=payload,
-        blocking=True,
-        simulate=False,
-    )
+                # 10. Incubator to run BMG  (T1 - T10 readings)
+                if test_prints:
+                    print(f"running incubator to bmg, taking T{j+1} reading")
+                timestamp_now = int(datetime.now().timestamp())
+                payload["bmg_data_output_name"] = (
+                    f"{experiment_label}_{timestamp_now}_{experiment_id}_exp1_{plate_num}_T{reading_in_plate_num}.txt"
+                )
+                run_info = checkpoint.start_run(
+                    experiment_client,
+                    helper_functions.replace_wf_node_names(incubator_to_run_bmg_wf, payload),
+                    payload,
+                )
+                if run_info is not None:  # None = run skipped on resume
+                    # journal utc bmg timestamp
+                    journal.record_bmg_reading(payload["bmg_data_output_name"], run_index.add(run_info).step(action="run_assay").end_time)
+                    journal.record(timestamp_journal.INCUBATOR_OUT, f"exp1_{plate_num}", run_index.add(run_info).step(name="transfer to exchange").start_time)  # plate leaves the incubator
+                    if test_prints:
+                        print(f"\tjournaling {payload['bmg_data_output_name']}, with timestamp {run_index.add(run_info).step(action='run_assay').end_time}")
+
+                # modify variables
+                reading_in_plate_num += 1
+
+                if j < (total_inner_loops-1):
+                    # 11. Transfer from bmg to incubator, and incubate
+                    if test_prints:
+                        print("running bmg to incubator")
+                    run_info = checkpoint.start_run(
+                        experiment_client,
+                        helper_functions.replace_wf_node_names(bmg_to_run_incubator_wf, payload),
+                        payload,
+                        incubation=("plate", payload["incubation_seconds"]),  # capture incubation start time
+                    )
+                    if run_info is not None:  # None = run skipped on resume
+                        journal.record(timestamp_journal.INCUBATOR_IN, f"exp1_{plate_num}", run_index.add(run_info).step(action="incubate").start_time)
+
+                    # sleep for incubation
+                    if test_prints:
+                        print("running incubaton")
+                    checkpoint.wait_for("plate")
+
+
+                else:  # plate will end in the bmg with bmg open
+                    # 12. transfer from bmg to ot2 old location
+                    if test_prints:
+                        print("running bmg to ot2")
+                    checkpoint.start_run(
+                        experiment_client,
+                        helper_functions.replace_wf_node_names(bmg_to_ot2_wf, payload),
+                        payload,
+                    )
+
+            # INNER LOOP END HERE
+
+        # OUTER LOOP ENDS HERE
+
+        # NOTE: if no more outer loops, plate ends at old ot-2 location with lid on lidnest 2
+        # can't return plate to tower since we didn't grab a new substrate plate
+
+        # 13. Move from old ot-2 location to exchange, replace lid.
+        if test_prints:
+            print("END OF EXPEREMENT APP: returning old plate from ot2 to exchange")
+        checkpoint.start_run(
+            experiment_client,
+            helper_functions.replace_wf_node_names(at_end_ot2_to_exchange_wf, payload),
+            payload,
+        )
+    finally:
+        # flush the journal and export the bmg timestamp csv (also if a run fails)
+        journal.close()
+        profiler.close()
+
+    profiler.print_report()
 
     print("YAY WE MADE IT!")
+    print(f"workflow cache: {helper_functions.workflow_cache_stats}")
 
 
 
@@ -419,4 +429,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Substrate experiment 3 app")
+    parser.add_argument("--resume", action="store_true", help="continue the experiment from its last checkpoint")
+    args = parser.parse_args()
+    main(resume=args.resume)
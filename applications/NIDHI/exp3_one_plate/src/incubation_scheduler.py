@@ -0,0 +1,137 @@
+"""Deadline scheduler for plate incubations
+
+Keeps a heap of plate deadlines so an experiment app sleeps once until the
+next plate is ready (instead of polling one plate's timer every 5 seconds)
+and can dispatch the workflow for whichever plate is due first.
+"""
+
+import heapq
+import itertools
+import time
+
+
+class IncubationScheduler:
+    """Priority queue of plate incubation deadlines
+
+    Each plate (any hashable key, e.g. "exp1") has at most one pending
+    deadline. Rescheduling a plate replaces its old deadline; stale heap
+    entries are skipped lazily when they reach the top.
+    """
+
+    def __init__(self, clock=time.time, sleep=time.sleep, report_interval=600):
+        self.clock = clock
+        self.sleep = sleep
+        self.report_interval = report_interval  # seconds between countdown prints
+
+        self._heap = []  # (deadline, sequence, plate)
+        self._entries = {}  # plate -> (sequence, start_time, deadline, action)
+        self._sequence = itertools.count()
+
+    def schedule(self, plate, seconds, action=None, start_time=None) -> float:
+        """Registers a plate that will be ready `seconds` after `start_time`
+        (default: now). `action(plate)` is called when the plate is dispatched
+        by run_next(). Returns the absolute deadline."""
+        start = self.clock() if start_time is None else start_time
+        deadline = start + seconds
+        sequence = next(self._sequence)
+        self._entries[plate] = (sequence, start, deadline, action)
+        heapq.heappush(self._heap, (deadline, sequence, plate))
+        return deadline
+
+    def cancel(self, plate) -> None:
+        """Forgets a plate's pending deadline (no-op if none)"""
+        self._entries.pop(plate, None)
+
+    def started_at(self, plate) -> float:
+        """Time the plate's current incubation started"""
+        return self._entries[plate][1]
+
+    def deadline(self, plate) -> float:
+        """Absolute time the plate will be ready"""
+        return self._entries[plate][2]
+
+    def time_remaining(self, plate) -> float:
+        """Seconds until the plate is ready (0 if already due)"""
+        return max(0.0, self.deadline(plate) - self.clock())
+
+    def pending(self) -> list:
+        """List of (deadline, plate) for every scheduled plate, earliest first"""
+        return sorted((entry[2], plate) for plate, entry in self._entries.items())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, plate) -> bool:
+        return plate in self._entries
+
+    def peek(self):
+        """Returns (plate, deadline) of the next plate due, or None"""
+        while self._heap:
+            deadline, sequence, plate = self._heap[0]
+            entry = self._entries.get(plate)
+            if entry is not None and entry[0] == sequence:
+                return plate, deadline
+            heapq.heappop(self._heap)  # stale (cancelled or rescheduled)
+        return None
+
+    def wait_until(self, deadline, label="") -> None:
+        """Sleeps until the absolute `deadline`, printing a countdown every
+        `report_interval` seconds rather than every few seconds"""
+        remaining = deadline - self.clock()
+        while remaining > 0:
+            print(
+                f"{label + ': ' if label else ''}will continue in... {int(remaining)} seconds"
+            )
+            self.sleep(min(remaining, self.report_interval))
+            remaining = deadline - self.clock()
+
+    def wait_for(self, plate) -> None:
+        """Sleeps until the given plate is ready and removes it from the
+        schedule. Returns immediately if the plate is not scheduled."""
+        entry = self._entries.get(plate)
+        if entry is None:
+            return
+        self.wait_until(entry[2], label=str(plate))
+        self._entries.pop(plate, None)
+
+    def due(self) -> list:
+        """Plates whose deadline has already passed, earliest first"""
+        now = self.clock()
+        return [plate for deadline, plate in self.pending() if deadline <= now]
+
+    def dispatch(self, plate, action=None) -> None:
+        """Removes a plate from the schedule and calls its action (or
+        `action`, for plates scheduled without one)"""
+        action = self._entries.pop(plate)[3] or action
+        if action is not None:
+            action(plate)  # may reschedule this (or another) plate
+
+    def run_next(self, action=None):
+        """Sleeps until the earliest deadline, then dispatches that plate.
+        Returns the dispatched plate, or None if nothing is scheduled."""
+        next_due = self.peek()
+        if next_due is None:
+            return None
+        plate, deadline = next_due
+        self.wait_until(deadline, label=str(plate))
+        self.dispatch(plate, action)
+        return plate
+
+    def run_due(self, action=None, skip=None) -> list:
+        """Dispatches every plate that is already due without sleeping,
+        earliest first. Plates for which `skip(plate)` is true (e.g. still
+        busy with their last run) stay scheduled and don't hold up the plates
+        due after them. Returns the dispatched plates."""
+        dispatched = []
+        for plate in self.due():
+            if plate not in self._entries or self.deadline(plate) > self.clock():
+                continue  # rescheduled by an earlier plate's action
+            if skip is None or not skip(plate):
+                self.dispatch(plate, action)
+                dispatched.append(plate)
+        return dispatched
+
+    def run(self, action=None) -> None:
+        """Dispatches plates in deadline order until none are scheduled"""
+        while self.run_next(action) is not None:
+            pass
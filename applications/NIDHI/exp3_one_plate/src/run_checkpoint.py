@@ -0,0 +1,168 @@
+"""Checkpoint/resume for long-running experiment apps
+
+The experiment app is a fixed sequence of workflow runs whose loop variables
+(plate number, reading number, tower deck, tip box, payload) only change
+between runs, in the same way every time. RunCheckpoint counts the runs
+started through it and saves the count, the app's state and the pending
+incubations to a json file after every completed run.
+
+On --resume the app starts again from the top with the same experiment id.
+Runs the checkpoint already counted as complete are skipped (start_run
+returns None) while the app replays its variable updates, which rebuilds
+the loop state without touching the instruments. When the replay reaches
+the last completed run, the saved incubation start times are restored so
+the next wait only sleeps for what is left of the incubation. Incubations
+are therefore started through start_run(..., incubation=(plate, seconds)),
+which saves them with the run that starts them.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+class RunCheckpoint:
+    """Counts completed workflow runs and saves a checkpoint after each one
+
+    `state` is a function returning a json-serializable dict of the app's
+    loop variables; it is saved with every checkpoint and compared with the
+    replayed state when a resume catches up. `scheduler` is the app's
+    IncubationScheduler, whose pending incubations are saved and restored.
+    """
+
+    def __init__(
+        self, path, experiment_id=None, state=None, scheduler=None, resume=False
+    ):
+        self.path = Path(path)
+        self.state = state or dict
+        self.scheduler = scheduler
+
+        self.experiment_id = experiment_id
+        self.completed_runs = 0  # runs finished, including those of a resumed session
+        self.resume_from = 0  # runs to skip while replaying
+        self._saved = {}
+        self._completed_state = None  # app state saved with the last completed run
+        if resume:
+            self._saved = self.load(self.path)
+            self.experiment_id = self._saved["experiment_id"]
+            self.resume_from = self._saved["completed_runs"]
+            self._completed_state = self._saved.get("state")
+            print(
+                f"Resuming experiment {self.experiment_id} after {self.resume_from} completed runs"
+            )
+            if self._saved.get("running"):
+                print(
+                    f"WARNING: run {self._saved['running']} was interrupted and will be started again,"
+                )
+                print("\tcheck the plate and lid positions before it starts")
+
+    @property
+    def replaying(self) -> bool:
+        """True while skipping runs completed before the resume"""
+        return self.completed_runs < self.resume_from
+
+    def start_run(
+        self,
+        experiment_client,
+        workflow,
+        payload,
+        name=None,
+        simulate=False,
+        incubation=None,
+    ):
+        """Runs a workflow (blocking) and checkpoints once it completes.
+        `incubation` = (plate, seconds) of a run that leaves a plate
+        incubating is scheduled as soon as the run completes, before the
+        checkpoint is saved. While replaying, the run is skipped (and its
+        incubation restored from the checkpoint) and None is returned."""
+        name = name or getattr(workflow, "name", str(workflow))
+        if self.replaying:
+            self.completed_runs += 1
+            if not self.replaying:
+                self._caught_up()
+            return None
+
+        # the app may already have moved its variables on for this run, but a
+        # resume replays up to the last completed run, so save that run's state
+        self.save(state=self._completed_state, running=name)
+        run_info = experiment_client.start_run(
+            workflow,
+            payload=payload,
+            blocking=True,
+            simulate=simulate,
+        )
+        if incubation is not None:
+            self.scheduler.schedule(*incubation)
+        self.completed_runs += 1
+        self._completed_state = self._snapshot()
+        self.save(state=self._completed_state, last_run=name)
+        return run_info
+
+    def wait_for(self, plate) -> None:
+        """Waits for a plate's incubation, unless it finished before the resume"""
+        if self.replaying:
+            self.scheduler.cancel(plate)
+        else:
+            self.scheduler.wait_for(plate)
+
+    def save(self, state=None, **extra) -> None:
+        """Writes the checkpoint file (atomically, so a crash mid-write
+        leaves the previous checkpoint in place). `state` defaults to the
+        app's current state."""
+        checkpoint = {
+            "experiment_id": self.experiment_id,
+            "completed_runs": self.completed_runs,
+            "saved_at": datetime.now().isoformat(),
+            "state": self.state() if state is None else state,
+            "incubations": self._incubations(),
+            **extra,
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(temp_path, "w") as f:
+                json.dump(checkpoint, f, indent=2, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # DO NOT fail the experiment if the checkpoint cannot be written!
+            print(f"Could not write checkpoint {self.path}")
+            print(e)
+
+    @staticmethod
+    def load(path) -> dict:
+        with open(path) as f:
+            return json.load(f)
+
+    def _snapshot(self) -> dict:
+        """Copy of the app's state as it is saved (the app keeps editing its own dicts)"""
+        return json.loads(json.dumps(self.state(), default=str))
+
+    def _incubations(self) -> list:
+        if self.scheduler is None:
+            return []
+        return [
+            [plate, self.scheduler.started_at(plate), deadline]
+            for deadline, plate in self.scheduler.pending()
+        ]
+
+    def _caught_up(self) -> None:
+        """Restores the saved incubations and checks the replayed state"""
+        if self.scheduler is not None:
+            for plate, started_at, deadline in self._saved.get("incubations", []):
+                self.scheduler.schedule(
+                    plate, deadline - started_at, start_time=started_at
+                )
+
+        replayed = self._snapshot()
+        saved = self._saved.get("state", {})
+        for key in sorted(set(saved) | set(replayed)):
+            if saved.get(key) != replayed.get(key):
+                print(
+                    f"WARNING: replayed {key} = {replayed.get(key)} but checkpoint has {saved.get(key)}"
+                )
+        print(
+            f"Caught up with checkpoint after {self.completed_runs} runs, continuing experiment"
+        )
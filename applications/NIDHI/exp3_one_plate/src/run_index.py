@@ -0,0 +1,184 @@
+"""Name-indexed access to workflow run results
+
+Looks steps up by step name, module and/or action instead of by their
+position in the workflow, e.g.
+
+    run = run_index.add(run_info)
+    bmg_timestamp = run.step(action="run_assay").end_time
+
+keeps working when a step is added to the workflow yaml. Every step is
+indexed under all combinations of (name, module, action), so any lookup
+is a single dict access, both for one run and across every run of the
+experiment:
+
+    run_index.end_times(module="bio_bmg", action="run_assay")
+"""
+
+import itertools
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+FIELDS = ("name", "module", "action")
+
+
+@dataclass(frozen=True)
+class StepRecord:
+    """Timing of one step of a finished run"""
+
+    run_id: str
+    workflow: str
+    name: str
+    module: str
+    action: str
+    start_time: datetime
+    end_time: datetime
+
+    @property
+    def duration(self) -> float:
+        """Step duration in seconds"""
+        return (self.end_time - self.start_time).total_seconds()
+
+
+def _get(record, key):
+    return record.get(key) if isinstance(record, dict) else getattr(record, key, None)
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _keys(record):
+    """Every (name, module, action) key a record matches, None = any"""
+    values = [getattr(record, field) for field in FIELDS]
+    for mask in itertools.product((True, False), repeat=len(FIELDS)):
+        yield tuple(value if keep else None for value, keep in zip(values, mask))
+
+
+def _query(name, module, action):
+    key = (name, module, action)
+    if key == (None, None, None):
+        raise ValueError("give at least one of name, module or action")
+    return key
+
+
+class RunResult:
+    """Steps of one run, indexed by (name, module, action)"""
+
+    def __init__(self, run_id, workflow, records):
+        self.run_id = run_id
+        self.workflow = workflow
+        self.records = records
+        self._index = defaultdict(list)
+        for record in records:
+            for key in _keys(record):
+                self._index[key].append(record)
+
+    def steps(self, name=None, module=None, action=None) -> list:
+        """All steps of the run matching the given fields, in run order"""
+        return self._index.get(_query(name, module, action), [])
+
+    def step(self, name=None, module=None, action=None) -> StepRecord:
+        """The first step of the run matching the given fields"""
+        matches = self.steps(name, module, action)
+        if not matches:
+            raise LookupError(
+                f"{self.workflow} run {self.run_id} has no step {name=} {module=} {action=}"
+            )
+        return matches[0]
+
+
+class RunIndex:
+    """Step records of every run of an experiment"""
+
+    def __init__(self):
+        self.runs = {}  # run_id -> RunResult
+        self._index = defaultdict(list)  # (name, module, action) -> [StepRecord]
+
+    def __contains__(self, run_id) -> bool:
+        return run_id in self.runs
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def add(self, run_info) -> RunResult:
+        """Indexes a finished run (WorkflowRun or its dict) and returns its
+        RunResult. Adding the same run again returns the existing result."""
+        run_id = _get(run_info, "run_id")
+        if run_id is None:
+            run_id = f"run_{len(self.runs) + 1}"
+        if run_id in self.runs:
+            return self.runs[run_id]
+
+        workflow = _get(run_info, "name")
+        records = []
+        for step in _get(run_info, "steps") or []:
+            start, end = (
+                _timestamp(_get(step, "start_time")),
+                _timestamp(_get(step, "end_time")),
+            )
+            if start is None or end is None:
+                continue  # step never ran
+            records.append(
+                StepRecord(
+                    run_id=run_id,
+                    workflow=workflow,
+                    name=_get(step, "name"),
+                    module=_get(step, "module"),
+                    action=_get(step, "action"),
+                    start_time=start,
+                    end_time=end,
+                )
+            )
+        return self._add_result(RunResult(run_id, workflow, records))
+
+    def _add_result(self, result) -> RunResult:
+        self.runs[result.run_id] = result
+        for record in result.records:
+            for key in _keys(record):
+                self._index[key].append(record)
+        return result
+
+    def steps(self, name=None, module=None, action=None) -> list:
+        """Matching steps of every run, in the order the runs were added"""
+        return self._index.get(_query(name, module, action), [])
+
+    def end_times(self, name=None, module=None, action=None) -> list:
+        return [record.end_time for record in self.steps(name, module, action)]
+
+    def start_times(self, name=None, module=None, action=None) -> list:
+        return [record.start_time for record in self.steps(name, module, action)]
+
+    def records(self):
+        """Every step record, run by run"""
+        for result in self.runs.values():
+            yield from result.records
+
+    @classmethod
+    def load_jsonl(cls, *paths) -> "RunIndex":
+        """Builds an index from step profile jsonl files (see step_profiler)"""
+        runs = defaultdict(list)  # run_id -> [StepRecord]
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    step = json.loads(line)
+                    runs[step["run_id"]].append(
+                        StepRecord(
+                            run_id=step["run_id"],
+                            workflow=step.get("workflow"),
+                            name=step.get("step"),
+                            module=step.get("module"),
+                            action=step.get("action"),
+                            start_time=_timestamp(step["start_time"]),
+                            end_time=_timestamp(step["end_time"]),
+                        )
+                    )
+        index = cls()
+        for run_id, records in runs.items():
+            index._add_result(RunResult(run_id, records[0].workflow, records))
+        return index
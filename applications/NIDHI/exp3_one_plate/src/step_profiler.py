@@ -0,0 +1,207 @@
+"""Per-module step latency profiler
+
+Records the module, action, start and end of every step of every workflow
+run and keeps a streaming histogram of the durations per `module.action`
+(e.g. `biopf400.transfer`, `bio_bmg.run_assay`) and per workflow. Wrapping
+the experiment client is enough to profile an app:
+
+    profiler = StepProfiler(data_directory / f"{experiment_id}_steps.jsonl")
+    experiment_client = profiler.wrap(experiment_client)
+    ...
+    profiler.print_report()
+
+Every step is also appended to the jsonl file, which workcell_simulator.py
+reads as step duration history.
+"""
+
+import json
+import math
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from wei.types.workflow_types import WorkflowStatus
+
+from run_index import RunIndex
+
+
+class StreamingHistogram:
+    """Fixed-memory duration histogram with logarithmic buckets
+
+    Buckets grow by `growth` (default 2**0.25, about 19%), so quantiles are
+    accurate to within half a bucket no matter how many values are added.
+    """
+
+    def __init__(self, growth=2**0.25):
+        self.log_growth = math.log(growth)
+        self.buckets = defaultdict(int)  # bucket index -> count
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value) -> None:
+        value = max(0.0, float(value))
+        bucket = math.floor(math.log(value) / self.log_growth) if value > 0 else None
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q) -> float:
+        """Estimated value below which a fraction `q` of the values fall"""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(
+            self.buckets, key=lambda index: -math.inf if index is None else index
+        ):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                if bucket is None:
+                    return 0.0
+                middle = math.exp((bucket + 0.5) * self.log_growth)
+                return min(max(middle, self.minimum), self.maximum)
+        return self.maximum
+
+
+def _get(record, key):
+    return record.get(key) if isinstance(record, dict) else getattr(record, key, None)
+
+
+class StepProfiler:
+    """Collects step and workflow durations from finished runs"""
+
+    def __init__(self, output_path=None, index=None):
+        self.output_path = Path(output_path) if output_path else None
+        self.index = RunIndex() if index is None else index  # every recorded run
+        self.steps = defaultdict(StreamingHistogram)  # "module.action" -> durations
+        self.workflows = defaultdict(StreamingHistogram)  # workflow name -> durations
+        self._file = None
+        if self.output_path is not None:
+            try:
+                self.output_path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.output_path, "a")
+            except OSError as e:
+                # DO NOT fail the experiment if the profile cannot be written!
+                print(f"Could not open step profile {self.output_path}")
+                print(e)
+
+    def record_run(self, run_info) -> None:
+        """Adds the steps of a finished run (WorkflowRun or its dict)"""
+        if _get(run_info, "run_id") in self.index:
+            return
+        self.add_result(self.index.add(run_info))
+
+    def add_result(self, result, write=True) -> None:
+        """Adds the steps of an indexed RunResult to the histograms"""
+        for record in result.records:
+            self.steps[f"{record.module}.{record.action}"].add(record.duration)
+        if result.records:
+            run_start = min(record.start_time for record in result.records)
+            run_end = max(record.end_time for record in result.records)
+            self.workflows[result.workflow].add((run_end - run_start).total_seconds())
+
+        if write and self._file is not None and result.records:
+            lines = [
+                json.dumps(
+                    {
+                        "run_id": record.run_id,
+                        "workflow": record.workflow,
+                        "step": record.name,
+                        "module": record.module,
+                        "action": record.action,
+                        "start_time": record.start_time.isoformat(),
+                        "end_time": record.end_time.isoformat(),
+                        "duration": record.duration,
+                    }
+                )
+                for record in result.records
+            ]
+            try:
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+            except OSError as e:
+                print("Could not write step profile")
+                print(e)
+
+    def wrap(self, experiment_client):
+        """Returns the experiment client with every finished run recorded"""
+        return ProfiledExperimentClient(experiment_client, self)
+
+    def report(self) -> str:
+        """Step and workflow duration table, biggest total time first"""
+        rows = []
+        for title, histograms in (
+            ("step (module.action)", self.steps),
+            ("workflow", self.workflows),
+        ):
+            rows.append(
+                f"{title:<56}{'count':>7}{'mean s':>9}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'total h':>9}"
+            )
+            for key, histogram in sorted(
+                histograms.items(), key=lambda item: -item[1].total
+            ):
+                rows.append(
+                    f"{str(key)[:55]:<56}{histogram.count:>7}{histogram.mean:>9.1f}"
+                    f"{histogram.quantile(0.5):>9.1f}{histogram.quantile(0.95):>9.1f}"
+                    f"{histogram.maximum:>9.1f}{histogram.total / 3600:>9.2f}"
+                )
+            rows.append("")
+
+        module_totals = defaultdict(float)
+        for key, histogram in self.steps.items():
+            module_totals[key.rsplit(".", 1)[0]] += histogram.total
+        if module_totals:
+            bottleneck = max(module_totals, key=module_totals.get)
+            rows.append(
+                f"busiest module: {bottleneck} ({module_totals[bottleneck] / 3600:.2f} h of steps)"
+            )
+        return "\n".join(rows)
+
+    def print_report(self) -> None:
+        print("\nSTEP PROFILE")
+        print(self.report())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ProfiledExperimentClient:
+    """Experiment client proxy that hands every finished run to a profiler"""
+
+    def __init__(self, experiment_client, profiler):
+        self._client = experiment_client
+        self._profiler = profiler
+
+    def start_run(self, *args, **kwargs):
+        run_info = self._client.start_run(*args, **kwargs)
+        if _get(run_info, "status") == WorkflowStatus.COMPLETED:
+            self._profiler.record_run(run_info)
+        return run_info
+
+    def query_run(self, run_id):
+        run_info = self._client.query_run(run_id)
+        if _get(run_info, "status") == WorkflowStatus.COMPLETED:
+            self._profiler.record_run(run_info)
+        return run_info
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+if __name__ == "__main__":
+    # usage: python step_profiler.py <steps.jsonl> [...]
+    # rebuilds the report from the step profiles of earlier experiments
+    profiler = StepProfiler(index=RunIndex.load_jsonl(*sys.argv[1:]))
+    for result in profiler.index.runs.values():
+        profiler.add_result(result, write=False)
+    print(profiler.report())
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+from incubation_scheduler import IncubationScheduler
+from run_checkpoint import RunCheckpoint
+
+INCUBATION_SECONDS = 3600
+
+
+class FakeClock:
+    """Time that only moves when slept; sleeping past `stop_at` is a Ctrl+C"""
+
+    def __init__(self, now=0.0, stop_at=None):
+        self.now = now
+        self.stop_at = stop_at
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.stop_at is not None and self.now >= self.stop_at:
+            raise KeyboardInterrupt
+
+
+class FakeClient:
+    """Records (workflow, start time) of each run, crashing at run `crash_at`"""
+
+    def __init__(self, clock, crash_at=None):
+        self.clock = clock
+        self.crash_at = crash_at
+        self.runs = []
+
+    def start_run(self, workflow, payload, blocking, simulate):
+        if len(self.runs) == self.crash_at:
+            raise ConnectionError("workcell went away")
+        self.runs.append((workflow, self.clock()))
+        return {"workflow": workflow, "payload": payload}
+
+
+def experiment(checkpoint, client, readings=5, plate_num=1):
+    """A plate read after every incubation, like the experiment app's loop"""
+    state = {"plate_num": plate_num, "reading": 0}
+    checkpoint.state = lambda: dict(state)
+    for reading in range(readings):
+        state["reading"] = reading
+        checkpoint.start_run(
+            client,
+            f"read_{reading}",
+            {"reading": reading},
+            incubation=("plate", INCUBATION_SECONDS),
+        )
+        checkpoint.wait_for("plate")
+
+
+def session(path, clock, resume=False):
+    scheduler = IncubationScheduler(clock=clock, sleep=clock.sleep)
+    return RunCheckpoint(
+        path, experiment_id="experiment", scheduler=scheduler, resume=resume
+    )
+
+
+def test_resume_skips_completed_runs_and_repeats_the_interrupted_one(tmp_path, capsys):
+    path = tmp_path / "checkpoint.json"
+    clock = FakeClock()
+    client = FakeClient(clock, crash_at=3)
+    with pytest.raises(ConnectionError):
+        experiment(session(path, clock), client)
+
+    saved = RunCheckpoint.load(path)
+    assert saved["completed_runs"] == 3
+    assert saved["running"] == "read_3"
+    assert saved["state"] == {"plate_num": 1, "reading": 2}
+
+    capsys.readouterr()
+    resumed_client = FakeClient(clock)
+    experiment(session(path, clock, resume=True), resumed_client)
+
+    assert [workflow for workflow, _ in resumed_client.runs] == ["read_3", "read_4"]
+    out = capsys.readouterr().out
+    assert "run read_3 was interrupted" in out
+    assert "WARNING: replayed" not in out
+    assert RunCheckpoint.load(path)["completed_runs"] == 5
+
+
+def test_resume_only_waits_for_the_rest_of_the_incubation(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    # read_2 starts at 2 h, stopped 20 minutes into its incubation
+    clock = FakeClock(stop_at=2 * INCUBATION_SECONDS + 1200)
+    with pytest.raises(KeyboardInterrupt):
+        experiment(session(path, clock), FakeClient(clock))
+    assert RunCheckpoint.load(path)["incubations"] == [
+        ["plate", 2 * INCUBATION_SECONDS, 3 * INCUBATION_SECONDS]
+    ]
+
+    # restarted 10 minutes later
+    resumed_clock = FakeClock(now=clock.now + 600)
+    resumed_client = FakeClient(resumed_clock)
+    experiment(session(path, resumed_clock, resume=True), resumed_client)
+
+    assert resumed_client.runs[0] == ("read_3", 3 * INCUBATION_SECONDS)
+
+
+def test_resume_warns_when_the_replayed_state_differs(tmp_path, capsys):
+    path = tmp_path / "checkpoint.json"
+    clock = FakeClock()
+    with pytest.raises(ConnectionError):
+        experiment(session(path, clock), FakeClient(clock, crash_at=2))
+
+    capsys.readouterr()
+    experiment(session(path, clock, resume=True), FakeClient(clock), plate_num=2)
+
+    out = capsys.readouterr().out
+    assert "WARNING: replayed plate_num = 2 but checkpoint has 1" in out
+    assert out.count("WARNING: replayed") == 1
+
+
+def test_an_unwritable_checkpoint_does_not_stop_the_experiment(tmp_path, capsys):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    clock = FakeClock()
+    client = FakeClient(clock)
+
+    experiment(session(blocker / "checkpoint.json", clock), client, readings=2)
+
+    assert len(client.runs) == 2
+    assert "Could not write checkpoint" in capsys.readouterr().out
+
+
+def test_checkpoint_is_json(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    clock = FakeClock()
+    experiment(session(path, clock), FakeClient(clock), readings=1)
+
+    with open(path) as f:
+        saved = json.load(f)
+    assert saved["experiment_id"] == "experiment"
+    assert saved["last_run"] == "read_0"
+    assert "running" not in saved
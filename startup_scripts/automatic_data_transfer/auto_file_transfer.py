@@ -2,41 +2,561 @@ import os
 import shutil
 import time
 import argparse
+import hashlib
+import io
+import json
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import re
+import sqlite3
+import string
 import sys
+import threading
+from datetime import datetime, timezone
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 # written by claude.ai
 
+MANIFEST_NAME = ".transfer_manifest.sqlite"
+BATCH_MAX_FILE_SIZE = 16 * 2**20  # bigger files are always copied on their own
+
+# Routing rules: the first pattern matching a file name decides the
+# sub-folder of the destination it goes to, filled in from the pattern's
+# named groups. Files matching no pattern go to the destination folder.
+DEFAULT_ROUTES = [
+    {
+        # exp2/exp3 apps: {label}_{timestamp}_{experiment_id}_exp{n}_{plate}_{reading}.txt
+        "pattern": r"^(?P<label>[^_]+)_(?P<timestamp>\d+)_(?P<experiment_id>.+)_exp(?P<exp>\d+)_(?P<plate>\d+)_(?P<reading>[^_]+)\.txt$",
+        "destination": "{experiment_id}/exp{exp}/plate_{plate}",
+    },
+    {
+        # exp1: {experiment}_{plate}_{inoculation}_{reading}.txt
+        "pattern": r"^(?P<experiment>[^_]+)_(?P<plate>\d+)_(?P<inoculation>\d+)_(?P<reading>[^_]+)\.txt$",
+        "destination": "{experiment}/plate_{plate}",
+    },
+]
+
+class Router:
+    """Sub-folder of the destination for each file name, from routing rules"""
+    
+    def __init__(self, routes):
+        self.routes = []
+        for route in routes:
+            pattern = re.compile(route["pattern"])
+            fields = {field for _, field, _, _ in string.Formatter().parse(route["destination"]) if field}
+            unknown = fields - set(pattern.groupindex)
+            if unknown:
+                raise ValueError(f"route {route['pattern']!r} has no groups {sorted(unknown)} used in {route['destination']!r}")
+            self.routes.append((pattern, route["destination"]))
+    
+    @classmethod
+    def load(cls, path):
+        """Rules from a json file ({"routes": [{"pattern": ..., "destination": ...}]}),
+        or DEFAULT_ROUTES if path is "default"
+        """
+        if path == "default":
+            return cls(DEFAULT_ROUTES)
+        with open(path) as f:
+            return cls(json.load(f)["routes"])
+    
+    def route(self, filename):
+        """Relative sub-folder (with / separators) for a file name, "" if no rule matches"""
+        for pattern, destination in self.routes:
+            match = pattern.match(filename)
+            if match is not None:
+                folder = os.path.normpath(destination.format(**match.groupdict()))
+                if os.path.isabs(folder) or folder.split(os.sep)[0] == "..":
+                    print(f"Error: route of {filename} leaves the destination folder, not routing it")
+                    return ""
+                return "" if folder == "." else folder.replace(os.sep, "/")
+        return ""
+
+class TransferManifest:
+    """SQLite record of every transferred file, keyed by its path relative
+    to the source folder, with the size, mtime and sha256 it was copied with"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS transfers ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, "
+            "destination TEXT, transferred_at TEXT, member TEXT)"
+        )
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(transfers)")]
+        if "member" not in columns:
+            # manifests from before batch mode
+            self.db.execute("ALTER TABLE transfers ADD COLUMN member TEXT")
+        self.db.commit()
+    
+    def get(self, relative_path):
+        """(size, mtime_ns, sha256, destination, member) of a transferred
+        file, or None. member is the file's name inside a batch archive."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT size, mtime_ns, sha256, destination, member FROM transfers WHERE path = ?", (relative_path,)
+            ).fetchone()
+    
+    def record(self, relative_path, size, mtime_ns, sha256, destination, member=None):
+        self.record_many([(relative_path, size, mtime_ns, sha256, destination, member)])
+    
+    def record_many(self, transfers):
+        """Records (relative_path, size, mtime_ns, sha256, destination, member) rows in one commit"""
+        transferred_at = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO transfers "
+                "(path, size, mtime_ns, sha256, destination, transferred_at, member) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, sha256, destination, transferred_at, member) for path, size, mtime_ns, sha256, destination, member in transfers],
+            )
+            self.db.commit()
+    
+    def index(self):
+        """{path: (size, mtime_ns, destination)} of every transferred file"""
+        with self.lock:
+            return {
+                path: (size, mtime_ns, destination)
+                for path, size, mtime_ns, destination in self.db.execute(
+                    "SELECT path, size, mtime_ns, destination FROM transfers"
+                )
+            }
+    
+    def rows(self):
+        with self.lock:
+            return self.db.execute("SELECT path, size, sha256, destination, member FROM transfers ORDER BY path").fetchall()
+    
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def scan_folder(folder, workers=8, chunk_size=2000):
+    """{filename: (size, mtime_ns)} of the files in a folder (not
+    recursive). Large folders are stat-ed by a pool of threads."""
+    with os.scandir(folder) as entries:
+        entries = list(entries)
+    
+    def stat_entries(chunk):
+        files = {}
+        for entry in chunk:
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                pass
+        return files
+    
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    if len(chunks) <= 1 or workers <= 1:
+        return stat_entries(entries)
+    files = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk_files in pool.map(stat_entries, chunks):
+            files.update(chunk_files)
+    return files
+
+def copy_with_sha256(source_file, destination_file):
+    """Copies a file (contents and times) and returns the sha256 of the
+    bytes copied, reading the source only once"""
+    digest = hashlib.sha256()
+    with open(source_file, "rb") as source, open(destination_file, "wb") as destination:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+            destination.write(block)
+        destination.flush()
+        os.fsync(destination.fileno())
+    shutil.copystat(source_file, destination_file)
+    return digest.hexdigest()
+
+def verify(manifest):
+    """Re-hashes every transferred file at its destination, returns the
+    number of missing or different files"""
+    problems = 0
+    rows = manifest.rows()
+    archived = {}  # archive -> {member: (relative_path, size, sha256)}
+    for relative_path, size, sha256, destination, member in rows:
+        if member is not None:
+            archived.setdefault(destination, {})[member] = (relative_path, size, sha256)
+        elif not os.path.exists(destination):
+            print(f"MISSING: {relative_path} -> {destination}")
+            problems += 1
+        elif os.path.getsize(destination) != size or file_sha256(destination) != sha256:
+            print(f"DIFFERENT: {relative_path} -> {destination}")
+            problems += 1
+    
+    # each archive is read once
+    for archive, members in archived.items():
+        found = set()
+        try:
+            with tarfile.open(archive, "r:gz") as tar:
+                for info in tar:
+                    if info.name in members and info.name not in found:
+                        relative_path, size, sha256 = members[info.name]
+                        data = tar.extractfile(info).read()
+                        found.add(info.name)
+                        if len(data) != size or hashlib.sha256(data).hexdigest() != sha256:
+                            print(f"DIFFERENT: {relative_path} -> {archive}:{info.name}")
+                            problems += 1
+        except (OSError, tarfile.TarError) as e:
+            print(f"Error reading {archive}: {e}")
+        for member in members.keys() - found:
+            print(f"MISSING: {members[member][0]} -> {archive}:{member}")
+            problems += 1
+    print(f"Verified {len(rows)} transferred files, {problems} problems")
+    return problems
+
+class BatchWriter:
+    """Collects complete small files and writes them together as one
+    .tar.gz (plus a .json index of its members) to the destination folder
+    once `window` seconds have passed since the first one or `max_files`
+    are waiting. One archive write is much cheaper than many small copies
+    on a network share. Use unpack_batches.py to get the files back: the
+    data processing scripts (and their --watch mode) do not read archives."""
+    
+    def __init__(self, monitor, window, max_files=500):
+        self.monitor = monitor
+        self.window = window
+        self.max_files = max_files
+        self.pending = {}  # relative path -> (source file, stat)
+        self.first_added = None
+        self.stopping = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="batch-writer", daemon=True)
+        self.thread.start()
+    
+    def add(self, source_file, relative_path, stat):
+        with self.condition:
+            if not self.pending:
+                self.first_added = time.monotonic()
+            self.pending[relative_path] = (source_file, stat)
+            self.condition.notify()
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.stopping and not self.batch_ready():
+                    timeout = None if not self.pending else self.first_added + self.window - time.monotonic()
+                    self.condition.wait(timeout)
+                names = list(self.pending)[:self.max_files]
+                batch = {name: self.pending.pop(name) for name in names}
+                if self.pending:
+                    self.first_added = time.monotonic()  # window of the files left over
+                stopping = self.stopping and not self.pending
+            if batch:
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    print(f"Error writing batch of {len(batch)} files: {str(e)}")
+                    for source_file, _ in batch.values():
+                        self.monitor.enqueue(source_file)
+            if stopping:
+                return
+    
+    def batch_ready(self):
+        return bool(self.pending) and (
+            len(self.pending) >= self.max_files or time.monotonic() - self.first_added >= self.window
+        )
+    
+    def write_batch(self, batch):
+        destination_folder = self.monitor.destination_folder
+        archive_name = f"batch_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S_%f')}.tar.gz"
+        archive_file = os.path.join(destination_folder, archive_name)
+        temp_file = os.path.join(destination_folder, f".{archive_name}.part")
+        
+        members = []
+        with open(temp_file, "wb") as f:
+            with tarfile.open(fileobj=f, mode="w:gz", compresslevel=6) as tar:
+                for relative_path, (source_file, stat) in sorted(batch.items()):
+                    try:
+                        with open(source_file, "rb") as source:
+                            data = source.read()
+                        after = os.stat(source_file)
+                    except FileNotFoundError:
+                        print(f"Skipped: {relative_path} was removed before it could be copied")
+                        continue
+                    if (after.st_size, after.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns) or len(data) != stat.st_size:
+                        # changed since it looked complete, wait for it again
+                        self.monitor.enqueue(source_file)
+                        continue
+                    info = tarfile.TarInfo(self.monitor.routed_name(os.path.basename(source_file)))
+                    info.size = len(data)
+                    info.mtime = stat.st_mtime
+                    tar.addfile(info, io.BytesIO(data))
+                    members.append({
+                        "name": info.name,
+                        "path": relative_path,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "sha256": hashlib.sha256(data).hexdigest(),
+                    })
+            f.flush()
+            os.fsync(f.fileno())
+        if not members:
+            os.remove(temp_file)
+            return
+        
+        # archive first, then its index, then the manifest
+        os.replace(temp_file, archive_file)
+        index_file = os.path.join(destination_folder, f"{archive_name}.json")
+        with open(f"{index_file}.part", "w") as f:
+            json.dump({"archive": archive_name, "members": members}, f, indent=1)
+        os.replace(f"{index_file}.part", index_file)
+        self.monitor.manifest.record_many([
+            (member["path"], member["size"], member["mtime_ns"], member["sha256"], os.path.abspath(archive_file), member["name"])
+            for member in members
+        ])
+        with self.monitor.lock:
+            self.monitor.copied += len(members)
+        print(f"Batched: {len(members)} files -> {archive_file}")
+    
+    def stop(self):
+        """Writes what is waiting and stops"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+
 class FolderMonitor(FileSystemEventHandler):
-    def __init__(self, source_folder, destination_folder):
+    def __init__(self, source_folder, destination_folder, workers=4, stable_seconds=1.0, poll_interval=0.25, max_queued=10000, manifest_path=None, batch_seconds=0, batch_max_files=500, router=None):
         self.source_folder = source_folder
         self.destination_folder = destination_folder
+        self.router = router  # None: every file goes to destination_folder
+        self.stable_seconds = stable_seconds  # size and mtime must not change for this long before copying
+        self.poll_interval = poll_interval
         
         # Create destination folder if it doesn't exist
         if not os.path.exists(destination_folder):
             os.makedirs(destination_folder)
             print(f"Created destination folder: {destination_folder}")
+        
+        # record of what was already copied, so duplicate events and restarts don't copy again
+        self.manifest = TransferManifest(manifest_path or os.path.join(destination_folder, MANIFEST_NAME))
+        
+        # on_created only queues the path, the workers wait for the file to be complete and copy it
+        self.copy_queue = queue.Queue(maxsize=max_queued)
+        self.queued = set()  # paths waiting in the queue or being copied
+        self.changed_while_queued = set()  # paths to check again once their copy is done
+        self.lock = threading.Lock()
+        self.copied = 0
+        self.skipped = 0
+        self.workers = [
+            threading.Thread(target=self.copy_worker, name=f"copy-worker-{i + 1}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+        
+        # batch mode: small files are written in archives instead of copied one by one
+        self.batcher = BatchWriter(self, batch_seconds, batch_max_files) if batch_seconds > 0 else None
     
     def on_created(self, event):
         # Ignore directory creation events
         if event.is_directory:
             return
+        self.enqueue(event.src_path)
+    
+    def on_modified(self, event):
+        # files changed after they were created are copied again (if their contents changed)
+        if event.is_directory:
+            return
+        self.enqueue(event.src_path)
+    
+    def on_moved(self, event):
+        # files renamed into the folder (e.g. written under a temporary name first)
+        if event.is_directory:
+            return
+        if os.path.dirname(os.path.abspath(event.dest_path)) == os.path.abspath(self.source_folder):
+            self.enqueue(event.dest_path)
+    
+    def enqueue(self, source_file, block=False):
+        """Queues a file for copying, once (by default never blocks, for the watchdog thread)"""
+        with self.lock:
+            if source_file in self.queued:
+                self.changed_while_queued.add(source_file)
+                return
+            self.queued.add(source_file)
+        try:
+            self.copy_queue.put(source_file, block=block)
+        except queue.Full:
+            with self.lock:
+                self.queued.discard(source_file)
+            print(f"Error: copy queue is full, not copying {os.path.basename(source_file)}")
+    
+    def routed_name(self, filename):
+        """File's path relative to the destination folder, with / separators"""
+        folder = self.router.route(filename) if self.router is not None else ""
+        return f"{folder}/{filename}" if folder else filename
+    
+    def catch_up(self):
+        """Queues the files of the source folder that were created or changed
+        while the monitor was not running: files missing from the manifest
+        (and not already at the destination with the same size and mtime),
+        changed since they were transferred, or deleted at the destination"""
+        start = time.perf_counter()
+        source_files = scan_folder(self.source_folder)
+        transferred = self.manifest.index()
         
-        # Get the file path
-        source_file = event.src_path
-        filename = os.path.basename(source_file)
-        destination_file = os.path.join(self.destination_folder, filename)
+        # one listing per destination folder (routed files are spread over sub-folders)
+        listings = {}
+        def destination_listing(folder):
+            if folder not in listings:
+                listings[folder] = scan_folder(folder) if os.path.isdir(folder) else {}
+            return listings[folder]
         
-        # Wait a moment to ensure file is fully written
-        time.sleep(0.5)
+        missing = []
+        for filename, signature in source_files.items():
+            entry = transferred.get(filename)
+            if entry is not None:
+                size, mtime_ns, destination = entry
+                if (size, mtime_ns) == signature and os.path.basename(destination) in destination_listing(os.path.dirname(destination)):
+                    continue
+            else:
+                destination = os.path.join(self.destination_folder, self.routed_name(filename))
+                if destination_listing(os.path.dirname(destination)).get(filename) == signature:
+                    continue  # copied before there was a manifest
+            missing.append(filename)
         
-        try:
-            # Copy the file
-            shutil.copy2(source_file, destination_file)
+        print(
+            f"Catch-up: {len(source_files)} files in source, {len(missing)} missing or changed "
+            f"(scanned in {time.perf_counter() - start:.2f} s), queueing them"
+        )
+        for filename in missing:
+            self.enqueue(os.path.join(self.source_folder, filename), block=True)
+        return len(missing)
+    
+    def copy_worker(self):
+        while True:
+            source_file = self.copy_queue.get()
+            if source_file is None:
+                self.copy_queue.task_done()
+                return
+            try:
+                self.copy_when_complete(source_file)
+            except Exception as e:
+                print(f"Error copying {os.path.basename(source_file)}: {str(e)}")
+            finally:
+                with self.lock:
+                    self.queued.discard(source_file)
+                    check_again = source_file in self.changed_while_queued
+                    self.changed_while_queued.discard(source_file)
+                if check_again:
+                    self.enqueue(source_file)
+                self.copy_queue.task_done()
+    
+    def wait_until_complete(self, source_file):
+        """Waits until the file's size and mtime have not changed for
+        stable_seconds and no other process holds it open for writing.
+        Returns its final os.stat, or None if the file disappeared."""
+        last_signature = None
+        stable_since = time.monotonic()
+        first = True
+        while True:
+            try:
+                stat = os.stat(source_file)
+            except FileNotFoundError:
+                return None
+            signature = (stat.st_size, stat.st_mtime_ns)
+            now = time.monotonic()
+            if first and time.time() - stat.st_mtime >= self.stable_seconds:
+                # last written long enough ago (e.g. found by catch_up), no need to watch it
+                stable_since = now - self.stable_seconds
+                last_signature = signature
+            first = False
+            if signature != last_signature:
+                last_signature = signature
+                stable_since = now
+            elif now - stable_since >= self.stable_seconds and not is_open_for_writing(source_file):
+                return stat
+            time.sleep(self.poll_interval)
+    
+    def copy_when_complete(self, source_file):
+        filename = os.path.basename(source_file)
+        relative_path = os.path.relpath(source_file, self.source_folder)
+        destination_file = os.path.join(self.destination_folder, *self.routed_name(filename).split("/"))
+        while True:
+            stat = self.wait_until_complete(source_file)
+            if stat is None:
+                print(f"Skipped: {filename} was removed before it could be copied")
+                return
+            
+            # already transferred? same size and mtime, or same contents
+            transferred = self.manifest.get(relative_path)
+            if transferred is not None and os.path.exists(transferred[3]):
+                size, mtime_ns, sha256, transferred_to, member = transferred
+                if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    self.skip(filename)
+                    return
+                if size == stat.st_size and file_sha256(source_file) == sha256:
+                    self.manifest.record(relative_path, stat.st_size, stat.st_mtime_ns, sha256, transferred_to, member)
+                    self.skip(filename)
+                    return
+            
+            if self.batcher is not None and stat.st_size <= BATCH_MAX_FILE_SIZE:
+                self.batcher.add(source_file, relative_path, stat)
+                return
+            
+            # Copy to a temporary name and rename, so the destination never holds a partial file
+            os.makedirs(os.path.dirname(destination_file), exist_ok=True)
+            temp_file = os.path.join(os.path.dirname(destination_file), f".{filename}.part")
+            sha256 = copy_with_sha256(source_file, temp_file)
+            after = os.stat(source_file)
+            if (after.st_size, after.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                # still being written after all, wait again
+                os.remove(temp_file)
+                continue
+            os.replace(temp_file, destination_file)
+            self.manifest.record(relative_path, stat.st_size, stat.st_mtime_ns, sha256, os.path.abspath(destination_file))
+            with self.lock:
+                self.copied += 1
             print(f"Copied: {filename} -> {destination_file}")
-        except Exception as e:
-            print(f"Error copying {filename}: {str(e)}")
+            return
+    
+    def skip(self, filename):
+        with self.lock:
+            self.skipped += 1
+        print(f"Already transferred: {filename}")
+    
+    def stop(self, wait=True):
+        """Stops the workers, after copying everything queued if wait is set"""
+        if wait:
+            self.copy_queue.join()
+        if self.batcher is not None:
+            # from now on files are copied one by one
+            batcher, self.batcher = self.batcher, None
+            batcher.stop()
+            if wait:
+                # files that changed while being batched are queued again
+                self.copy_queue.join()
+        for _ in self.workers:
+            self.copy_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.manifest.close()
+
+def is_open_for_writing(path):
+    """True if another process holds the file open for writing. Windows
+    refuses to open a file for writing while the writer has it open; on
+    other systems this only checks that the file can be opened."""
+    if not os.access(path, os.W_OK):
+        return False  # read-only, nobody is writing it
+    try:
+        with open(path, "r+b"):
+            return False
+    except PermissionError:
+        return os.name == "nt"
+    except OSError:
+        return True
 
 def main():
     # Set up argument parser
@@ -48,12 +568,29 @@ def main():
     
     parser.add_argument('-s', '--source', required=True, help='Source folder to monitor')
     parser.add_argument('-d', '--destination', required=True, help='Destination folder for copied files')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Files copied in parallel')
+    parser.add_argument('--manifest', help=f'Transfer manifest (default: {MANIFEST_NAME} in the destination folder)')
+    parser.add_argument('--verify', action='store_true', help='Check every transferred file against the manifest and exit')
+    parser.add_argument('--batch-seconds', type=float, default=0, help='Write files arriving within this many seconds as one .tar.gz (0 = copy each file). The data processing scripts only read plain files, extract the archives with unpack_batches.py first')
+    parser.add_argument('--batch-max-files', type=int, default=500, help='Most files in one batch archive')
+    parser.add_argument('--routes', help='Sort files into sub-folders by name: "default" (experiment_id/exp/plate) or a routing rules json')
+    parser.add_argument('--stable-seconds', type=float, default=1.0, help='Seconds a file must stay unchanged before it is copied')
     
     args = parser.parse_args()
     
     source_folder = args.source
     destination_folder = args.destination
     
+    if args.verify:
+        manifest_path = args.manifest or os.path.join(destination_folder, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            print(f"Error: no transfer manifest at {manifest_path}")
+            sys.exit(1)
+        manifest = TransferManifest(manifest_path)
+        problems = verify(manifest)
+        manifest.close()
+        sys.exit(1 if problems else 0)
+    
     # Validate source folder exists
     if not os.path.exists(source_folder):
         print(f"Error: Source folder does not exist: {source_folder}")
@@ -63,30 +600,50 @@ def main():
         print(f"Error: Source path is not a directory: {source_folder}")
         sys.exit(1)
     
+    router = None
+    if args.routes:
+        try:
+            router = Router.load(args.routes)
+        except (OSError, ValueError, KeyError, re.error) as e:
+            print(f"Error: bad routing rules {args.routes}: {e}")
+            sys.exit(1)
+    
     print(f"Monitoring folder: {source_folder}")
     print(f"Copying files to: {destination_folder}")
     print("Press Ctrl+C to stop monitoring...\n")
     
     # Create event handler and observer
-    try: 
-        event_handler = FolderMonitor(source_folder, destination_folder)
-        observer = Observer()
+    try:
+        event_handler = FolderMonitor(source_folder, destination_folder, workers=args.workers, stable_seconds=args.stable_seconds, manifest_path=args.manifest, batch_seconds=args.batch_seconds, batch_max_files=args.batch_max_files, router=router)
+    except Exception as e:
+        print(f"Error: could not set up copying to {destination_folder}: {e}")
+        sys.exit(1)
+
+    # Start monitoring, then queue what was written while we were not running
+    # (files showing up in both are only copied once)
+    observer = Observer()
+    try:
         observer.schedule(event_handler, source_folder, recursive=False)
-        
-        # Start monitoring
         observer.start()
-    except Exception as e: 
-        # don't fail
-        print(e)
-    
+    except Exception as e:
+        print(f"Error: could not monitor {source_folder}: {e}")
+        event_handler.stop()
+        sys.exit(1)
+    try:
+        event_handler.catch_up()
+    except Exception as e:
+        # don't fail, new files are still copied
+        print(f"Warning: could not queue existing files: {e}")
+
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
-        print("\nStopped monitoring.")
+        print("\nStopped monitoring, finishing queued copies...")
     
     observer.join()
+    event_handler.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
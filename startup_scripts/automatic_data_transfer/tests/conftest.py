@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the transfer scripts are run as scripts, not installed
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from auto_file_transfer import Router
+
+
+@pytest.mark.parametrize(
+    "filename, folder",
+    [
+        ("Substrate_1712345678_01HXYZ_exp2_1_T4.txt", "01HXYZ/exp2/plate_1"),
+        ("Substrate_1712345678_01HX_YZ_exp3_12_contam.txt", "01HX_YZ/exp3/plate_12"),
+        ("SUB4_2_3_12.txt", "SUB4/plate_2"),
+        ("notes.txt", ""),
+        ("SUB4_2_3_12.csv", ""),
+    ],
+)
+def test_default_routes(filename, folder):
+    assert Router.load("default").route(filename) == folder
+
+
+def test_routes_from_a_json_file(tmp_path):
+    rules = tmp_path / "routes.json"
+    rules.write_text(
+        json.dumps(
+            {
+                "routes": [
+                    {"pattern": r"^(?P<kind>[a-z]+)_.*\.csv$", "destination": "{kind}"},
+                    {"pattern": r"^.*\.csv$", "destination": "other/csv"},
+                ]
+            }
+        )
+    )
+    router = Router.load(str(rules))
+
+    assert router.route("growth_1.csv") == "growth"
+    assert router.route("GROWTH.csv") == "other/csv"
+    assert router.route("growth_1.txt") == ""
+
+
+def test_a_destination_field_without_a_group_is_an_error():
+    with pytest.raises(ValueError, match="plate"):
+        Router([{"pattern": r"^(?P<experiment>.+)\.txt$", "destination": "{plate}"}])
+
+
+@pytest.mark.parametrize("destination", ["../{name}", "/{name}", "a/../../{name}"])
+def test_routes_never_leave_the_destination(destination, capsys):
+    router = Router([{"pattern": r"^(?P<name>.+)\.txt$", "destination": destination}])
+
+    assert router.route("x.txt") == ""
+    assert "leaves the destination folder" in capsys.readouterr().out
+
+
+def test_a_route_to_the_destination_itself():
+    router = Router([{"pattern": r"^(?P<name>.+)\.txt$", "destination": "{name}/.."}])
+
+    assert router.route("x.txt") == ""
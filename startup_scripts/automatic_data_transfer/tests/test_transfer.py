@@ -0,0 +1,195 @@
+import os
+import sqlite3
+
+import pytest
+
+import unpack_batches
+from auto_file_transfer import (
+    MANIFEST_NAME,
+    FolderMonitor,
+    Router,
+    TransferManifest,
+    verify,
+)
+
+OLD = 1_700_000_000  # mtime of files that are long finished
+
+
+def write(path, text, mtime=OLD):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def folders(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    return source, tmp_path / "destination"
+
+
+def transfer(source, destination, **options):
+    """Runs a monitor's catch-up until everything queued is transferred,
+    returns the number of files it queued"""
+    monitor = FolderMonitor(
+        str(source), str(destination), workers=2, poll_interval=0.01, **options
+    )
+    queued = monitor.catch_up()
+    monitor.stop()
+    return queued
+
+
+def test_manifest_records_transfers(tmp_path):
+    manifest = TransferManifest(str(tmp_path / MANIFEST_NAME))
+    manifest.record("a.txt", 3, 10, "aa", "/dest/a.txt")
+    manifest.record_many(
+        [
+            ("b.txt", 4, 20, "bb", "/dest/batch.tar.gz", "b.txt"),
+            ("a.txt", 5, 30, "cc", "/dest/a.txt", None),
+        ]
+    )
+
+    assert manifest.get("a.txt") == (5, 30, "cc", "/dest/a.txt", None)
+    assert manifest.get("missing.txt") is None
+    assert manifest.index() == {
+        "a.txt": (5, 30, "/dest/a.txt"),
+        "b.txt": (4, 20, "/dest/batch.tar.gz"),
+    }
+    assert [row[0] for row in manifest.rows()] == ["a.txt", "b.txt"]
+    manifest.close()
+
+
+def test_manifests_from_before_batch_mode_are_upgraded(tmp_path):
+    path = str(tmp_path / MANIFEST_NAME)
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE transfers (path TEXT PRIMARY KEY, size INTEGER, "
+        "mtime_ns INTEGER, sha256 TEXT, destination TEXT, transferred_at TEXT)"
+    )
+    db.execute("INSERT INTO transfers VALUES ('a.txt', 3, 10, 'aa', '/d/a.txt', '')")
+    db.commit()
+    db.close()
+
+    manifest = TransferManifest(path)
+
+    assert manifest.get("a.txt") == (3, 10, "aa", "/d/a.txt", None)
+    manifest.close()
+
+
+def test_catch_up_copies_each_file_once(folders, capsys):
+    source, destination = folders
+    for i in range(5):
+        write(source / f"SUB4_1_1_{i}.txt", f"reading {i}\n")
+
+    assert transfer(source, destination) == 5
+    assert transfer(source, destination) == 0
+
+    for i in range(5):
+        copied = destination / f"SUB4_1_1_{i}.txt"
+        assert copied.read_text() == f"reading {i}\n"
+        assert copied.stat().st_mtime == OLD
+    assert not list(destination.glob(".*.part"))
+    manifest = TransferManifest(str(destination / MANIFEST_NAME))
+    assert verify(manifest) == 0
+    manifest.close()
+
+
+def test_changed_and_deleted_files_are_transferred_again(folders, capsys):
+    source, destination = folders
+    write(source / "a.txt", "first\n")
+    write(source / "b.txt", "second\n")
+    transfer(source, destination)
+
+    write(source / "a.txt", "first, edited\n", mtime=OLD + 60)
+    (destination / "b.txt").unlink()
+
+    assert transfer(source, destination) == 2
+    assert (destination / "a.txt").read_text() == "first, edited\n"
+    assert (destination / "b.txt").read_text() == "second\n"
+
+
+def test_files_copied_before_the_manifest_are_not_copied_again(folders):
+    source, destination = folders
+    write(source / "a.txt", "same\n")
+    write(destination / "a.txt", "same\n")
+
+    assert transfer(source, destination) == 0
+
+
+def test_verify_finds_missing_and_changed_copies(folders, capsys):
+    source, destination = folders
+    write(source / "a.txt", "first\n")
+    write(source / "b.txt", "second\n")
+    transfer(source, destination)
+    (destination / "a.txt").write_text("corrupt\n")
+    (destination / "b.txt").unlink()
+
+    manifest = TransferManifest(str(destination / MANIFEST_NAME))
+    assert verify(manifest) == 2
+    manifest.close()
+    out = capsys.readouterr().out
+    assert "DIFFERENT: a.txt" in out
+    assert "MISSING: b.txt" in out
+
+
+def test_routed_files_go_to_their_sub_folders(folders):
+    source, destination = folders
+    write(source / "Substrate_1712345678_01HXYZ_exp2_1_T4.txt", "plate 1\n")
+    write(source / "SUB4_2_3_12.txt", "plate 2\n")
+    write(source / "notes.txt", "notes\n")
+
+    transfer(source, destination, router=Router.load("default"))
+
+    assert (destination / "01HXYZ" / "exp2" / "plate_1").is_dir()
+    assert (destination / "SUB4" / "plate_2" / "SUB4_2_3_12.txt").exists()
+    assert (destination / "notes.txt").exists()
+    # routed files found again by catch_up
+    assert transfer(source, destination, router=Router.load("default")) == 0
+
+
+def test_batches_are_indexed_verified_and_unpacked(folders, tmp_path):
+    source, destination = folders
+    for i in range(7):
+        write(source / f"SUB4_1_1_{i}.txt", f"reading {i}\n")
+
+    transfer(
+        source,
+        destination,
+        batch_seconds=0.05,
+        batch_max_files=3,
+        router=Router.load("default"),
+    )
+
+    archives = sorted(destination.glob("batch_*.tar.gz"))
+    assert len(archives) >= 3
+    assert not list(destination.rglob("SUB4_1_1_*.txt"))
+    manifest = TransferManifest(str(destination / MANIFEST_NAME))
+    assert verify(manifest) == 0
+    manifest.close()
+    assert transfer(source, destination, batch_seconds=0.05) == 0
+
+    index = unpack_batches.load_index(str(destination))
+    assert sorted(index) == [f"SUB4/plate_1/SUB4_1_1_{i}.txt" for i in range(7)]
+    assert (
+        unpack_batches.read_file(str(destination), "SUB4/plate_1/SUB4_1_1_3.txt")
+        == b"reading 3\n"
+    )
+
+    output = tmp_path / "unpacked"
+    assert unpack_batches.extract(str(destination), list(index), str(output)) == 7
+    unpacked = output / "SUB4" / "plate_1" / "SUB4_1_1_6.txt"
+    assert unpacked.read_text() == "reading 6\n"
+    assert unpacked.stat().st_mtime == OLD
+
+
+def test_the_batch_index_is_rebuilt_when_archives_change(folders):
+    source, destination = folders
+    write(source / "a.txt", "a\n")
+    transfer(source, destination, batch_seconds=0.05)
+    assert list(unpack_batches.load_index(str(destination))) == ["a.txt"]
+
+    write(source / "b.txt", "b\n")
+    transfer(source, destination, batch_seconds=0.05)
+
+    assert sorted(unpack_batches.load_index(str(destination))) == ["a.txt", "b.txt"]
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import tarfile
+import argparse
+
+# Index and unpack the batch_*.tar.gz archives written by auto_file_transfer.py --batch-seconds
+
+INDEX_NAME = "batch_index.json"
+
+
+def archive_members(folder, archive_name):
+    """Members of one archive, from its .json index (or the archive itself if the index is missing)"""
+    index_file = os.path.join(folder, f"{archive_name}.json")
+    if os.path.exists(index_file):
+        with open(index_file) as f:
+            return json.load(f)["members"]
+    with tarfile.open(os.path.join(folder, archive_name), "r:gz") as tar:
+        return [{"name": info.name, "size": info.size} for info in tar if info.isfile()]
+
+
+def build_index(folder):
+    """{file name: {"archive", "size", ...}} of every batched file in the
+    folder. A file batched more than once points at its newest archive."""
+    index = {}
+    archives = sorted(
+        name
+        for name in os.listdir(folder)
+        if name.startswith("batch_") and name.endswith(".tar.gz")
+    )
+    for archive_name in archives:  # names sort by time
+        for member in archive_members(folder, archive_name):
+            index[member["name"]] = dict(member, archive=archive_name)
+    return index
+
+
+def load_index(folder, rebuild=False):
+    """The saved index of a folder, rebuilt if missing, stale or asked for"""
+    index_file = os.path.join(folder, INDEX_NAME)
+    if not rebuild and os.path.exists(index_file):
+        with open(index_file) as f:
+            saved = json.load(f)
+        archives = {
+            name
+            for name in os.listdir(folder)
+            if name.startswith("batch_") and name.endswith(".tar.gz")
+        }
+        if set(saved["archives"]) == archives:
+            return saved["files"]
+
+    index = build_index(folder)
+    temp_file = f"{index_file}.part"
+    with open(temp_file, "w") as f:
+        json.dump(
+            {
+                "archives": sorted({entry["archive"] for entry in index.values()}),
+                "files": index,
+            },
+            f,
+            indent=1,
+        )
+    os.replace(temp_file, index_file)
+    return index
+
+
+def read_file(folder, name, index=None):
+    """Contents of one batched file"""
+    index = index or load_index(folder)
+    entry = index[name]
+    with tarfile.open(os.path.join(folder, entry["archive"]), "r:gz") as tar:
+        return tar.extractfile(name).read()
+
+
+def extract(folder, names, output_folder, index=None):
+    """Writes batched files to output_folder (with their original mtimes and
+    routed sub-folders), opening each archive once. Returns the number of files written."""
+    index = index or load_index(folder)
+    by_archive = {}
+    for name in names:
+        if name not in index:
+            print(f"Error: {name} is not in any batch archive")
+            continue
+        by_archive.setdefault(index[name]["archive"], set()).add(name)
+
+    written = 0
+    os.makedirs(output_folder, exist_ok=True)
+    for archive_name, wanted in sorted(by_archive.items()):
+        with tarfile.open(os.path.join(folder, archive_name), "r:gz") as tar:
+            for info in tar:
+                if info.name in wanted:
+                    # routed files keep their sub-folders (never outside output_folder)
+                    relative_path = os.path.normpath(info.name)
+                    if (
+                        os.path.isabs(relative_path)
+                        or relative_path.split(os.sep)[0] == ".."
+                    ):
+                        print(
+                            f"Error: not extracting {info.name}, it leaves {output_folder}"
+                        )
+                        continue
+                    output_file = os.path.join(output_folder, relative_path)
+                    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                    with open(output_file, "wb") as f:
+                        f.write(tar.extractfile(info).read())
+                    os.utime(output_file, (info.mtime, info.mtime))
+                    wanted.discard(info.name)
+                    written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index and unpack batch archives written by auto_file_transfer.py."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser(
+        "index", help="(Re)build batch_index.json and list the batched files"
+    )
+    index_parser.add_argument(
+        "folder", help="Destination folder of auto_file_transfer.py"
+    )
+
+    cat_parser = commands.add_parser("cat", help="Write one batched file to stdout")
+    cat_parser.add_argument("folder")
+    cat_parser.add_argument("name")
+
+    extract_parser = commands.add_parser(
+        "extract", help="Extract batched files (all if no names are given)"
+    )
+    extract_parser.add_argument("folder")
+    extract_parser.add_argument("names", nargs="*")
+    extract_parser.add_argument(
+        "-o", "--output", required=True, help="Folder to extract to"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "index":
+        index = load_index(args.folder, rebuild=True)
+        for name, entry in sorted(index.items()):
+            print(f"{name}\t{entry['size']}\t{entry['archive']}")
+        print(
+            f"{len(index)} files in {len({entry['archive'] for entry in index.values()})} archives",
+            file=sys.stderr,
+        )
+    elif args.command == "cat":
+        sys.stdout.buffer.write(read_file(args.folder, args.name))
+    else:
+        index = load_index(args.folder)
+        written = extract(args.folder, args.names or list(index), args.output, index)
+        print(f"Extracted {written} files to {args.output}")
+
+
+if __name__ == "__main__":
+    main()